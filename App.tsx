@@ -8,7 +8,7 @@ import { AboutScreen } from './components/AboutScreen';
 import { AIHelperBubble } from './components/AIHelperBubble';
 import { MOCK_SUMMARY } from './constants';
 import { summarizeNewsletters } from './services/geminiService';
-import { Screen, SummaryPreferences, Newsletter, Story } from './types';
+import { Screen, SummaryPreferences, Newsletter, Story, PipelineProgressEvent } from './types';
 import { Spinner } from './components/Spinner';
 
 const App: React.FC = () => {
@@ -18,6 +18,7 @@ const App: React.FC = () => {
     const [isOnline, setIsOnline] = useState(navigator.onLine);
     const [isGenerating, setIsGenerating] = useState(false);
     const [pipelineStatus, setPipelineStatus] = useState<any>(null);
+    const [progress, setProgress] = useState<PipelineProgressEvent | null>(null);
 
     const [preferences, setPreferences] = useState<SummaryPreferences>({
         frequency: 'Daily',
@@ -80,6 +81,28 @@ const App: React.FC = () => {
         loadLists();
     }, []);
 
+    // Live pipeline progress over Server-Sent Events while a run is in flight
+    useEffect(() => {
+        if (!isGenerating) {
+            setProgress(null);
+            return;
+        }
+        const source = new EventSource('/api/progress/stream');
+        source.onmessage = async (msg) => {
+            const event: PipelineProgressEvent = JSON.parse(msg.data);
+            setProgress(event);
+            if (event.stage === 'run' && event.event === 'end') {
+                const storiesResp = await fetch('/api/stories');
+                if (storiesResp.ok) {
+                    const d = await storiesResp.json();
+                    setStories(d.stories || []);
+                }
+                setIsGenerating(false);
+            }
+        };
+        return () => source.close();
+    }, [isGenerating]);
+
     // Global polling for pipeline and model status every 8 seconds
     useEffect(() => {
         const pollStatus = async () => {
@@ -243,7 +266,15 @@ const App: React.FC = () => {
                 <div className="flex flex-col items-center justify-center h-full">
                     <Spinner size="h-16 w-16" />
                     <p className="mt-4 text-gray-600 text-lg">Generating your summary...</p>
-                    <p className="text-sm text-gray-400">This may take a few minutes. Polling every 8s.</p>
+                    {progress ? (
+                        <p className="text-sm text-gray-500">
+                            {progress.message}
+                            {progress.total ? ` (${progress.current ?? 0}/${progress.total})` : ''}
+                            {` · ${Math.round(progress.elapsed_s)}s`}
+                        </p>
+                    ) : (
+                        <p className="text-sm text-gray-400">This may take a few minutes.</p>
+                    )}
                 </div>
             )
         }
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Benchmark MinHash/LSH dedupe against the pairwise SequenceMatcher path.
+
+Generates synthetic stories with injected near-duplicates (reworded titles,
+perturbed summaries) and reports wall time and how many duplicates each
+method removes.
+
+    python bench_dedupe.py --stories 500 --dup-rate 0.3
+"""
+import argparse
+import random
+import time
+
+from dedupe import dedupe_minhash, dedupe_sequence
+
+WORDS = (
+    "openai nvidia google meta anthropic model release gpu cluster training inference agent "
+    "benchmark dataset startup funding round acquisition open source weights api pricing "
+    "latency chip datacenter research paper robotics vision speech code assistant enterprise "
+    "cloud partnership regulation safety evaluation context window reasoning multimodal"
+).split()
+
+
+def make_story(rng):
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 12))).capitalize()
+    summary = ". ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 18))) for _ in range(rng.randint(2, 4))
+    )
+    return {"title": title, "summary": summary}
+
+
+def perturb(story, rng):
+    # Reorder a couple of title words and swap a few summary words
+    title = story["title"].split()
+    i, j = rng.randrange(len(title)), rng.randrange(len(title))
+    title[i], title[j] = title[j], title[i]
+    summary = story["summary"].split()
+    for _ in range(max(1, len(summary) // 15)):
+        summary[rng.randrange(len(summary))] = rng.choice(WORDS)
+    return {"title": " ".join(title), "summary": " ".join(summary)}
+
+
+def build(n, dup_rate, seed):
+    rng = random.Random(seed)
+    stories = []
+    originals = 0
+    while len(stories) < n:
+        if stories and rng.random() < dup_rate:
+            stories.append(perturb(rng.choice(stories), rng))
+        else:
+            stories.append(make_story(rng))
+            originals += 1
+    return stories, originals
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stories", type=int, default=500)
+    ap.add_argument("--dup-rate", type=float, default=0.3)
+    ap.add_argument("--jaccard", type=float, default=0.5)
+    ap.add_argument("--similarity", type=float, default=0.85)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    stories, originals = build(args.stories, args.dup_rate, args.seed)
+    print(f"{len(stories)} stories, {originals} distinct before near-duplicates were injected")
+
+    seq, t_seq = timed(dedupe_sequence, stories, threshold=args.similarity)
+    mh, t_mh = timed(dedupe_minhash, stories, threshold=args.jaccard)
+    print(f"sequence : {t_seq:8.3f}s  kept {len(seq)}")
+    print(f"minhash  : {t_mh:8.3f}s  kept {len(mh)}")
+    if t_mh > 0:
+        print(f"speedup  : {t_seq / t_mh:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare batched social generation with one SOCIAL_PROMPT call per story.
+
+Needs a running Ollama with OLLAMA_MODEL pulled. The LLM cache is turned off
+so every call reaches the model. Stories come from the latest rows in
+top_stories, or are made up with --synthetic. The script reports the wall
+time, the number of LLM calls and how many stories the batched output missed
+(those fall back to per-story calls).
+
+    python bench_social.py --stories 10 --batch-size 5
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+import top_news_pipeline as pipeline  # noqa: E402 - after the cache is disabled
+
+
+def load_stories(n: int, synthetic: bool):
+    if not synthetic:
+        try:
+            import duckdb
+            # Read-only, so it works next to a running server
+            con = duckdb.connect(pipeline.DUCKDB_PATH, read_only=True)
+            try:
+                rows = con.execute("SELECT title, summary FROM top_stories ORDER BY processed_at DESC LIMIT ?",
+                                   (n,)).fetchall()
+            finally:
+                con.close()
+            if rows:
+                return [{"title": t or "", "summary": s or ""} for t, s in rows]
+        except Exception as e:
+            print(f"[warn] Could not read top_stories, using synthetic stories: {e}")
+    return [{"title": f"Lab {i} releases open-weight model number {i}",
+             "summary": f"Research lab {i} published weights for a new model. It claims strong coding and "
+                        f"reasoning scores at lower inference cost, and licenses it for commercial use."}
+            for i in range(1, n + 1)]
+
+
+def run(stories, batch_size: int):
+    calls = {"llm": 0, "single": 0}
+    call_ollama, generate_social = pipeline.call_ollama, pipeline.generate_social
+
+    def counted_call(*args, **kwargs):
+        calls["llm"] += 1
+        return call_ollama(*args, **kwargs)
+
+    def counted_single(*args, **kwargs):
+        calls["single"] += 1
+        return generate_social(*args, **kwargs)
+
+    pipeline.call_ollama, pipeline.generate_social = counted_call, counted_single
+    try:
+        start = time.perf_counter()
+        pipeline.generate_socials(stories, batch_size)
+        return time.perf_counter() - start, calls
+    finally:
+        pipeline.call_ollama, pipeline.generate_social = call_ollama, generate_social
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stories", type=int, default=10)
+    ap.add_argument("--batch-size", type=int, default=pipeline.SOCIAL_BATCH_SIZE)
+    ap.add_argument("--synthetic", action="store_true", help="do not read stories from the database")
+    args = ap.parse_args()
+
+    if not pipeline.ollama_client.server_up():
+        sys.exit(f"Ollama is not reachable at {pipeline.OLLAMA_BASE_URL}")
+    stories = load_stories(args.stories, args.synthetic)
+    print(f"{len(stories)} stories, model {pipeline.OLLAMA_MODEL}")
+
+    t_single, single = run(stories, 1)
+    t_batch, batch = run(stories, args.batch_size)
+    print(f"per-story       : {t_single:8.2f}s  {single['llm']} calls")
+    print(f"batch of {args.batch_size:<6} : {t_batch:8.2f}s  {batch['llm']} calls, "
+          f"{batch['single']} stories fell back to per-story")
+    if t_batch > 0:
+        print(f"speedup         : {t_single / t_batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
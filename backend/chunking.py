@@ -0,0 +1,142 @@
+"""Token-based chunking of cleaned newsletters for the extract stage.
+
+One tokenizer is kept for the process. Each text is encoded once, and chunks
+are cut from the token sequence by offset, never re-encoded. A cut goes at a
+story boundary (separator rule or heading) where one fits, else at a
+paragraph boundary (blank line), so chunks are packed with whole stories and
+paragraphs up to CHUNK_MAX_TOKENS. Only a paragraph longer than that is cut
+mid-text, with CHUNK_OVERLAP_TOKENS of overlap carried into the next chunk.
+
+The token counts come from tiktoken (CHUNK_ENCODING). When tiktoken or its
+encoding file is unavailable, e.g. offline with an empty cache, a regex
+approximation of about four characters per token is used instead.
+"""
+import os
+import re
+import threading
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Sequence
+
+import settings  # noqa: F401 - loads .env before config is read
+
+CHUNK_ENCODING = os.getenv("CHUNK_ENCODING", "cl100k_base")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 2000))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 100))
+# A boundary cut is taken only if it fills at least this share of a chunk;
+# otherwise the chunk is filled up and cut mid-paragraph
+CHUNK_MIN_FILL = float(os.getenv("CHUNK_MIN_FILL", 0.5))
+
+# Story starts: separator rules and markdown headings at the start of a line
+_STORY_RE = re.compile(r"^[ \t]*(?:[-*_=~]{3,}[ \t]*$|#{1,6}\s)", re.MULTILINE)
+# Paragraph starts: after a blank line
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+# Approximate tokens: up to four word characters or one symbol, with leading whitespace
+_APPROX_TOKEN_RE = re.compile(r"\s*(?:\w{1,4}|[^\w\s])|\s+")
+
+
+class _TiktokenTokenizer:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def encode(self, text: str) -> list:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def offsets(self, text: str, tokens: Sequence[int]) -> List[int]:
+        # Character offset where each token starts
+        _, offsets = self.encoding.decode_with_offsets(list(tokens))
+        return offsets
+
+
+class _ApproxTokenizer:
+    name = "approx"
+
+    def encode(self, text: str) -> list:
+        return _APPROX_TOKEN_RE.findall(text)
+
+    def offsets(self, text: str, tokens: Sequence[str]) -> List[int]:
+        # Tokens are the text's own pieces, so offsets are running lengths
+        return list(accumulate(map(len, tokens[:-1]), initial=0)) if tokens else []
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """The process-wide tokenizer, created on first use."""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            try:
+                import tiktoken
+                _tokenizer = _TiktokenTokenizer(tiktoken.get_encoding(CHUNK_ENCODING))
+            except Exception as e:
+                print(f"[warn] tiktoken encoding {CHUNK_ENCODING} unavailable, chunking with approximate token counts: {e}")
+                _tokenizer = _ApproxTokenizer()
+        return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text or ""))
+
+
+def _boundaries(pattern, text: str, offsets: List[int], at_end: bool) -> List[int]:
+    """Token indices where `pattern` matches (its end with `at_end`, else its start)."""
+    out = []
+    for m in pattern.finditer(text):
+        # Token containing the boundary; leading whitespace is part of the next token
+        i = bisect_right(offsets, m.end() if at_end else m.start()) - 1
+        if 0 < i < len(offsets) and (not out or out[-1] != i):
+            out.append(i)
+    return out
+
+
+def _last_fitting(bounds: List[int], lo: int, hi: int) -> int | None:
+    # Largest boundary in [lo, hi]
+    j = bisect_right(bounds, hi) - 1
+    return bounds[j] if j >= 0 and bounds[j] >= lo else None
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Split `text` into chunks of at most `max_tokens` tokens, on paragraph boundaries where possible."""
+    if not text or not text.strip():
+        return []
+    max_tokens = max(1, max_tokens)
+    overlap = max(0, min(overlap, max_tokens // 2))
+    tok = get_tokenizer()
+    tokens = tok.encode(text)
+    n = len(tokens)
+    if n <= max_tokens:
+        return [text]
+
+    offsets = tok.offsets(text, tokens)
+    stories = _boundaries(_STORY_RE, text, offsets, at_end=False)
+    paragraphs = _boundaries(_PARAGRAPH_RE, text, offsets, at_end=True)
+    min_fill = max(1, int(max_tokens * CHUNK_MIN_FILL))
+
+    def char_at(i: int) -> int:
+        return offsets[i] if i < n else len(text)
+
+    chunks = []
+    start = 0
+    while start < n:
+        limit = start + max_tokens
+        if limit >= n:
+            end, next_start = n, n
+        else:
+            # Last story, else paragraph, start that fits and packs the chunk well enough
+            cut = _last_fitting(stories, start + min_fill, limit)
+            if cut is None:
+                cut = _last_fitting(paragraphs, start + min_fill, limit)
+            if cut is not None:
+                end = next_start = cut
+            else:
+                end = limit
+                next_start = max(start + 1, end - overlap)
+        chunk = text[char_at(start):char_at(end)].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = next_start
+    return chunks
@@ -0,0 +1,193 @@
+"""Process-wide DuckDB connection manager.
+
+One read-write connection owns top_news.duckdb for the whole process. API
+requests and the pipeline each work on their own cursor (DuckDB cursors are
+independent connections to the same database instance), so dashboard reads
+run concurrently with a pipeline run while writes are serialized through a
+single lock instead of fighting over the file. The schema is brought up to
+date by migrations.migrate() when the connection is first opened.
+"""
+import os
+import uuid
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import List
+
+import duckdb
+
+import migrations
+
+BASE_DIR = os.path.dirname(__file__)
+# Batches at least this large are inserted through a registered DataFrame
+BULK_FRAME_ROWS = 500
+
+
+def resolve_db_path():
+    val = os.getenv("DUCKDB_PATH")
+    if not val:
+        return os.path.join(BASE_DIR, "top_news.duckdb")
+    if os.path.isabs(val):
+        return val
+    return os.path.join(BASE_DIR, val)
+
+
+class Database:
+    def __init__(self, path=None):
+        self.path = path or resolve_db_path()
+        self.write_lock = threading.RLock()
+        # Held by a pipeline run from start to finish; rewrite() will not swap
+        # the file (closing the run's cursor) while it is taken
+        self.run_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._con = None
+        # Bumped whenever the file is swapped by rewrite(); long-lived cursors
+        # compare it to know when to reopen
+        self.generation = 0
+        self._cursors = weakref.WeakSet()
+
+    @property
+    def con(self) -> duckdb.DuckDBPyConnection:
+        with self._open_lock:
+            if self._con is None:
+                con = duckdb.connect(self.path)
+                migrations.migrate(con)
+                self._con = con
+            return self._con
+
+    def new_cursor(self) -> duckdb.DuckDBPyConnection:
+        # Long-lived cursor for a single owner (e.g. the pipeline); caller closes it
+        cur = self.con.cursor()
+        self._cursors.add(cur)
+        return cur
+
+    @contextmanager
+    def cursor(self):
+        """Per-request cursor for reads."""
+        cur = self.new_cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    @contextmanager
+    def write(self):
+        """Cursor for writes; holds the process-wide write lock while in use."""
+        with self.write_lock:
+            with self.cursor() as cur:
+                yield cur
+
+    @contextmanager
+    def transaction(self, con=None):
+        """Write lock plus one explicit transaction, rolled back on error.
+
+        Uses `con` when given (e.g. the pipeline's own cursor), otherwise a
+        fresh cursor.
+        """
+        with self.write_lock:
+            if con is not None:
+                with _transaction(con):
+                    yield con
+            else:
+                with self.cursor() as cur, _transaction(cur):
+                    yield cur
+
+    def rewrite(self) -> bool:
+        """Copy the database into a fresh file and swap it in.
+
+        DuckDB reuses freed blocks but never shrinks the file, so this is how
+        space from deleted rows and dropped bodies is returned to the disk.
+        Cursors handed out before the swap are closed (they would otherwise keep
+        the old file open), so nothing is done while a pipeline run holds
+        run_lock; returns whether the file was rewritten.
+        """
+        if not self.run_lock.acquire(blocking=False):
+            return False
+        try:
+            self._rewrite()
+        finally:
+            self.run_lock.release()
+        return True
+
+    def _rewrite(self):
+        tmp = self.path + ".compact"
+        with self.write_lock, self._open_lock:
+            for leftover in (tmp, tmp + ".wal"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            con = self._con or duckdb.connect(self.path)
+            for cur in list(self._cursors):
+                cur.close()
+            con.execute("CHECKPOINT")
+            name = con.execute("SELECT current_database()").fetchone()[0]
+            con.execute(f"ATTACH '{_quote(tmp)}' AS compact_target")
+            try:
+                con.execute(f'COPY FROM DATABASE "{name}" TO compact_target')
+            except Exception:
+                con.execute("DETACH compact_target")
+                os.remove(tmp)
+                raise
+            con.execute("DETACH compact_target")
+            con.close()
+            self._con = None
+            os.replace(tmp, self.path)
+            self.generation += 1
+
+    def close(self):
+        with self._open_lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+@contextmanager
+def _transaction(con):
+    con.execute("BEGIN TRANSACTION")
+    try:
+        yield con
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+
+
+def insert_rows(con, table: str, columns: List[str], rows: List[tuple], or_ignore: bool = False) -> int:
+    """Bulk insert `rows` into `table`.
+
+    Small batches use executemany; from BULK_FRAME_ROWS rows on, the batch is
+    registered as a pandas DataFrame and copied with a single INSERT ... SELECT,
+    which is far faster for backfills of thousands of rows.
+    """
+    if not rows:
+        return 0
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    cols = ", ".join(columns)
+    if len(rows) >= BULK_FRAME_ROWS:
+        import pandas as pd
+        name = f"_bulk_{uuid.uuid4().hex}"
+        con.register(name, pd.DataFrame.from_records(rows, columns=columns))
+        try:
+            con.execute(f"{verb} INTO {table} ({cols}) SELECT {cols} FROM {name}")
+        finally:
+            con.unregister(name)
+    else:
+        placeholders = ", ".join("?" for _ in columns)
+        con.executemany(f"{verb} INTO {table} ({cols}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+# Shared instance (lazy)
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> Database:
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = Database()
+        return _db
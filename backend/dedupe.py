@@ -0,0 +1,129 @@
+"""Near-duplicate detection for extracted stories.
+
+Stories are turned into character shingles of their title + summary, hashed
+into MinHash signatures and bucketed with LSH banding. Each new story is only
+compared against the few stories sharing a band bucket, so deduping thousands
+of stories runs in near-linear time instead of the pairwise SequenceMatcher
+loop.
+"""
+import re
+import zlib
+import numpy as np
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List
+
+# Mersenne prime 2^31 - 1 keeps (a * h + b) inside uint64 without overflow
+_PRIME = np.uint64((1 << 31) - 1)
+_NON_WORD = re.compile(r'\W+')
+
+
+def normalize_text(text: str) -> str:
+    return _NON_WORD.sub(' ', (text or "").lower()).strip()
+
+
+def story_text(story: Dict[str, Any]) -> str:
+    return f"{story.get('title') or ''} {story.get('summary') or ''}"
+
+
+def shingles(text: str, k: int = 5) -> set:
+    text = normalize_text(text)
+    if not text:
+        return set()
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def optimal_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick (bands, rows) with bands * rows <= num_perm whose S-curve
+    threshold (1 / bands) ** (1 / rows) lies closest to `threshold`."""
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands < 1:
+            break
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class MinHashLSH:
+    def __init__(self, threshold: float = 0.5, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self._buckets = [dict() for _ in range(self.bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        sh = shingles(text, self.shingle_size)
+        if not sh:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in sh), dtype=np.uint64, count=len(sh))
+        hashes %= _PRIME
+        # (num_perm, n_shingles) permutations, min over shingles
+        perm = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return perm.min(axis=1)
+
+    def _band_keys(self, sig: np.ndarray) -> Iterable[bytes]:
+        for i in range(self.bands):
+            yield sig[i * self.rows:(i + 1) * self.rows].tobytes()
+
+    def insert(self, key: Any, sig: np.ndarray):
+        self._signatures[key] = sig
+        for bucket, band in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(band, []).append(key)
+
+    def query(self, sig: np.ndarray) -> List[Any]:
+        """Keys whose estimated Jaccard similarity with `sig` reaches the threshold."""
+        candidates = set()
+        for bucket, band in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(band, ()))
+        out = []
+        for key in candidates:
+            if float(np.mean(self._signatures[key] == sig)) >= self.threshold:
+                out.append(key)
+        return out
+
+
+def dedupe_minhash(stories: List[Dict[str, Any]], threshold: float = 0.5, num_perm: int = 128,
+                   shingle_size: int = 5, history: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """Keep the first story of every near-duplicate group, preserving order.
+
+    `history` holds texts of stories published before (e.g. earlier days); any
+    story matching one of them is dropped as well.
+    """
+    index = MinHashLSH(threshold=threshold, num_perm=num_perm, shingle_size=shingle_size)
+    for i, text in enumerate(history):
+        index.insert(("history", i), index.signature(text))
+    unique = []
+    for i, s in enumerate(stories):
+        sig = index.signature(story_text(s))
+        if index.query(sig):
+            continue
+        index.insert(i, sig)
+        unique.append(s)
+    return unique
+
+
+def text_similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, normalize_text(a), normalize_text(b)).ratio()
+
+
+def dedupe_sequence(stories: List[Dict[str, Any]], threshold: float = 0.85, limit: int | None = None) -> List[Dict[str, Any]]:
+    # Original pairwise title comparison, kept for comparison and as a fallback
+    unique = []
+    for s in stories:
+        if limit is not None and len(unique) >= limit: break
+        if not any(text_similarity(s.get("title", ""), u.get("title", "")) > threshold for u in unique):
+            unique.append(s)
+    return unique
@@ -0,0 +1,151 @@
+"""Semantic story clustering with Ollama embeddings.
+
+Stories are embedded in batches through Ollama's /api/embed, vectors are
+stored as float32 in DuckDB keyed by a hash of the embedded text, and stories
+are grouped by cosine similarity so paraphrased duplicates ("OpenAI ships
+GPT-5" / "GPT-5 now available from OpenAI") collapse into one cluster.
+"""
+import os
+import re
+import zlib
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Dict, List
+
+import settings  # noqa: F401 - loads .env before config is read
+import ollama_client
+
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "ollama")
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+EMBED_SIM_THRESHOLD = float(os.getenv("EMBED_SIM_THRESHOLD", 0.85))
+
+_TOKEN = re.compile(r'\w+')
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class OllamaEmbedder:
+    def __init__(self, model: str = EMBED_MODEL, batch_size: int = EMBED_BATCH_SIZE):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            payload = {"model": self.model, "input": texts[i:i + self.batch_size]}
+            if ollama_client.OLLAMA_KEEP_ALIVE:
+                payload["keep_alive"] = ollama_client.OLLAMA_KEEP_ALIVE
+            resp = ollama_client.post("/api/embed", payload)
+            resp.raise_for_status()
+            out.extend(resp.json().get("embeddings", []))
+        if len(out) != len(texts):
+            raise RuntimeError(f"expected {len(texts)} embeddings from {self.model}, got {len(out)}")
+        return np.asarray(out, dtype=np.float32)
+
+
+class StubEmbedder:
+    """Deterministic hashed bag-of-words vectors; no Ollama needed.
+
+    Used for tests and offline runs. Texts sharing most words end up with a
+    high cosine similarity, which is enough to exercise clustering.
+    """
+    model = "stub"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for tok in _TOKEN.findall(text.lower()):
+                h = zlib.crc32(tok.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return out
+
+
+def get_embedder():
+    provider = os.getenv("EMBED_PROVIDER", EMBED_PROVIDER).lower()
+    if provider == "stub":
+        return StubEmbedder()
+    return OllamaEmbedder(model=os.getenv("OLLAMA_EMBED_MODEL", EMBED_MODEL))
+
+
+class EmbeddingStore:
+    """float32 vectors in the story_embeddings table, keyed by (text hash, model).
+
+    The table is created by schema migration 2.
+    """
+
+    def __init__(self, con, write_lock=None):
+        self.con = con
+        self.write_lock = write_lock or threading.RLock()
+
+    def get_many(self, hashes: List[str], model: str) -> Dict[str, np.ndarray]:
+        if not hashes:
+            return {}
+        rows = self.con.execute(f"""
+            SELECT text_hash, vector FROM story_embeddings
+            WHERE model = ? AND text_hash IN ({",".join("?" for _ in hashes)})
+        """, (model, *hashes)).fetchall()
+        return {h: np.asarray(v, dtype=np.float32) for h, v in rows}
+
+    def put_many(self, items: Dict[str, np.ndarray], model: str):
+        if not items:
+            return
+        with self.write_lock:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO story_embeddings (text_hash, model, vector) VALUES (?, ?, ?)",
+                [(h, model, v.astype(np.float32).tolist()) for h, v in items.items()],
+            )
+
+    def embed(self, texts: List[str], embedder) -> np.ndarray:
+        """Vectors for `texts`, computing and storing only the ones not seen before."""
+        hashes = [text_hash(t) for t in texts]
+        known = self.get_many(list(dict.fromkeys(hashes)), embedder.model)
+        missing = [h for h in dict.fromkeys(hashes) if h not in known]
+        if missing:
+            by_hash = dict(zip(hashes, texts))
+            vectors = embedder.embed([by_hash[h] for h in missing])
+            fresh = dict(zip(missing, vectors))
+            self.put_many(fresh, embedder.model)
+            known.update(fresh)
+        return np.stack([known[h] for h in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32)
+
+
+def cluster_by_similarity(vectors: np.ndarray, threshold: float = EMBED_SIM_THRESHOLD, block: int = 1024) -> List[List[int]]:
+    """Greedy leader clustering by cosine similarity.
+
+    Rows are visited in order (stories arrive sorted by score), so each
+    cluster is led by its highest-scoring story. Similarities are computed a
+    block of rows at a time with one matrix product.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1.0, norms)
+    assigned = np.full(n, -1, dtype=np.int64)
+    clusters = []
+    for start in range(0, n, block):
+        sims = unit[start:start + block] @ unit.T
+        for offset, row in enumerate(sims):
+            i = start + offset
+            if assigned[i] >= 0:
+                continue
+            # Earlier rows are already assigned, so i leads its cluster
+            members = np.union1d(np.flatnonzero((row >= threshold) & (assigned < 0)), [i])
+            assigned[members] = len(clusters)
+            clusters.append(members.tolist())
+    return clusters
+
+
+def cluster_stories(stories: List[Dict[str, Any]], con, embedder=None,
+                    threshold: float = EMBED_SIM_THRESHOLD, write_lock=None) -> List[List[int]]:
+    embedder = embedder or get_embedder()
+    texts = [f"{s.get('title') or ''}\n{s.get('summary') or ''}" for s in stories]
+    vectors = EmbeddingStore(con, write_lock=write_lock).embed(texts, embedder)
+    return cluster_by_similarity(vectors, threshold=threshold)
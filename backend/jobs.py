@@ -0,0 +1,400 @@
+"""Persistent job queue and cron scheduler backed by DuckDB.
+
+Jobs live in the `jobs` table, so history, durations and the last result
+survive restarts. Triggers that share a dedupe key coalesce into the job that
+is already queued instead of stacking up. Each kind has its own concurrency
+limit (the pipeline runs one at a time on its shared connection), and
+JOB_MAX_CONCURRENCY caps the total. When the process starts, jobs that were
+running when it died are queued again until they reach JOB_MAX_ATTEMPTS, and
+are marked failed after that.
+
+cancel() drops a queued job, or asks a running one to stop through the
+canceller registered for its kind; a handler signals that it stopped by
+raising JobCancelled.
+
+Schedules use five-field cron expressions in local time
+("minute hour day-of-month month day-of-week", e.g. "0 7 * * *" for 07:00
+daily). A schedule that was missed while the server was down fires once when
+the server comes back.
+"""
+import os
+import json
+import uuid
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import settings  # noqa: F401 - loads .env before config is read
+
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "15"))
+# Finished jobs kept in the history
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "1000"))
+
+ACTIVE = ("queued", "running")
+JOB_COLUMNS = ["id", "kind", "dedupe_key", "status", "payload", "result", "error", "attempts",
+               "triggered_by", "created_at", "started_at", "finished_at", "duration_s"]
+
+
+# --- Cron expressions ---
+_CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(field: str, lo: int, hi: int) -> set:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_s = part.split("/", 1)
+            step = int(step_s)
+            if step <= 0:
+                raise ValueError(f"invalid step in {field!r}")
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"{field!r} is outside {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr: str) -> tuple:
+    """(minutes, hours, days, months, weekdays, day_or) for a 5-field expression.
+
+    Weekdays use 0 = Sunday (7 is accepted too). day_or is set when both day
+    fields are restricted, in which case either may match (standard cron).
+    """
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError("cron expression needs 5 fields: minute hour day month weekday")
+    minutes, hours, days, months, weekdays = (_parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_RANGES))
+    return minutes, hours, days, months, {d % 7 for d in weekdays}, fields[2] != "*" and fields[4] != "*"
+
+
+def next_fire(expr: str, after: datetime) -> datetime:
+    """First minute strictly after `after` matching `expr`."""
+    minutes, hours, days, months, weekdays, either = parse_cron(expr)
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = t + timedelta(days=366 * 5)
+    while t < limit:
+        if t.month not in months:
+            t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        dom, dow = t.day in days, (t.isoweekday() % 7) in weekdays
+        if not ((dom or dow) if either else (dom and dow)):
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+            continue
+        if t.minute not in minutes:
+            t += timedelta(minutes=1)
+            continue
+        return t
+    raise ValueError(f"cron expression {expr!r} never fires")
+
+
+# --- Queue ---
+def _row_to_job(row) -> Dict[str, Any]:
+    job = dict(zip(JOB_COLUMNS, row))
+    job["payload"] = json.loads(job["payload"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    for k in ("created_at", "started_at", "finished_at"):
+        if job[k] is not None:
+            job[k] = job[k].isoformat()
+    return job
+
+
+def _merge_payload(current: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    # Coalesced triggers keep the queued job's values; list values are unioned
+    merged = dict(current)
+    for k, v in new.items():
+        if isinstance(v, list) and isinstance(merged.get(k), list):
+            merged[k] = merged[k] + [x for x in v if x not in merged[k]]
+        elif k not in merged or merged[k] is None:
+            merged[k] = v
+    return merged
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that stopped because its job was cancelled."""
+
+
+class JobQueue:
+    def __init__(self, db, max_concurrency: int = JOB_MAX_CONCURRENCY, poll_seconds: float = JOB_POLL_SECONDS):
+        self.db = db
+        self.max_concurrency = max(1, max_concurrency)
+        self.poll_seconds = poll_seconds
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._limits: Dict[str, int] = {}
+        self._cancellers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._claim_hooks: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._running: Dict[str, str] = {}  # job id -> kind
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any], max_concurrency: int = 1,
+                 cancel: Callable[[Dict[str, Any]], Any] | None = None,
+                 on_claim: Callable[[Dict[str, Any]], Any] | None = None):
+        """`handler(payload)` runs on a worker thread; its return value is stored as the result.
+
+        `cancel(job)` is called to stop a running job of this kind; without it
+        only queued jobs can be cancelled. `on_claim(job)` runs on the dispatcher
+        just before a job is marked running, so state it resets (e.g. a cancel
+        flag) is fresh before cancel() can reach the job.
+        """
+        self._handlers[kind] = handler
+        self._limits[kind] = max(1, max_concurrency)
+        if cancel is not None:
+            self._cancellers[kind] = cancel
+        if on_claim is not None:
+            self._claim_hooks[kind] = on_claim
+
+    # Lifecycle
+    def start(self):
+        if self._thread is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="job")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._thread = None
+
+    def recover(self):
+        """Requeue jobs interrupted by a crash; fail those out of attempts."""
+        with self.db.write() as con:
+            interrupted = con.execute("SELECT count(*) FROM jobs WHERE status = 'running'").fetchall()[0][0]
+            con.execute("""
+                UPDATE jobs SET
+                    status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+                    error = CASE WHEN attempts < ? THEN error ELSE 'interrupted by restart' END,
+                    finished_at = CASE WHEN attempts < ? THEN NULL ELSE current_timestamp END
+                WHERE status = 'running'
+            """, (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS))
+            # Trim history, keeping the newest finished jobs
+            con.execute("""
+                DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND id NOT IN (
+                    SELECT id FROM jobs WHERE status NOT IN ('queued', 'running')
+                    ORDER BY created_at DESC LIMIT ?)
+            """, (JOB_HISTORY_LIMIT,))
+        if interrupted:
+            print(f"[warn] Recovered {interrupted} job(s) interrupted by a restart")
+
+    # Producing
+    def enqueue(self, kind: str, payload: Dict[str, Any] | None = None, dedupe_key: str | None = None,
+                triggered_by: str = "api") -> tuple[Dict[str, Any], bool]:
+        """Queue a job; returns (job, created). With a dedupe_key, a trigger that
+        finds a queued job with the same key is merged into it instead."""
+        payload = payload or {}
+        with self.db.write() as con:
+            if dedupe_key is not None:
+                row = con.execute(f"""
+                    SELECT {", ".join(JOB_COLUMNS)} FROM jobs
+                    WHERE kind = ? AND dedupe_key = ? AND status = 'queued'
+                    ORDER BY created_at LIMIT 1
+                """, (kind, dedupe_key)).fetchall()
+                if row:
+                    job = _row_to_job(row[0])
+                    merged = _merge_payload(job["payload"], payload)
+                    if merged != job["payload"]:
+                        con.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(merged), job["id"]))
+                        job["payload"] = merged
+                    return job, False
+            job_id = str(uuid.uuid4())
+            con.execute("""
+                INSERT INTO jobs (id, kind, dedupe_key, status, payload, attempts, triggered_by, created_at)
+                VALUES (?, ?, ?, 'queued', ?, 0, ?, current_timestamp)
+            """, (job_id, kind, dedupe_key, json.dumps(payload), triggered_by))
+        self._wake.set()
+        return self.get(job_id), True
+
+    def cancel(self, job_id: str) -> Dict[str, Any] | None:
+        """Cancel a queued job, or request a running one to stop; returns the job."""
+        with self.db.write() as con:
+            con.execute("""
+                UPDATE jobs SET status = 'cancelled', finished_at = current_timestamp
+                WHERE id = ? AND status = 'queued'
+            """, (job_id,))
+        job = self.get(job_id)
+        if job and job["status"] == "running":
+            canceller = self._cancellers.get(job["kind"])
+            if canceller is None:
+                raise ValueError(f"jobs of kind {job['kind']!r} cannot be cancelled while running")
+            canceller(job)
+        return job
+
+    # Reading
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        with self.db.cursor() as con:
+            rows = con.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchall()
+        return _row_to_job(rows[0]) if rows else None
+
+    def list(self, kind: str | None = None, status: str | None = None, limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        with self.db.cursor() as con:
+            rows = con.execute(sql, (*params, int(limit))).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def is_active(self, kind: str) -> bool:
+        with self.db.cursor() as con:
+            n = con.execute("SELECT count(*) FROM jobs WHERE kind = ? AND status IN ('queued', 'running')",
+                            (kind,)).fetchall()[0][0]
+        return n > 0
+
+    def last_finished(self, kind: str) -> Dict[str, Any] | None:
+        with self.db.cursor() as con:
+            rows = con.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM jobs
+                WHERE kind = ? AND status NOT IN ('queued', 'running')
+                ORDER BY finished_at DESC LIMIT 1
+            """, (kind,)).fetchall()
+        return _row_to_job(rows[0]) if rows else None
+
+    # Schedules
+    def upsert_schedule(self, name: str, cron: str, kind: str, payload: Dict[str, Any] | None = None,
+                        enabled: bool = True) -> Dict[str, Any]:
+        nxt = next_fire(cron, datetime.now())
+        with self.db.write() as con:
+            con.execute("""
+                INSERT OR REPLACE INTO job_schedules (name, kind, cron, payload, enabled, last_fired_at, next_run_at)
+                VALUES (?, ?, ?, ?, ?, (SELECT last_fired_at FROM job_schedules WHERE name = ?), ?)
+            """, (name, kind, cron, json.dumps(payload or {}), enabled, name, nxt))
+        self._wake.set()
+        return {"name": name, "kind": kind, "cron": cron, "enabled": enabled, "next_run_at": nxt.isoformat()}
+
+    def delete_schedule(self, name: str) -> bool:
+        with self.db.write() as con:
+            n = con.execute("SELECT count(*) FROM job_schedules WHERE name = ?", (name,)).fetchall()[0][0]
+            con.execute("DELETE FROM job_schedules WHERE name = ?", (name,))
+        return n > 0
+
+    def schedules(self) -> List[Dict[str, Any]]:
+        with self.db.cursor() as con:
+            rows = con.execute("""
+                SELECT name, kind, cron, payload, enabled, last_fired_at, next_run_at
+                FROM job_schedules ORDER BY name
+            """).fetchall()
+        return [{
+            "name": r[0], "kind": r[1], "cron": r[2], "payload": json.loads(r[3] or "{}"), "enabled": r[4],
+            "last_fired_at": r[5].isoformat() if r[5] else None,
+            "next_run_at": r[6].isoformat() if r[6] else None,
+        } for r in rows]
+
+    def _fire_schedules(self):
+        now = datetime.now()
+        with self.db.cursor() as con:
+            due = con.execute("""
+                SELECT name, kind, cron, payload FROM job_schedules
+                WHERE enabled AND next_run_at <= ?
+            """, (now,)).fetchall()
+        for name, kind, cron, payload in due:
+            try:
+                nxt = next_fire(cron, now)
+            except ValueError as e:
+                print(f"[warn] Disabling schedule {name}: {e}")
+                with self.db.write() as con:
+                    con.execute("UPDATE job_schedules SET enabled = false WHERE name = ?", (name,))
+                continue
+            self.enqueue(kind, json.loads(payload or "{}"), dedupe_key=kind, triggered_by=f"schedule:{name}")
+            with self.db.write() as con:
+                con.execute("UPDATE job_schedules SET last_fired_at = ?, next_run_at = ? WHERE name = ?",
+                            (now, nxt, name))
+            print(f"[info] Schedule {name} fired; next run at {nxt.isoformat()}")
+
+    # Dispatching
+    def _loop(self):
+        # Recovery runs here rather than in start() so server startup never waits on the database
+        try:
+            self.recover()
+        except Exception as e:
+            print(f"[error] Job recovery failed: {e}")
+        while not self._stop.is_set():
+            try:
+                self._fire_schedules()
+                self._dispatch()
+            except Exception as e:
+                print(f"[error] Job dispatcher: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _dispatch(self):
+        with self._lock:
+            if len(self._running) >= self.max_concurrency:
+                return
+            with self.db.cursor() as con:
+                queued = con.execute(f"""
+                    SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status = 'queued' ORDER BY created_at
+                """).fetchall()
+            for row in queued:
+                if len(self._running) >= self.max_concurrency:
+                    break
+                job = _row_to_job(row)
+                kind = job["kind"]
+                if kind not in self._handlers:
+                    self._finish(job["id"], "failed", error=f"no handler for job kind {kind!r}", started=None)
+                    continue
+                if sum(1 for k in self._running.values() if k == kind) >= self._limits[kind]:
+                    continue
+                if kind in self._claim_hooks:
+                    self._claim_hooks[kind](job)
+                with self.db.write() as wcon:
+                    claimed = wcon.execute("""
+                        UPDATE jobs SET status = 'running', started_at = current_timestamp, attempts = attempts + 1
+                        WHERE id = ? AND status = 'queued' RETURNING id
+                    """, (job["id"],)).fetchall()
+                if not claimed:
+                    # Cancelled since it was read
+                    continue
+                self._running[job["id"]] = kind
+                self._executor.submit(self._execute, job)
+
+    def _execute(self, job: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            result = self._handlers[job["kind"]](job["payload"])
+            self._finish(job["id"], "done", result=result, started=started)
+        except JobCancelled as e:
+            print(f"[info] Job {job['kind']} {job['id']} cancelled")
+            self._finish(job["id"], "cancelled", error=str(e) or None, started=started)
+        except Exception as e:
+            print(f"[error] Job {job['kind']} {job['id']} failed: {e}")
+            self._finish(job["id"], "failed", error=str(e), started=started)
+        finally:
+            with self._lock:
+                self._running.pop(job["id"], None)
+            self._wake.set()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str | None = None,
+                started: float | None = None):
+        duration = round(time.perf_counter() - started, 3) if started is not None else None
+        with self.db.write() as con:
+            con.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = current_timestamp, duration_s = ?
+                WHERE id = ?
+            """, (status, json.dumps(result, default=str) if result is not None else None, error, duration, job_id))
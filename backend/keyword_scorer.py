@@ -0,0 +1,90 @@
+"""Aho-Corasick keyword matcher used for story scoring.
+
+The automaton is built once per run from the priority_keywords table and
+finds every keyword in a single pass over the text, so scoring cost no longer
+grows with the number of keywords.
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordScorer:
+    def __init__(self, keywords: Dict[str, float] | Iterable, word_boundary: bool = True):
+        """`keywords` is a {keyword: weight} mapping, or an iterable of keywords
+        (weight 1.0) / (keyword, weight) pairs."""
+        self.word_boundary = word_boundary
+        self.weights = {}
+        items = keywords.items() if isinstance(keywords, dict) else keywords
+        for item in items:
+            kw, weight = (item, 1.0) if isinstance(item, str) else item
+            kw = (kw or "").strip().lower()
+            if kw:
+                self.weights[kw] = float(1.0 if weight is None else weight)
+        self._build()
+
+    def _build(self):
+        # Trie as parallel lists of {char: node}; outputs hold keyword ids
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._keywords = list(self.weights)
+        for kid, kw in enumerate(self._keywords):
+            node = 0
+            for ch in kw:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(kid)
+
+        # Breadth-first failure links; outputs of the fail node are merged in
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start offset, keyword) for every match in lowercased `text`."""
+        goto, fail, out, kws = self._goto, self._fail, self._out, self._keywords
+        node = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for kid in out[node]:
+                kw = kws[kid]
+                start = i - len(kw) + 1
+                if self.word_boundary:
+                    if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(kw[0]):
+                        continue
+                    if i + 1 < n and _is_word_char(text[i + 1]) and _is_word_char(kw[-1]):
+                        continue
+                yield start, kw
+
+    def matched(self, text: str) -> set:
+        return {kw for _, kw in self.iter_matches(text.lower())}
+
+    def score(self, text: str) -> float:
+        # Each distinct keyword counts once, weighted by its priority score
+        return sum(self.weights[kw] for kw in self.matched(text))
+
+    def score_batch(self, texts: Iterable[str]) -> List[float]:
+        return [self.score(t) for t in texts]
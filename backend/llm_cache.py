@@ -0,0 +1,170 @@
+"""Persistent, content-addressed cache for Ollama responses.
+
+Entries are keyed on (model, sha256(prompt), format) and kept in a small DuckDB
+file next to top_news.duckdb, so a rerun after a crash or a config tweak skips
+inference for inputs that have not changed.
+"""
+import os
+import json
+import hashlib
+import threading
+import duckdb
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+import settings  # noqa: F401 - loads .env before config is read
+
+BASE_DIR = os.path.dirname(__file__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", 256))
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", 30))
+# Eviction runs on open and then after this many writes
+EVICT_EVERY = 100
+
+# Sentinel returned by LLMCache.get on a miss (None is a valid cached value)
+MISS = object()
+
+
+def resolve_cache_path():
+    val = os.getenv("LLM_CACHE_PATH")
+    if not val:
+        db_val = os.getenv("DUCKDB_PATH")
+        if db_val and os.path.isabs(db_val):
+            return os.path.join(os.path.dirname(db_val), "llm_cache.duckdb")
+        return os.path.join(BASE_DIR, "llm_cache.duckdb")
+    if os.path.isabs(val):
+        return val
+    return os.path.join(BASE_DIR, val)
+
+
+def cache_key(model: str, prompt: str, format: str | None = None) -> tuple[str, str]:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    key = hashlib.sha256(f"{model}\0{format or ''}\0{prompt_hash}".encode("utf-8")).hexdigest()
+    return key, prompt_hash
+
+
+class LLMCache:
+    def __init__(self, path, max_entries=LLM_CACHE_MAX_ENTRIES, max_mb=LLM_CACHE_MAX_MB, ttl_days=LLM_CACHE_TTL_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_days = ttl_days
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.con = duckdb.connect(path)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_hash TEXT,
+                format TEXT,
+                response TEXT,
+                size_bytes BIGINT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.evict()
+
+    def _cutoff(self) -> datetime:
+        return datetime.now() - timedelta(days=self.ttl_days)
+
+    def get(self, model: str, prompt: str, format: str | None = None) -> Any:
+        key, _ = cache_key(model, prompt, format)
+        with self._lock:
+            row = self.con.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?",
+                (key, self._cutoff()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return MISS
+            self.hits += 1
+            self.con.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (datetime.now(), key))
+        return json.loads(row[0])
+
+    def put(self, model: str, prompt: str, format: str | None, value: Any):
+        key, prompt_hash = cache_key(model, prompt, format)
+        payload = json.dumps(value)
+        now = datetime.now()
+        with self._lock:
+            self.con.execute("""
+                INSERT OR REPLACE INTO llm_cache (key, model, prompt_hash, format, response, size_bytes, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, model, prompt_hash, format or "", payload, len(payload), now, now))
+            self.writes += 1
+            due = self.writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop entries older than the TTL, then least recently used ones until
+        both the entry-count and byte budgets are met."""
+        with self._lock:
+            before = self.con.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+            self.con.execute("DELETE FROM llm_cache WHERE created_at < ?", (self._cutoff(),))
+            self.con.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key,
+                               row_number() OVER (ORDER BY last_used DESC) AS rn,
+                               sum(size_bytes) OVER (ORDER BY last_used DESC ROWS UNBOUNDED PRECEDING) AS running_bytes
+                        FROM llm_cache
+                    ) WHERE rn > ? OR running_bytes > ?
+                )
+            """, (self.max_entries, self.max_bytes))
+            after = self.con.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+            self.evictions += before - after
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self.con.execute("SELECT count(*), coalesce(sum(size_bytes), 0) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": int(size),
+        }
+
+    def close(self):
+        with self._lock:
+            self.con.close()
+
+
+# Shared instance (lazy) used by call_ollama
+_cache = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache | None:
+    global _cache, _cache_failed
+    if not LLM_CACHE_ENABLED or _cache_failed:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMCache(resolve_cache_path())
+            except Exception as e:
+                # e.g. the file is held by another process; run without caching
+                print(f"[warn] LLM cache unavailable, continuing without it: {e}")
+                _cache_failed = True
+                return None
+        return _cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    if _cache is None:
+        return {"enabled": LLM_CACHE_ENABLED and not _cache_failed, "hits": 0, "misses": 0}
+    return _cache.stats()
@@ -1,37 +1,75 @@
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import os
 import shutil
 import threading
 import asyncio
-import duckdb
 import json
 from typing import Any
 import uuid
-import subprocess
+import time
 import json as _json
+import settings  # noqa: F401 - loads .env before the modules below read config
 from whatsapp_service import whatsapp_service
-
-# Import user's pipeline
-try:
-    from top_news_pipeline import NewsPipeline
-    PIPELINE_AVAILABLE = True
-except Exception as e:
-    print(f"[warn] Could not import NewsPipeline: {e}")
-    NewsPipeline = None
-    PIPELINE_AVAILABLE = False
+from llm_cache import cache_stats as llm_cache_stats
+import ollama_client
+from db import get_db, insert_rows, resolve_db_path
+import paging
+import retention
+import search
+from jobs import JobCancelled, JobQueue
+from progress import RunProgress, get_bus as get_progress_bus
+
+# The user's pipeline pulls in the Gmail client, LangChain and numpy, so it is
+# imported in the background after startup (or on first use), not at boot
+_pipeline_module = None
+_pipeline_import_error = None
+_pipeline_import_lock = threading.Lock()
+
+
+def pipeline_module():
+    """top_news_pipeline, imported on first call; None when it cannot be imported."""
+    global _pipeline_module, _pipeline_import_error
+    with _pipeline_import_lock:
+        if _pipeline_module is None and _pipeline_import_error is None:
+            try:
+                import top_news_pipeline
+                _pipeline_module = top_news_pipeline
+            except Exception as e:
+                print(f"[warn] Could not import NewsPipeline: {e}")
+                _pipeline_import_error = str(e)
+        return _pipeline_module
+
+
+def pipeline_loading() -> bool:
+    return _pipeline_module is None and _pipeline_import_error is None
+
+
+def pipeline_available(wait: bool = True) -> bool:
+    # With wait=False, False while the import is still in flight (see pipeline_loading)
+    if not wait and pipeline_loading():
+        return False
+    return pipeline_module() is not None
+
+
+def warm_imports():
+    """Background start-up imports, run once the server is up.
+
+    pandas goes first: DuckDB imports it on the first query with a bound
+    parameter (about half a second), and the first /api/status binds one.
+    """
+    import pandas  # noqa: F401
+    pipeline_module()
 
 BASE_DIR = os.path.dirname(__file__)
 FRONTEND_DIST = os.path.join(os.path.dirname(BASE_DIR), "dist")
 SECRETS_DIR = os.path.join(BASE_DIR, "secrets")
 os.makedirs(SECRETS_DIR, exist_ok=True)
 
-# Allow overriding Ollama server/base URL via environment variable so we don't
-# hardcode localhost/port in multiple places. When not set, default to
-# localhost:11434 which is the Ollama local server default.
-OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+# Ollama server/base URL (OLLAMA_BASE_URL) and the pooled HTTP session live in
+# ollama_client so the API and the pipeline share connections.
 
 def resolve_secret_path(env_var: str, default_name: str) -> str:
     val = os.getenv(env_var)
@@ -41,14 +79,6 @@ def resolve_secret_path(env_var: str, default_name: str) -> str:
         return val
     return os.path.join(SECRETS_DIR, val)
 
-def resolve_db_path():
-    val = os.getenv("DUCKDB_PATH")
-    if not val:
-        return os.path.join(BASE_DIR, "top_news.duckdb")
-    if os.path.isabs(val):
-        return val
-    return os.path.join(BASE_DIR, val)
-
 app = FastAPI()
 
 @app.on_event("startup")
@@ -57,6 +87,26 @@ async def startup_event():
     if os.getenv("WHATSAPP_ENABLED", "false").lower() == "true":
         print("[info] Auto-starting WhatsApp service...")
         whatsapp_service.start()
+    # Warm pandas and the pipeline import off the request path
+    threading.Thread(target=warm_imports, name="pipeline-import", daemon=True).start()
+    # Persistent job queue; requeues runs interrupted by a crash
+    job_queue.start()
+    schedule = os.getenv("PIPELINE_SCHEDULE", "").strip()
+    if schedule:
+        try:
+            job_queue.upsert_schedule("pipeline", schedule, "pipeline")
+        except ValueError as e:
+            print(f"[warn] Ignoring PIPELINE_SCHEDULE: {e}")
+    # Scheduled archive + compaction; postponed while a pipeline run is active
+    global _maintenance_stop
+    _maintenance_stop = retention.start_scheduler(get_db(), busy=pipeline_active)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _maintenance_stop is not None:
+        _maintenance_stop.set()
+    job_queue.stop()
+    get_db().close()
 
 # Serve static frontend if built
 if os.path.isdir(FRONTEND_DIST):
@@ -65,14 +115,16 @@ if os.path.isdir(FRONTEND_DIST):
 # Shared pipeline instance (lazy)
 _pipeline = None
 _pipeline_lock = threading.Lock()
-_last_run = {"running": False, "last_result": None}
+_maintenance_stop = None
+job_queue = JobQueue(get_db())
 
 
 def get_pipeline():
     global _pipeline
     with _pipeline_lock:
-        if _pipeline is None and PIPELINE_AVAILABLE:
-            _pipeline = NewsPipeline()
+        if _pipeline is None and pipeline_module() is not None:
+            # Share the process-wide connection instead of opening a second one
+            _pipeline = pipeline_module().NewsPipeline(db=get_db())
         return _pipeline
 
 
@@ -81,12 +133,38 @@ class RunRequest(BaseModel):
     fetch_limit: int | None = None
 
 
+def pipeline_active() -> bool:
+    return job_queue.is_active("pipeline")
+
+
+def last_run_status() -> dict:
+    # Same shape the frontend polls for, derived from the jobs table
+    running = pipeline_active()
+    last = job_queue.last_finished("pipeline")
+    last_result = None
+    if last is not None:
+        if last["status"] == "done":
+            last_result = "ok"
+        elif last["status"] == "cancelled":
+            last_result = "cancelled"
+        else:
+            last_result = f"error: {last['error']}"
+    return {
+        "running": running,
+        "last_result": None if running else last_result,
+        "finished_at": last["finished_at"] if last else None,
+        "duration_s": last["duration_s"] if last else None,
+    }
+
+
 @app.get('/api/status')
 async def status():
     return {
         "ok": True,
-        "pipeline_available": PIPELINE_AVAILABLE,
-        "last_run": _last_run,
+        "pipeline_available": pipeline_available(wait=False),
+        "pipeline_loading": pipeline_loading(),
+        "last_run": await asyncio.to_thread(last_run_status),
+        "llm_cache": await asyncio.to_thread(llm_cache_stats),
     }
 
 
@@ -146,6 +224,7 @@ async def get_config():
         "TOP_N": os.getenv("TOP_N", "10"),
         "SIMILARITY_THRESHOLD": os.getenv("SIMILARITY_THRESHOLD", "0.85"),
         "OLLAMA_MODEL": os.getenv("OLLAMA_MODEL", "qwen3:8b"),
+        "PIPELINE_CONCURRENCY": os.getenv("PIPELINE_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "2")),
     }
     if os.path.exists(env_path):
         with open(env_path, 'r') as f:
@@ -203,79 +282,112 @@ async def secrets_status():
     return {"ok": True, "secrets": out}
 
 
-def run_cmd(cmd: list, timeout: int = 600):
-    """Run a command and return (ok, stdout, stderr, returncode)"""
-    try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
-        return True, proc.stdout, proc.stderr, proc.returncode
-    except Exception as e:
-        return False, '', str(e), 1
+def _format_size(n) -> str:
+    # Same units `ollama list` prints
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1000:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1000
+    return f"{n:.1f} TB"
 
 
-@app.get('/api/ollama/status')
-async def ollama_status():
-    # Check whether ollama CLI is available
-    ok, out, err, code = run_cmd(['which', 'ollama'], timeout=5)
-    cli_available = ok and out.strip() != ''
-    
-    # Check if ollama server is responding
-    server_up = False
-    try:
-        import requests
-        tags_url = OLLAMA_BASE_URL.rstrip('/') + '/api/tags'
-        r = requests.get(tags_url, timeout=2)
-        server_up = r.status_code == 200
-    except Exception:
-        server_up = False
-
-    # check running models using 'ollama ps'
+def _ollama_status() -> dict:
+    cli_available = shutil.which('ollama') is not None
+    server_up = ollama_client.server_up(timeout=2)
     running_models = []
-    if cli_available and server_up:
-        ok2, ps_out, ps_err, _ = run_cmd(['ollama', 'ps'])
-        if ok2 and ps_out:
-            lines = ps_out.splitlines()
-            if len(lines) > 1: # Skip header
-                for line in lines[1:]:
-                    parts = line.split()
-                    if parts:
-                        running_models.append(parts[0])
-    
+    if server_up:
+        try:
+            running_models = [m.get("name") or m.get("model") for m in ollama_client.running_models()]
+        except Exception as e:
+            print(f"[warn] Could not list running Ollama models: {e}")
     return {
-        "ok": True, 
-        "cli_available": cli_available, 
+        "ok": True,
+        "cli_available": cli_available,
         "server_up": server_up,
-        "running": len(running_models) > 0, 
-        "running_models": running_models
+        "running": len(running_models) > 0,
+        "running_models": running_models,
     }
 
 
+@app.get('/api/ollama/status')
+async def ollama_status():
+    # HTTP calls to Ollama run in a worker thread so the event loop stays free
+    return await asyncio.to_thread(_ollama_status)
+
+
 @app.get('/api/models')
 async def list_models():
-    # Use 'ollama list' to get all downloaded models
-    ok, out, err, code = run_cmd(['ollama', 'list'])
-    if ok and code == 0:
-        lines = out.splitlines()
-        models = []
-        if len(lines) > 1: # Skip header
-            for l in lines[1:]:
-                parts = l.split()
-                if len(parts) >= 3:
-                    name = parts[0]
-                    size = parts[2]
-                    models.append({"name": name, "size": size})
-        return {"ok": True, "models": models, "raw": out}
-    return {"ok": False, "models": [], "error": "ollama list failed"}
+    # Downloaded models from Ollama's /api/tags
+    try:
+        tags = await asyncio.to_thread(ollama_client.list_models)
+    except Exception as e:
+        return {"ok": False, "models": [], "error": f"ollama list failed: {e}"}
+    models = [{
+        "name": m.get("name") or m.get("model"),
+        "size": _format_size(m.get("size")),
+        "bytes": m.get("size"),
+        "modified_at": m.get("modified_at"),
+    } for m in tags]
+    return {"ok": True, "models": models}
+
+
+# Cancel flags of running pulls, by model name
+_pull_cancels: dict = {}
+
+
+def run_model_pull_job(payload: dict):
+    """Job handler for kind "model_pull"; streams byte progress on the "models" bus."""
+    model = payload["model"]
+    progress = RunProgress(bus=get_progress_bus("models"))
+    cancel = _pull_cancels.setdefault(model, threading.Event())
+    cancel.clear()
+    last = {"t": 0.0, "status": None}
+
+    def on_progress(p: dict):
+        # Ollama sends a line per chunk; forward status changes and at most ~4 updates a second
+        now = time.monotonic()
+        if p["status"] == last["status"] and now - last["t"] < 0.25:
+            return
+        last.update(t=now, status=p["status"])
+        percent = round(100 * p["completed"] / p["total"], 1) if p["total"] else None
+        progress.emit("pull", "progress", p["status"], model=model, completed=p["completed"],
+                      total=p["total"], percent=percent)
+
+    progress.start(f"Pull of {model} started", model=model)
+    try:
+        with progress.stage("pull", f"Pulling {model}", model=model):
+            result = ollama_client.pull_model(model, on_progress=on_progress, cancel=cancel)
+    except InterruptedError as e:
+        progress.finish("cancelled", str(e), model=model)
+        raise JobCancelled(str(e))
+    except Exception as e:
+        progress.finish("failed", str(e), model=model)
+        raise
+    finally:
+        _pull_cancels.pop(model, None)
+    progress.finish("done", f"Pulled {model}", model=model)
+    return {**result, "run_id": progress.run_id}
+
+
+def cancel_model_pull_job(job: dict):
+    cancel = _pull_cancels.get(job["payload"].get("model"))
+    if cancel is not None:
+        cancel.set()
+
+
+job_queue.register("model_pull", run_model_pull_job, max_concurrency=1, cancel=cancel_model_pull_job)
 
 
 @app.post('/api/models/pull')
 async def pull_model(payload: dict):
-    model = payload.get('model')
+    # Queued as a job; follow it with /api/models/pull/stream or /api/jobs/{job_id}
+    model = (payload.get('model') or '').strip()
     if not model:
         return {"ok": False, "error": "no model specified"}
-    # Pulling can take a long time, but we'll wait for it here for simplicity
-    # In a real app, this should be a background task with progress updates
-    ok, out, err, code = run_cmd(['ollama', 'pull', model], timeout=3600)
-    return {"ok": ok and code == 0, "out": out, "err": err, "code": code}
+    job, created = await asyncio.to_thread(job_queue.enqueue, "model_pull", {"model": model},
+                                           f"model_pull:{model}", "api")
+    return {"ok": True, "message": "pull_started" if created else "pull_already_queued", "job_id": job["id"]}
 
 
 @app.post('/api/models/remove')
@@ -283,8 +395,11 @@ async def remove_model(payload: dict):
     model = payload.get('model')
     if not model:
         return {"ok": False, "error": "no model specified"}
-    ok, out, err, code = run_cmd(['ollama', 'rm', model])
-    return {"ok": ok and code == 0, "out": out, "err": err, "code": code}
+    try:
+        await asyncio.to_thread(ollama_client.delete_model, model)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "message": f"Model {model} removed"}
 
 
 @app.post('/api/models/activate')
@@ -292,13 +407,12 @@ async def activate_model(payload: dict):
     model = payload.get('model')
     if not model:
         return {"ok": False, "error": "no model specified"}
-    
-    # 'ollama run' starts the model. We'll run it with '/bye' to just ensure it's loaded 
-    # into memory and then exit the CLI.
-    ok, out, err, code = run_cmd(['ollama', 'run', model, '/bye'], timeout=60)
-    if ok and code == 0:
-        return {"ok": True, "message": f"Model {model} activated"}
-    return {"ok": False, "error": err or "Failed to activate model"}
+    # An empty generate request loads the model and keeps it for OLLAMA_KEEP_ALIVE
+    try:
+        await asyncio.to_thread(ollama_client.load_model, model)
+    except Exception as e:
+        return {"ok": False, "error": f"Failed to activate model: {e}"}
+    return {"ok": True, "message": f"Model {model} activated"}
 
 
 @app.post('/api/models/deactivate')
@@ -306,20 +420,20 @@ async def deactivate_model(payload: dict):
     model = payload.get('model')
     if not model:
         return {"ok": False, "error": "no model specified"}
-    
-    ok, out, err, code = run_cmd(['ollama', 'stop', model])
-    if ok and code == 0:
-        return {"ok": True, "message": f"Model {model} stopped"}
-    return {"ok": False, "error": err or "Failed to stop model"}
+    try:
+        await asyncio.to_thread(ollama_client.unload_model, model)
+    except Exception as e:
+        return {"ok": False, "error": f"Failed to stop model: {e}"}
+    return {"ok": True, "message": f"Model {model} stopped"}
 
 
+# Handlers that query DuckDB are plain `def`: FastAPI runs them in its
+# threadpool, so a read waiting on the pipeline never stalls the event loop
 @app.get('/api/newsletters')
-async def get_newsletters():
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
+def get_newsletters():
+    if not os.path.exists(resolve_db_path()):
         return {"ok": True, "newsletters": []}
-    con = duckdb.connect(db_path)
-    try:
+    with get_db().cursor() as con:
         # newsletter_addresses table: id, sender, email, priority
         try:
             rows = con.execute('SELECT id, sender, email, priority FROM newsletter_addresses ORDER BY sender').fetchall()
@@ -328,37 +442,30 @@ async def get_newsletters():
             return {"ok": True, "newsletters": nl}
         except Exception:
             return {"ok": True, "newsletters": []}
-    finally:
-        con.close()
 
 
 @app.post('/api/newsletters')
-async def post_newsletters(payload: dict):
+def post_newsletters(payload: dict):
     items = payload.get('newsletters', [])
-    db_path = resolve_db_path()
-    con = duckdb.connect(db_path)
-    try:
-        con.execute('CREATE TABLE IF NOT EXISTS newsletter_addresses (id TEXT PRIMARY KEY, sender TEXT, email TEXT, priority INTEGER)')
-        # replace contents
+    rows = []
+    for it in items:
+        _id = it.get('id') or str(uuid.uuid4())
+        sender = it.get('sender') or ''
+        email = it.get('email') or ''
+        priority = int(it.get('priority') or 5)
+        rows.append((_id, sender, email, priority))
+    # replace contents atomically
+    with get_db().transaction() as con:
         con.execute('DELETE FROM newsletter_addresses')
-        for it in items:
-            _id = it.get('id') or str(uuid.uuid4())
-            sender = it.get('sender') or ''
-            email = it.get('email') or ''
-            priority = int(it.get('priority') or 5)
-            con.execute('INSERT INTO newsletter_addresses (id, sender, email, priority) VALUES (?, ?, ?, ?)', (_id, sender, email, priority))
-        return {"ok": True, "count": len(items)}
-    finally:
-        con.close()
+        insert_rows(con, 'newsletter_addresses', ['id', 'sender', 'email', 'priority'], rows)
+    return {"ok": True, "count": len(items)}
 
 
 @app.get('/api/priority-keywords')
-async def get_priority_keywords():
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
+def get_priority_keywords():
+    if not os.path.exists(resolve_db_path()):
         return {"ok": True, "keywords": []}
-    con = duckdb.connect(db_path)
-    try:
+    with get_db().cursor() as con:
         try:
             rows = con.execute('SELECT keyword, score FROM priority_keywords ORDER BY keyword').fetchall()
             cols = [c[0] for c in con.description]
@@ -366,31 +473,27 @@ async def get_priority_keywords():
             return {"ok": True, "keywords": kws}
         except Exception:
             return {"ok": True, "keywords": []}
-    finally:
-        con.close()
 
 
 @app.post('/api/priority-keywords')
-async def post_priority_keywords(payload: dict):
+def post_priority_keywords(payload: dict):
     items = payload.get('keywords', [])
-    db_path = resolve_db_path()
-    con = duckdb.connect(db_path)
-    try:
-        con.execute('CREATE TABLE IF NOT EXISTS priority_keywords (keyword TEXT PRIMARY KEY, score DOUBLE)')
+    rows = {}
+    for kw in items:
+        if isinstance(kw, dict):
+            keyword = kw.get('keyword')
+            score = float(kw.get('score', 1.0))
+        else:
+            keyword = str(kw)
+            score = 1.0
+        if not keyword:
+            continue
+        rows[keyword] = score
+    # replace contents atomically
+    with get_db().transaction() as con:
         con.execute('DELETE FROM priority_keywords')
-        for kw in items:
-            if isinstance(kw, dict):
-                keyword = kw.get('keyword')
-                score = float(kw.get('score', 1.0))
-            else:
-                keyword = str(kw)
-                score = 1.0
-            if not keyword:
-                continue
-            con.execute('INSERT INTO priority_keywords (keyword, score) VALUES (?, ?)', (keyword, score))
-        return {"ok": True, "count": len(items)}
-    finally:
-        con.close()
+        insert_rows(con, 'priority_keywords', ['keyword', 'score'], list(rows.items()))
+    return {"ok": True, "count": len(items)}
 
 
 @app.get('/api/whatsapp/status')
@@ -433,66 +536,314 @@ def format_stories_for_whatsapp(stories: list):
     return msg
 
 
-def run_pipeline_job(newsletters: list, fetch_limit: int | None, notify_phone: str | None = None):
-    global _last_run
+def run_pipeline_job(payload: dict):
+    """Job handler for kind "pipeline"; raising marks the job failed."""
+    p = get_pipeline()
+    if p is None:
+        raise RuntimeError("pipeline_not_available")
+    progress = RunProgress()
     try:
-        _last_run = {"running": True, "last_result": None}
-        p = get_pipeline()
-        if p is None:
-            _last_run = {"running": False, "last_result": "pipeline_not_available"}
-            return
-        stories = p.run(fetch_limit=fetch_limit or None)
-        _last_run = {"running": False, "last_result": "ok"}
-        
-        # WhatsApp Notification
-        whatsapp_phone = notify_phone or os.getenv("WHATSAPP_PHONE")
+        stories = p.run(fetch_limit=payload.get("fetch_limit") or None, progress=progress)
+    except pipeline_module().RunCancelled:
+        raise JobCancelled(f"run {progress.run_id} cancelled")
+
+    # WhatsApp Notification
+    # Jobs queued by a schedule carry no phones
+    phones = payload.get("notify_phones") or [os.getenv("WHATSAPP_PHONE")]
+    formatted_msg = format_stories_for_whatsapp(stories)
+    notifications = []
+    for whatsapp_phone in phones:
         if whatsapp_phone and whatsapp_service.is_connected:
-            formatted_msg = format_stories_for_whatsapp(stories)
-            whatsapp_service.send_notification(whatsapp_phone, formatted_msg)
+            # Queued on the WhatsApp outbox; delivery status via /api/whatsapp/messages
+            notifications.append(whatsapp_service.send_notification(whatsapp_phone, formatted_msg))
+    return {"stories": len(stories or []), "run_id": progress.run_id, "timings": progress.timings,
+            "notifications": [n for n in notifications if n]}
 
-    except Exception as e:
-        _last_run = {"running": False, "last_result": f"error: {e}"}
+
+def cancel_pipeline_job(job: dict):
+    # The run stops at its next checkpoint; the next run resumes its emails
+    p = get_pipeline()
+    if p is not None:
+        p.cancel()
+
+
+def claim_pipeline_job(job: dict):
+    p = get_pipeline()
+    if p is not None:
+        p.reset_cancel()
+
+
+job_queue.register("pipeline", run_pipeline_job, max_concurrency=1, cancel=cancel_pipeline_job,
+                   on_claim=claim_pipeline_job)
+
+
+def enqueue_pipeline(payload: dict, triggered_by: str):
+    # Triggers arriving while a run is queued coalesce into it. Each one adds its
+    # phones plus WHATSAPP_PHONE, so the merged job notifies all of them.
+    phones = [*(payload.get("notify_phones") or []), os.getenv("WHATSAPP_PHONE")]
+    payload = {**payload, "notify_phones": list(dict.fromkeys(p for p in phones if p))}
+    job, created = job_queue.enqueue("pipeline", payload, dedupe_key="pipeline", triggered_by=triggered_by)
+    return job, created
 
 
 @app.post('/api/run')
-async def run(req: RunRequest, background_tasks: BackgroundTasks):
-    # Start pipeline in background to avoid blocking
-    if not PIPELINE_AVAILABLE:
+async def run(req: RunRequest):
+    # Queue a pipeline job; the job worker runs it in the background
+    if not await asyncio.to_thread(pipeline_available):
         return JSONResponse({"ok": False, "error": "pipeline_unavailable"}, status_code=500)
 
-    fetch_limit = req.fetch_limit
-    newsletters = req.newsletters or []
-    # Start background task
-    background_tasks.add_task(run_pipeline_job, newsletters, fetch_limit)
-    return {"ok": True, "message": "pipeline_started"}
+    payload = {"fetch_limit": req.fetch_limit}
+    job, created = await asyncio.to_thread(enqueue_pipeline, payload, "api")
+    return {"ok": True, "message": "pipeline_started" if created else "pipeline_already_queued", "job_id": job["id"]}
+
+
+@app.post('/api/run/cancel')
+async def cancel_run():
+    # Cancels the running pipeline job and any queued one behind it
+    jobs = await asyncio.to_thread(job_queue.list, "pipeline", None, 10)
+    active = [j for j in jobs if j["status"] in ("queued", "running")]
+    if not active:
+        return JSONResponse({"ok": False, "error": "no_active_run"}, status_code=404)
+    for j in active:
+        await asyncio.to_thread(job_queue.cancel, j["id"])
+    return {"ok": True, "message": "cancel_requested", "job_ids": [j["id"] for j in active]}
+
+
+@app.get('/api/runs')
+async def list_runs(limit: int = 20):
+    # Pipeline runs with their last completed stage; failed/cancelled ones are resumed by the next run
+    p = await asyncio.to_thread(get_pipeline)
+    if p is None:
+        return JSONResponse({"ok": False, "error": "pipeline_unavailable"}, status_code=500)
+    return {"ok": True, "runs": await asyncio.to_thread(p.list_runs, max(1, min(limit, 200)))}
+
+
+@app.get('/api/jobs')
+async def list_jobs(kind: str | None = None, status: str | None = None, limit: int = 50):
+    jobs = await asyncio.to_thread(job_queue.list, kind, status, max(1, min(limit, 500)))
+    return {"ok": True, "jobs": jobs}
+
+
+@app.get('/api/jobs/{job_id}')
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
+    return {"ok": True, "job": job}
+
+
+@app.post('/api/jobs/{job_id}/cancel')
+async def cancel_job(job_id: str):
+    try:
+        job = await asyncio.to_thread(job_queue.cancel, job_id)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=409)
+    if job is None:
+        return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
+    return {"ok": True, "job": job}
+
+
+@app.get('/api/schedules')
+async def list_schedules():
+    return {"ok": True, "schedules": await asyncio.to_thread(job_queue.schedules)}
+
+
+@app.post('/api/schedules')
+async def post_schedule(payload: dict):
+    # {"name": "morning", "cron": "0 7 * * *", "kind": "pipeline", "enabled": true}
+    name = (payload.get('name') or '').strip()
+    cron = (payload.get('cron') or '').strip()
+    if not name or not cron:
+        return JSONResponse({"ok": False, "error": "name and cron are required"}, status_code=400)
+    try:
+        schedule = await asyncio.to_thread(job_queue.upsert_schedule, name, cron, payload.get('kind') or "pipeline",
+                                           payload.get('payload') or {}, bool(payload.get('enabled', True)))
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    return {"ok": True, "schedule": schedule}
+
+
+@app.delete('/api/schedules/{name}')
+async def delete_schedule(name: str):
+    if not await asyncio.to_thread(job_queue.delete_schedule, name):
+        return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
+    return {"ok": True}
+
+
+@app.get('/api/progress')
+async def progress_events(run_id: str | None = None, after: int = 0):
+    # Buffered events of one run (default: the latest); per-stage timings are on the "run" end event
+    bus = get_progress_bus()
+    run_id = run_id or bus.last_run_id()
+    return {"ok": True, "run_id": run_id, "events": bus.history(after_seq=after, run_id=run_id) if run_id else []}
+
+
+def _sse(event: dict) -> str:
+    return f"id: {event['seq']}\ndata: {_json.dumps(event, default=str)}\n\n"
+
+
+@app.get('/api/progress/stream')
+async def progress_stream(request: Request):
+    """Server-Sent Events: replays the latest run's events while it runs, then streams live ones."""
+    return _event_stream(request, get_progress_bus())
+
+
+@app.get('/api/models/pull/stream')
+async def model_pull_stream(request: Request):
+    # Byte progress of model pulls, same event format as /api/progress/stream
+    return _event_stream(request, get_progress_bus("models"))
+
+
+def _event_stream(request: Request, bus) -> StreamingResponse:
+    queue = bus.subscribe()
+    last_id = request.headers.get('last-event-id')
+    after = int(last_id) if last_id and last_id.isdigit() else 0
+
+    async def events():
+        try:
+            seen = after
+            for event in bus.replay(after_seq=after):
+                seen = event["seq"]
+                yield _sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": ping\n\n"
+                    continue
+                if event["seq"] > seen:
+                    seen = event["seq"]
+                    yield _sse(event)
+        finally:
+            bus.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # Set up WhatsApp callback
-def trigger_nokast_via_whatsapp(phone: str = None):
-    # Run in background to avoid blocking WhatsApp client thread
-    threading.Thread(target=run_pipeline_job, args=([], None, phone)).start()
+def trigger_nokast_via_whatsapp(phone: str = None) -> bool:
+    # Queued like any other trigger; returns immediately to the WhatsApp client thread.
+    # False tells the service the trigger joined an already queued run.
+    job, created = enqueue_pipeline({"notify_phones": [phone] if phone else []}, "whatsapp")
+    return created
 
 whatsapp_service.on_nokast_callback = trigger_nokast_via_whatsapp
 
 
+def list_rows(listing, key: str, limit: int | None, cursor: str | None, since: str | None,
+              until: str | None, sender: str | None, fields: str | None, format: str):
+    """Shared body of the paginated listing endpoints.
+
+    Without parameters the full history is returned as before. `limit` enables
+    keyset pagination (pass `next_cursor` back as `cursor`), and
+    format=ndjson|arrow streams rows straight from DuckDB.
+    """
+    if not os.path.exists(resolve_db_path()):
+        return {"ok": True, key: [], "next_cursor": None}
+    if limit is not None and limit <= 0:
+        return JSONResponse({"ok": False, "error": "limit must be positive"}, status_code=400)
+    try:
+        cols = paging.parse_fields(listing, fields)
+        filters = {"cursor": cursor, "since": since, "until": until, "sender": sender}
+        if format == "ndjson":
+            return StreamingResponse(paging.stream_ndjson(get_db().cursor, listing, cols, limit, **filters),
+                                     media_type="application/x-ndjson")
+        if format == "arrow":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return JSONResponse({"ok": False, "error": "format=arrow requires pyarrow"}, status_code=400)
+            return StreamingResponse(paging.stream_arrow(get_db().cursor, listing, cols, limit, **filters),
+                                     media_type="application/vnd.apache.arrow.stream")
+        if format != "json":
+            return JSONResponse({"ok": False, "error": f"unknown format: {format}"}, status_code=400)
+        with get_db().cursor() as con:
+            page = paging.fetch_page(con, listing, cols, limit, **filters)
+        return {"ok": True, key: page["rows"], "next_cursor": page["next_cursor"]}
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+
+
 @app.get('/api/stories')
-async def stories():
+def stories(limit: int | None = None, cursor: str | None = None, since: str | None = None,
+            until: str | None = None, sender: str | None = None, fields: str | None = None,
+            format: str = "json"):
     # Read from DuckDB file used by pipeline
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
-        return {"ok": True, "stories": []}
-    con = duckdb.connect(db_path)
+    return list_rows(paging.STORIES, "stories", limit, cursor, since, until, sender, fields, format)
+
+
+@app.get('/api/stats')
+def stats(days: int = 30):
+    # Dashboard figures come from the small daily_rollups table, not top_stories
+    if not os.path.exists(resolve_db_path()):
+        return {"ok": True, "totals": {"story_count": 0, "avg_score": None}, "days": [], "senders": [], "tags": []}
+    days = max(1, min(int(days), 3650))
+    window = "day > current_date - CAST(? AS INTEGER)"
+    with get_db().cursor() as con:
+        total = con.execute(f"""
+            SELECT coalesce(sum(story_count), 0), sum(avg_score * story_count) / nullif(sum(story_count), 0)
+            FROM daily_rollups WHERE {window}
+        """, (days,)).fetchone()
+        per_day = con.execute(f"""
+            SELECT day, sum(story_count), sum(avg_score * story_count) / nullif(sum(story_count), 0)
+            FROM daily_rollups WHERE {window} GROUP BY day ORDER BY day DESC
+        """, (days,)).fetchall()
+        per_sender = con.execute(f"""
+            SELECT sender_email, sum(story_count) AS n, sum(avg_score * story_count) / nullif(sum(story_count), 0)
+            FROM daily_rollups WHERE {window} GROUP BY sender_email ORDER BY n DESC, sender_email LIMIT 20
+        """, (days,)).fetchall()
+        tags = con.execute(f"""
+            SELECT tag, count(*) AS n FROM (SELECT unnest(top_tags) AS tag FROM daily_rollups WHERE {window})
+            GROUP BY tag ORDER BY n DESC, tag LIMIT 20
+        """, (days,)).fetchall()
+    return {
+        "ok": True,
+        "totals": {"story_count": int(total[0]), "avg_score": total[1]},
+        "days": [{"day": str(d), "story_count": int(n), "avg_score": a} for d, n, a in per_day],
+        "senders": [{"sender_email": se, "story_count": int(n), "avg_score": a} for se, n, a in per_sender],
+        "tags": [{"tag": t, "days": int(n)} for t, n in tags],
+    }
+
+
+@app.get('/api/search')
+async def search_history(q: str, type: str = "all", limit: int = 20, offset: int = 0):
+    # BM25-ranked matches over email subjects/bodies and story titles/summaries
+    if not os.path.exists(resolve_db_path()):
+        return {"ok": True, "results": [], "next_offset": None}
+    if limit <= 0 or offset < 0:
+        return JSONResponse({"ok": False, "error": "limit must be positive and offset non-negative"}, status_code=400)
     try:
-        rows = con.execute('SELECT id, title, summary, linkedIn, x_post, branding_tag, action_suggestion, score, date_iso, sender_email, processed_at FROM top_stories ORDER BY processed_at DESC').fetchall()
-        cols = [c[0] for c in con.description]
-        stories = [dict(zip(cols, r)) for r in rows]
-        return {"ok": True, "stories": stories}
-    finally:
-        con.close()
+        res = await asyncio.to_thread(search.search, get_db(), q, type, min(limit, 200), offset)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    return {"ok": True, **res}
+
+
+@app.get('/api/maintenance')
+async def maintenance_status():
+    info = retention.status()
+    try:
+        info["database"] = await asyncio.to_thread(retention.database_size, get_db())
+    except Exception as e:
+        info["database"] = {"error": str(e)}
+    return {"ok": True, **info}
+
+
+@app.post('/api/maintenance/run')
+async def maintenance_run(payload: dict | None = None):
+    # Archive expired rows and compact the database file now
+    payload = payload or {}
+    if payload.get('compact', True) and await asyncio.to_thread(pipeline_active):
+        return JSONResponse({"ok": False, "error": "pipeline_running"}, status_code=409)
+    result = await asyncio.to_thread(retention.run_maintenance, get_db(),
+                                     bool(payload.get('compact', True)), bool(payload.get('force', False)))
+    return result if result.get("ok") else JSONResponse(result, status_code=409 if "already" in result.get("error", "") else 500)
 
 
 @app.post('/api/whatsapp/send-latest')
-async def send_latest_to_whatsapp():
+def send_latest_to_whatsapp():
     """Send the 5 latest stories from DuckDB to the configured WhatsApp phone."""
     whatsapp_phone = os.getenv("WHATSAPP_PHONE")
     if not whatsapp_phone:
@@ -501,45 +852,49 @@ async def send_latest_to_whatsapp():
     if not whatsapp_service.is_connected:
         return JSONResponse({"ok": False, "error": "WhatsApp service not connected"}, status_code=400)
 
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
+    if not os.path.exists(resolve_db_path()):
         return JSONResponse({"ok": False, "error": "No stories found (database missing)"}, status_code=404)
 
-    con = duckdb.connect(db_path)
     try:
-        rows = con.execute('SELECT title, summary FROM top_stories ORDER BY processed_at DESC LIMIT 5').fetchall()
+        with get_db().cursor() as con:
+            rows = con.execute('SELECT title, summary FROM top_stories ORDER BY processed_at DESC LIMIT 5').fetchall()
         if not rows:
             return JSONResponse({"ok": False, "error": "No stories found in database"}, status_code=404)
         
         stories = [{"title": r[0], "summary": r[1]} for r in rows]
         message = format_stories_for_whatsapp(stories)
-        whatsapp_service.send_notification(whatsapp_phone, message)
-        return {"ok": True, "message": f"Latest reports sent to {whatsapp_phone}"}
+        message_id = whatsapp_service.send_notification(whatsapp_phone, message)
+        return {"ok": True, "message": f"Latest reports queued for {whatsapp_phone}", "message_id": message_id}
     except Exception as e:
         return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
-    finally:
-        con.close()
+
+
+@app.get('/api/whatsapp/messages')
+async def whatsapp_messages(limit: int = 50):
+    # Outbound queue with delivery status: queued, sending, retrying, sent or failed
+    return {"ok": True, "messages": whatsapp_service.list_messages(max(1, min(limit, 500))),
+            "counts": whatsapp_service.outbox_counts()}
+
+
+@app.get('/api/whatsapp/messages/{message_id}')
+async def whatsapp_message(message_id: str):
+    msg = whatsapp_service.get_message(message_id)
+    if msg is None:
+        return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
+    return {"ok": True, "message": msg}
 
 
 @app.get('/api/emails')
-async def emails():
-    db_path = resolve_db_path()
-    if not os.path.exists(db_path):
-        return {"ok": True, "emails": []}
-    con = duckdb.connect(db_path)
-    try:
-        rows = con.execute('SELECT id, subject, sender_email, date_iso, substring(body,1,1000) as body, fetched_at FROM emails ORDER BY fetched_at DESC').fetchall()
-        cols = [c[0] for c in con.description]
-        emails = [dict(zip(cols, r)) for r in rows]
-        return {"ok": True, "emails": emails}
-    finally:
-        con.close()
+def emails(limit: int | None = None, cursor: str | None = None, since: str | None = None,
+           until: str | None = None, sender: str | None = None, fields: str | None = None,
+           format: str = "json"):
+    return list_rows(paging.EMAILS, "emails", limit, cursor, since, until, sender, fields, format)
 
 
 @app.post('/api/ai-helper')
 async def ai_helper(payload: dict):
     # A simple wrapper to call the local ollama-based helper via pipeline functions
-    p = get_pipeline()
+    p = await asyncio.to_thread(get_pipeline)
     if p is None:
         return JSONResponse({"ok": False, "error": "pipeline_unavailable"}, status_code=500)
     # The pipeline module exposes generate_social etc. Use call_ollama helper if available
@@ -548,7 +903,7 @@ async def ai_helper(payload: dict):
         prompt = payload.get('prompt') or ''
         summary = payload.get('summary') or ''
         full_prompt = f"User prompt: {prompt}\n\nSummary:\n{summary}"
-        res = call_ollama(full_prompt)
+        res = await asyncio.to_thread(call_ollama, full_prompt, use_cache=False)
         return {"ok": True, "response": res}
     except Exception as e:
         return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
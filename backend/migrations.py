@@ -0,0 +1,263 @@
+"""Versioned schema migrations for top_news.duckdb.
+
+Each migration runs once, in order, inside its own transaction and is
+recorded in schema_version. Add new steps to the end of MIGRATIONS; never edit
+one that has shipped.
+"""
+from datetime import date
+from typing import Callable, Iterable, List, Tuple
+
+# Story tags kept per (day, sender) in daily_rollups
+ROLLUP_TOP_TAGS = 3
+
+
+def _v1_base_tables(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS emails (
+            id TEXT PRIMARY KEY,
+            subject TEXT,
+            sender_email TEXT,
+            date_iso TEXT,
+            body TEXT,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS top_stories (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            summary TEXT,
+            linkedIn TEXT,
+            x_post TEXT,
+            branding_tag TEXT,
+            action_suggestion TEXT,
+            score DOUBLE,
+            date_iso TEXT,
+            sender_email TEXT,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Newsletter and priority keyword tables managed via UI
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS newsletter_addresses (
+            id TEXT PRIMARY KEY,
+            sender TEXT,
+            email TEXT,
+            priority INTEGER
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS priority_keywords (
+            keyword TEXT PRIMARY KEY,
+            score DOUBLE
+        )
+    """)
+
+
+def _v2_pipeline_state(con):
+    # Last Gmail historyId synced, per whitelist fingerprint
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS gmail_sync_state (
+            account TEXT PRIMARY KEY,
+            history_id TEXT,
+            whitelist_hash TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Per-email LLM processing state so reruns skip emails already extracted
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS email_processing (
+            email_id TEXT PRIMARY KEY,
+            status TEXT,
+            model TEXT,
+            prompt_version TEXT,
+            body_hash TEXT,
+            stories TEXT,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS story_embeddings (
+            text_hash TEXT,
+            model TEXT,
+            vector FLOAT[],
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (text_hash, model)
+        )
+    """)
+
+
+def _v3_time_and_sender_indexes(con):
+    con.execute("CREATE INDEX IF NOT EXISTS idx_top_stories_processed_at ON top_stories (processed_at)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_top_stories_sender ON top_stories (sender_email)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emails_fetched_at ON emails (fetched_at)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender_email)")
+
+
+def _v4_daily_rollups(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day DATE,
+            sender_email TEXT,
+            story_count INTEGER,
+            avg_score DOUBLE,
+            top_tags TEXT[],
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (day, sender_email)
+        )
+    """)
+    # Backfill from the existing history once
+    refresh_daily_rollups(con)
+
+
+def _v5_archive_views(con):
+    # emails_all / top_stories_all; rebuilt by retention after each archive pass
+    import retention
+    retention.ensure_views(con)
+
+
+def _v6_search_index_state(con):
+    # Table signature each BM25 index was last built from (see search.py)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS search_index_state (
+            table_name TEXT PRIMARY KEY,
+            signature TEXT,
+            built_at TIMESTAMP
+        )
+    """)
+
+
+def _v7_jobs(con):
+    # Persistent job queue and cron schedules (see jobs.py)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT,
+            dedupe_key TEXT,
+            status TEXT,
+            payload TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER DEFAULT 0,
+            triggered_by TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_s DOUBLE
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs (kind, status)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS job_schedules (
+            name TEXT PRIMARY KEY,
+            kind TEXT,
+            cron TEXT,
+            payload TEXT,
+            enabled BOOLEAN DEFAULT true,
+            last_fired_at TIMESTAMP,
+            next_run_at TIMESTAMP
+        )
+    """)
+
+
+def _v8_run_checkpoints(con):
+    # Cleaned text is kept per email so a resumed run skips straight to extraction
+    con.execute("ALTER TABLE email_processing ADD COLUMN IF NOT EXISTS cleaned TEXT")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            stage TEXT,
+            email_ids TEXT,
+            story_count INTEGER,
+            timings TEXT,
+            error TEXT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_runs_started_at ON pipeline_runs (started_at)")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "base tables", _v1_base_tables),
+    (2, "pipeline state tables", _v2_pipeline_state),
+    (3, "time and sender indexes", _v3_time_and_sender_indexes),
+    (4, "daily rollups", _v4_daily_rollups),
+    (5, "archive views", _v5_archive_views),
+    (6, "search index state", _v6_search_index_state),
+    (7, "jobs", _v7_jobs),
+    (8, "run checkpoints", _v8_run_checkpoints),
+]
+
+
+def current_version(con) -> int:
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # fetchall so no open result keeps a transaction alive on this connection
+    rows = con.execute("SELECT max(version) FROM schema_version").fetchall()
+    return rows[0][0] or 0
+
+
+def migrate(con) -> int:
+    """Apply pending migrations; returns the resulting schema version."""
+    version = current_version(con)
+    for num, name, step in MIGRATIONS:
+        if num <= version:
+            continue
+        con.execute("BEGIN TRANSACTION")
+        try:
+            step(con)
+            con.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (num, name))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        print(f"[info] Applied schema migration {num}: {name}")
+        version = num
+    return version
+
+
+def refresh_daily_rollups(con, days: Iterable[date] | None = None) -> None:
+    """Recompute daily_rollups for `days` (all days when None) from top_stories.
+
+    The pipeline passes only the days touched by a run, so the cost stays
+    proportional to one day of stories rather than the whole history.
+    """
+    where, params = "", []
+    if days is not None:
+        days = sorted(set(days))
+        if not days:
+            return
+        placeholders = ",".join("?" for _ in days)
+        where = f"WHERE CAST(processed_at AS DATE) IN ({placeholders})"
+        params = list(days)
+        con.execute(f"DELETE FROM daily_rollups WHERE day IN ({placeholders})", params)
+    else:
+        con.execute("DELETE FROM daily_rollups")
+    con.execute(f"""
+        INSERT INTO daily_rollups (day, sender_email, story_count, avg_score, top_tags)
+        WITH s AS (
+            SELECT CAST(processed_at AS DATE) AS day, coalesce(sender_email, '') AS sender_email,
+                   score, nullif(trim(branding_tag), '') AS tag
+            FROM top_stories {where}
+        ),
+        tags AS (
+            SELECT day, sender_email, tag, count(*) AS n
+            FROM s WHERE tag IS NOT NULL GROUP BY day, sender_email, tag
+        ),
+        top AS (
+            SELECT day, sender_email, list(tag ORDER BY n DESC, tag)[1:{ROLLUP_TOP_TAGS}] AS top_tags
+            FROM tags GROUP BY day, sender_email
+        )
+        SELECT s.day, s.sender_email, count(*), avg(s.score), coalesce(any_value(top.top_tags), [])
+        FROM s LEFT JOIN top USING (day, sender_email)
+        GROUP BY s.day, s.sender_email
+    """, params)
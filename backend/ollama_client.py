@@ -0,0 +1,270 @@
+"""Shared HTTP client for the Ollama server.
+
+The pipeline and the API endpoints go through one pooled `requests.Session`,
+so the hundreds of calls in a run reuse keep-alive connections instead of
+opening a new TCP connection each time.
+"""
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict
+
+import settings  # noqa: F401 - loads .env before config is read
+
+# Allow overriding Ollama server/base URL via environment variable so we don't
+# hardcode localhost/port in multiple places. When not set, default to
+# localhost:11434 which is the Ollama local server default.
+OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+# A full OLLAMA_URL still wins for the generate endpoint
+OLLAMA_URL = os.getenv("OLLAMA_URL", f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate")
+
+# Connections kept open to the Ollama host; should be >= PIPELINE_CONCURRENCY
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", 10))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", 300))
+# How long Ollama keeps the model loaded after a request, so it is not
+# unloaded between the clean, extract and social stages
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Streaming mode reads Ollama's NDJSON token stream. The idle timeout is the
+# longest gap allowed between chunks (it also covers prompt prefill before the
+# first token); the optional max bounds the whole generation.
+OLLAMA_STREAM = os.getenv("OLLAMA_STREAM", "true").lower() == "true"
+OLLAMA_STREAM_IDLE_TIMEOUT = float(os.getenv("OLLAMA_STREAM_IDLE_TIMEOUT", 120))
+OLLAMA_STREAM_MAX_SECONDS = float(os.getenv("OLLAMA_STREAM_MAX_SECONDS", 0))
+# Longest gap allowed between progress lines of a model pull (large layers
+# can sit in "verifying" for a while)
+OLLAMA_PULL_IDLE_TIMEOUT = float(os.getenv("OLLAMA_PULL_IDLE_TIMEOUT", 600))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def api_url(path: str) -> str:
+    return OLLAMA_BASE_URL.rstrip('/') + path
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            # Retries are handled by callers; the adapter only pools connections
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE, max_retries=0)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers.update({"Content-Type": "application/json"})
+            _session = s
+        return _session
+
+
+def _timeout(timeout):
+    if timeout is None:
+        return (OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+    return timeout
+
+
+def get(path: str, timeout=None, **kwargs) -> requests.Response:
+    return get_session().get(api_url(path), timeout=_timeout(timeout), **kwargs)
+
+
+def post(path: str, payload: Dict[str, Any], timeout=None, **kwargs) -> requests.Response:
+    return get_session().post(api_url(path), json=payload, timeout=_timeout(timeout), **kwargs)
+
+
+def generate(payload: Dict[str, Any], timeout=None, **kwargs) -> requests.Response:
+    """POST to the generate endpoint, adding keep_alive unless the caller set it."""
+    if OLLAMA_KEEP_ALIVE and "keep_alive" not in payload:
+        payload = {**payload, "keep_alive": OLLAMA_KEEP_ALIVE}
+    return get_session().post(OLLAMA_URL, json=payload, timeout=_timeout(timeout), **kwargs)
+
+
+class JsonStreamScanner:
+    """Incrementally finds the first balanced JSON object/array in a text stream.
+
+    Tracks bracket depth across fed chunks and ignores brackets inside string
+    literals, so each character is looked at exactly once.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+        self.start = None
+        self.end = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str) -> bool:
+        if self.complete:
+            return True
+        self.parts.append(chunk)
+        for ch in chunk:
+            idx = self.pos
+            self.pos += 1
+            if self.start is None:
+                if ch in "{[":
+                    self.start = idx
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = idx + 1
+                    return True
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def json_text(self) -> str | None:
+        if not self.complete:
+            return None
+        return self.text[self.start:self.end]
+
+
+def generate_stream(payload: Dict[str, Any], on_token: Callable[[str], None] | None = None,
+                    stop_on_json: bool = False, idle_timeout: float | None = None,
+                    max_seconds: float | None = None) -> str:
+    """Stream a generation and return the response text.
+
+    `on_token` receives each partial chunk as it arrives. With `stop_on_json`
+    the stream is closed as soon as a balanced JSON value has been produced
+    (Ollama stops generating when the client disconnects) and only that JSON
+    text is returned.
+    """
+    payload = {**payload, "stream": True}
+    idle = idle_timeout or OLLAMA_STREAM_IDLE_TIMEOUT
+    limit = OLLAMA_STREAM_MAX_SECONDS if max_seconds is None else max_seconds
+    started = time.monotonic()
+    scanner = JsonStreamScanner()
+    resp = generate(payload, timeout=(OLLAMA_CONNECT_TIMEOUT, idle), stream=True)
+    try:
+        resp.raise_for_status()
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            msg = json.loads(line)
+            if msg.get("error"):
+                raise RuntimeError(msg["error"])
+            token = msg.get("response") or ""
+            if token:
+                if on_token:
+                    on_token(token)
+                if scanner.feed(token) and stop_on_json:
+                    return scanner.json_text()
+            if msg.get("done"):
+                break
+            if limit and time.monotonic() - started > limit:
+                raise requests.exceptions.Timeout(f"generation exceeded {limit:.0f}s")
+    finally:
+        resp.close()
+    return scanner.text
+
+
+# Model management (/api/tags, /api/ps, /api/pull, /api/delete). These block,
+# so async endpoints call them through asyncio.to_thread or a job.
+def list_models() -> list:
+    """Downloaded models as returned by /api/tags."""
+    r = get('/api/tags', timeout=(OLLAMA_CONNECT_TIMEOUT, 10))
+    r.raise_for_status()
+    return r.json().get("models") or []
+
+
+def running_models() -> list:
+    """Models currently loaded in memory (/api/ps)."""
+    r = get('/api/ps', timeout=(OLLAMA_CONNECT_TIMEOUT, 10))
+    r.raise_for_status()
+    return r.json().get("models") or []
+
+
+def server_up(timeout: float = 2) -> bool:
+    try:
+        return get('/api/version', timeout=timeout).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def delete_model(model: str) -> None:
+    r = get_session().delete(api_url('/api/delete'), json={"model": model}, timeout=_timeout(None))
+    if r.status_code == 404:
+        raise ValueError(f"model not found: {model}")
+    r.raise_for_status()
+
+
+def load_model(model: str, keep_alive: str | None = None) -> None:
+    """Load `model` into memory; a generate request without a prompt only loads it."""
+    r = post('/api/generate', {"model": model, "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE or "5m"})
+    r.raise_for_status()
+
+
+def unload_model(model: str) -> None:
+    r = post('/api/generate', {"model": model, "keep_alive": 0})
+    r.raise_for_status()
+
+
+def pull_model(model: str, on_progress: Callable[[Dict[str, Any]], None] | None = None,
+               cancel: threading.Event | None = None) -> Dict[str, Any]:
+    """Pull `model` through the streaming /api/pull endpoint.
+
+    `on_progress` receives each status line with `completed` / `total` summed
+    over all layers, so callers get overall byte progress. Setting `cancel`
+    closes the stream; Ollama keeps the layers already downloaded and the next
+    pull resumes from them.
+    """
+    layers: Dict[str, tuple] = {}
+    status = None
+    resp = post('/api/pull', {"model": model, "stream": True},
+                timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_PULL_IDLE_TIMEOUT), stream=True)
+    try:
+        resp.raise_for_status()
+        for line in resp.iter_lines(decode_unicode=True):
+            if cancel is not None and cancel.is_set():
+                raise InterruptedError(f"pull of {model} cancelled")
+            if not line:
+                continue
+            msg = json.loads(line)
+            if msg.get("error"):
+                raise RuntimeError(msg["error"])
+            status = msg.get("status") or status
+            if msg.get("digest") and msg.get("total"):
+                layers[msg["digest"]] = (int(msg.get("completed") or 0), int(msg["total"]))
+            if on_progress:
+                on_progress({
+                    "status": status,
+                    "digest": msg.get("digest"),
+                    "completed": sum(c for c, _ in layers.values()),
+                    "total": sum(t for _, t in layers.values()),
+                })
+    finally:
+        resp.close()
+    if status != "success":
+        raise RuntimeError(f"pull of {model} ended with status {status!r}")
+    return {"model": model, "bytes": sum(t for _, t in layers.values())}
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,165 @@
+"""Keyset-paginated, filterable listings for /api/stories and /api/emails.
+
+Rows are ordered newest first by (timestamp, id). A page returns an opaque
+cursor encoding the last (timestamp, id) seen, so the next page is a cheap
+range scan instead of an OFFSET over the whole history. Results can also be
+streamed as NDJSON or Arrow IPC straight from DuckDB without materialising
+Python dicts for every row.
+"""
+import io
+import json
+import base64
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List
+
+# Batch size used when streaming rows out of DuckDB
+STREAM_BATCH_ROWS = 2048
+
+
+class Listing:
+    def __init__(self, table: str, ts_col: str, columns: Dict[str, str], sender_col: str = "sender_email"):
+        # columns maps public field name -> SQL expression
+        self.table = table
+        self.ts_col = ts_col
+        self.columns = columns
+        self.sender_col = sender_col
+
+
+# Hot and archived stories together (see retention.ensure_views)
+STORIES = Listing("top_stories_all", "processed_at", {
+    "id": "id",
+    "title": "title",
+    "summary": "summary",
+    "linkedIn": "linkedIn",
+    "x_post": "x_post",
+    "branding_tag": "branding_tag",
+    "action_suggestion": "action_suggestion",
+    "score": "score",
+    "date_iso": "date_iso",
+    "sender_email": "sender_email",
+    "processed_at": "processed_at",
+})
+
+# Archived bodies are read back from Parquet through the view
+EMAILS = Listing("emails_all", "fetched_at", {
+    "id": "id",
+    "subject": "subject",
+    "sender_email": "sender_email",
+    "date_iso": "date_iso",
+    "body": "substring(body,1,1000)",
+    "fetched_at": "fetched_at",
+})
+
+
+def encode_cursor(ts: Any, row_id: Any) -> str:
+    raw = json.dumps([ts.isoformat() if hasattr(ts, "isoformat") else ts, row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(ts), row_id
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {e}") from e
+
+
+def parse_fields(listing: Listing, fields: str | None) -> List[str]:
+    if not fields:
+        return list(listing.columns)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in listing.columns]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    # The keyset columns are always returned so the caller can page
+    for required in ("id", listing.ts_col):
+        if required not in wanted:
+            wanted.append(required)
+    return wanted
+
+
+def build_query(listing: Listing, fields: List[str], limit: int | None = None, cursor: str | None = None,
+                since: str | None = None, until: str | None = None, sender: str | None = None) -> tuple[str, list]:
+    select = ", ".join(f'{listing.columns[f]} AS "{f}"' for f in fields)
+    where, params = [], []
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        where.append(f"({listing.ts_col} < ? OR ({listing.ts_col} = ? AND id < ?))")
+        params += [ts, ts, row_id]
+    if since:
+        where.append(f"{listing.ts_col} >= CAST(? AS TIMESTAMP)")
+        params.append(since)
+    if until:
+        where.append(f"{listing.ts_col} < CAST(? AS TIMESTAMP)")
+        params.append(until)
+    if sender:
+        where.append(f"lower({listing.sender_col}) = ?")
+        params.append(sender.strip().lower())
+    sql = f"SELECT {select} FROM {listing.table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {listing.ts_col} DESC, id DESC"
+    if limit is not None:
+        # One extra row tells us whether another page exists
+        sql += " LIMIT ?"
+        params.append(int(limit) + 1)
+    return sql, params
+
+
+def fetch_page(con, listing: Listing, fields: List[str], limit: int | None, **filters) -> Dict[str, Any]:
+    sql, params = build_query(listing, fields, limit=limit, **filters)
+    rows = con.execute(sql, params).fetchall()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(fields, rows[-1]))
+        next_cursor = encode_cursor(last[listing.ts_col], last["id"])
+    return {"rows": [dict(zip(fields, r)) for r in rows], "next_cursor": next_cursor}
+
+
+def _json_default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return str(o)
+
+
+def stream_ndjson(open_cursor, listing: Listing, fields: List[str], limit: int | None, **filters) -> Iterator[bytes]:
+    """Yield one JSON object per line; `open_cursor` is a context manager factory."""
+    sql, params = build_query(listing, fields, **filters)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    with open_cursor() as con:
+        res = con.execute(sql, params)
+        while True:
+            batch = res.fetchmany(STREAM_BATCH_ROWS)
+            if not batch:
+                break
+            yield b"".join((json.dumps(dict(zip(fields, r)), default=_json_default) + "\n").encode("utf-8") for r in batch)
+
+
+def stream_arrow(open_cursor, listing: Listing, fields: List[str], limit: int | None, **filters) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream built from DuckDB's record batches (needs pyarrow)."""
+    import pyarrow as pa
+
+    sql, params = build_query(listing, fields, **filters)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    with open_cursor() as con:
+        reader = con.execute(sql, params).fetch_record_batch(STREAM_BATCH_ROWS)
+        sink = io.BytesIO()
+        writer = pa.ipc.new_stream(sink, reader.schema)
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(sink)
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    # Hand out what the IPC writer produced so far and reuse the buffer
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
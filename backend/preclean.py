@@ -0,0 +1,148 @@
+"""Rule-based pre-cleaning of newsletter bodies before CLEAN_PROMPT.
+
+Cheap, deterministic passes strip what the LLM would otherwise be asked to
+remove:
+- URLs, which are mostly tracking redirects.
+- Zero-width characters.
+- Short "View in browser", "unsubscribe" and similar lines.
+- The footer, from the first short unsubscribe-style line in the last part
+  of the email.
+
+Only lines up to PRECLEAN_MAX_RULE_LINE_CHARS are matched against these
+rules, so a story paragraph that mentions unsubscribing is kept. Links such
+as "Privacy Policy" or "Terms of Service" are dropped only when they make up
+the whole line.
+
+Per-sender boilerplate fingerprints go further. A line that recurs in most of
+a sender's recent emails (see learn_fingerprints) is the sender's own
+template: header, sponsor slot or footer. It is dropped too.
+
+The LLM then gets a much shorter prompt. A body that is already short after
+pre-cleaning (PRECLEAN_SKIP_LLM_TOKENS) skips CLEAN_PROMPT entirely.
+"""
+import os
+import re
+import hashlib
+from typing import Dict, Iterable, List, Set
+
+import settings  # noqa: F401 - loads .env before config is read
+from chunking import count_tokens
+
+PRECLEAN_ENABLED = os.getenv("PRECLEAN_ENABLED", "true").lower() == "true"
+# Bodies at or under this many tokens after pre-cleaning skip CLEAN_PROMPT (0 = never skip)
+PRECLEAN_SKIP_LLM_TOKENS = int(os.getenv("PRECLEAN_SKIP_LLM_TOKENS", 300))
+# Fingerprints come from each sender's last PRECLEAN_HISTORY emails; a line is
+# boilerplate when it shows up in PRECLEAN_MIN_SHARE of them
+PRECLEAN_HISTORY = int(os.getenv("PRECLEAN_HISTORY", 20))
+PRECLEAN_MIN_EMAILS = int(os.getenv("PRECLEAN_MIN_EMAILS", 3))
+PRECLEAN_MIN_SHARE = float(os.getenv("PRECLEAN_MIN_SHARE", 0.6))
+# Shorter lines (section titles and the like) are never fingerprinted
+PRECLEAN_MIN_LINE_CHARS = int(os.getenv("PRECLEAN_MIN_LINE_CHARS", 25))
+# The footer cut only applies to a marker in the last part of the email
+FOOTER_START_RATIO = 0.5
+# Boilerplate and footer rules only look at lines up to this long (links not
+# counted); longer lines are story paragraphs that merely mention "unsubscribe"
+PRECLEAN_MAX_RULE_LINE_CHARS = int(os.getenv("PRECLEAN_MAX_RULE_LINE_CHARS", 120))
+
+_URL_RE = re.compile(r"[<(\[]?\s*(?:https?://|www\.)[^\s<>()\[\]]+\s*[>)\]]?", re.IGNORECASE)
+_INVISIBLE_RE = re.compile(r"[​-‏­͏⁠﻿]")
+_BOILERPLATE_LINE_RE = re.compile(
+    r"view (?:this (?:email|post) )?(?:in|on) (?:your |a |the )?(?:browser|web)"
+    r"|unsubscribe|manage (?:your )?(?:subscription|preferences|email)"
+    r"|update (?:your )?(?:email )?preferences|email preferences"
+    r"|forward(?:ed)? (?:this )?(?:email )?to a friend|add us to your address book"
+    r"|all rights reserved|^\s*(?:©|\(c\)|copyright)\b",
+    re.IGNORECASE)
+# Phrases that also turn up in news ("changed its terms of service") only
+# count when the whole line is made of them, as in a footer link row
+_NAV_ITEM = r"(?:privacy policy|terms of (?:service|use)|follow us on\b[^.!?]*|download (?:the|our) app\b[^.!?]*)"
+_NAV_LINE_RE = re.compile(
+    rf"^[\W_]*{_NAV_ITEM}(?:(?:[\s|•·/,&\-–—]|\band\b)+{_NAV_ITEM})*[\W_]*$",
+    re.IGNORECASE)
+_FOOTER_START_RE = re.compile(
+    r"unsubscribe|you(?:'re| are) receiving this|no longer (?:wish|want) to receive"
+    r"|(?:was|were) sent to \S+@|manage (?:your )?(?:subscription|preferences)",
+    re.IGNORECASE)
+_NORMALIZE_RE = re.compile(r"[\W_]+")
+
+
+def _normalize(line: str) -> str:
+    # Case, punctuation, digits and URLs do not make a line different
+    line = _URL_RE.sub(" ", line.lower())
+    return _NORMALIZE_RE.sub(" ", re.sub(r"\d+", "0", line)).strip()
+
+
+def _rule_applies(line: str, pattern: re.Pattern) -> bool:
+    text = _URL_RE.sub("", line).strip()
+    return len(text) <= PRECLEAN_MAX_RULE_LINE_CHARS and bool(pattern.search(text))
+
+
+def line_fingerprint(line: str) -> str | None:
+    norm = _normalize(line)
+    if len(norm) < PRECLEAN_MIN_LINE_CHARS:
+        return None
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()[:16]
+
+
+def learn_fingerprints(con, senders: Iterable[str]) -> Dict[str, Set[str]]:
+    """Boilerplate line fingerprints per sender, learned from stored emails."""
+    senders = sorted({s for s in senders if s})
+    if not senders:
+        return {}
+    rows = con.execute(f"""
+        SELECT sender_email, body FROM emails
+        WHERE body IS NOT NULL AND sender_email IN ({",".join("?" for _ in senders)})
+        QUALIFY row_number() OVER (PARTITION BY sender_email ORDER BY fetched_at DESC) <= ?
+    """, (*senders, PRECLEAN_HISTORY)).fetchall()
+    bodies: Dict[str, List[str]] = {}
+    for sender, body in rows:
+        bodies.setdefault(sender, []).append(body)
+    out = {}
+    for sender, texts in bodies.items():
+        if len(texts) < PRECLEAN_MIN_EMAILS:
+            continue
+        counts: Dict[str, int] = {}
+        for body in texts:
+            # Each line counts once per email
+            for fp in {line_fingerprint(l) for l in body.splitlines()} - {None}:
+                counts[fp] = counts.get(fp, 0) + 1
+        need = max(2, PRECLEAN_MIN_SHARE * len(texts))
+        prints = {fp for fp, n in counts.items() if n >= need}
+        if prints:
+            out[sender] = prints
+    return out
+
+
+def preclean(body: str, fingerprints: Set[str] | None = None) -> str:
+    """Strip URLs, boilerplate lines, the footer and `fingerprints` lines from `body`."""
+    if not body:
+        return ""
+    text = _INVISIBLE_RE.sub("", body.replace("\r\n", "\n").replace("\r", "\n").replace(" ", " "))
+    lines = text.split("\n")
+
+    # Everything from the first unsubscribe-style line in the tail is footer
+    for i in range(int(len(lines) * FOOTER_START_RATIO), len(lines)):
+        if _rule_applies(lines[i], _FOOTER_START_RE):
+            lines = lines[:i]
+            break
+
+    out = []
+    for line in lines:
+        if _rule_applies(line, _BOILERPLATE_LINE_RE) or _rule_applies(line, _NAV_LINE_RE):
+            continue
+        if fingerprints and line_fingerprint(line) in fingerprints:
+            continue
+        stripped = _URL_RE.sub("", line).rstrip()
+        if line.strip() and not stripped.strip():
+            # Nothing but links
+            continue
+        out.append(stripped)
+
+    text = "\n".join(out)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    return re.sub(r"\n\s*\n(?:\s*\n)+", "\n\n", text).strip()
+
+
+def skips_llm(text: str) -> bool:
+    """True when pre-cleaned text is short enough to go straight to extraction."""
+    return PRECLEAN_SKIP_LLM_TOKENS > 0 and count_tokens(text) <= PRECLEAN_SKIP_LLM_TOKENS
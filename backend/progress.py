@@ -0,0 +1,150 @@
+"""Pipeline progress events.
+
+NewsPipeline.run reports stage starts/ends and per-item progress through a
+RunProgress, which publishes to the process-wide ProgressBus. The bus keeps
+a short history, so a client that connects mid-run can replay what it missed
+(runs that already finished are not replayed to new clients).
+It also fans events out to asyncio subscribers: the SSE endpoint in main.py
+streams them to the dashboard. Each stage end carries its duration, and the
+closing "run" event carries the per-stage totals. Model pulls report on a
+separate "models" bus so pipeline listeners never see them.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+# Events kept for replay to late subscribers
+PROGRESS_HISTORY = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class ProgressBus:
+    def __init__(self, history: int = PROGRESS_HISTORY):
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Record `event` and hand it to every subscriber; safe from any thread."""
+        with self._lock:
+            self._seq += 1
+            event["seq"] = self._seq
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone
+                self._discard(queue)
+        return event
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue of future events for the running event loop."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._discard(queue)
+
+    def _discard(self, queue):
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[1] is not queue}
+
+    def history(self, after_seq: int = 0, run_id: str | None = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            events = list(self._history)
+        return [e for e in events if e["seq"] > after_seq and (run_id is None or e["run_id"] == run_id)]
+
+    def replay(self, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Events of the latest run a new subscriber should see first.
+
+        A fresh client (after_seq 0) only gets a run that is still in flight:
+        replaying a finished run's end would make it think a run it just
+        queued is already done. A reconnecting client still gets the events
+        it missed, end included.
+        """
+        run_id = self.last_run_id()
+        events = self.history(after_seq=after_seq, run_id=run_id) if run_id else []
+        if not after_seq and any(e["stage"] == "run" and e["event"] == "end" for e in events):
+            return []
+        return events
+
+    def last_run_id(self) -> str | None:
+        with self._lock:
+            return self._history[-1]["run_id"] if self._history else None
+
+
+def _offer(queue: asyncio.Queue, event: Dict[str, Any]):
+    # A slow client loses its oldest events rather than blocking the pipeline
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+class RunProgress:
+    """Progress reporter for one pipeline run."""
+
+    def __init__(self, bus: ProgressBus | None = None, run_id: str | None = None):
+        self.bus = bus or get_bus()
+        self.run_id = run_id or str(uuid.uuid4())
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def emit(self, stage: str, event: str = "progress", message: str = "", **data) -> None:
+        self.bus.publish({
+            "run_id": self.run_id,
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "elapsed_s": round(time.perf_counter() - self._started, 3),
+            "stage": stage,
+            "event": event,
+            "message": message,
+            **data,
+        })
+
+    @contextmanager
+    def stage(self, name: str, message: str = "", **data):
+        """Time a pipeline stage; repeated stages accumulate."""
+        self.emit(name, "start", message, **data)
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self.timings[name] = round(self.timings.get(name, 0.0) + seconds, 3)
+            self.emit(name, "end", message, seconds=round(seconds, 3))
+
+    def step(self, stage: str, current: int, total: int, message: str = "", **data) -> None:
+        self.emit(stage, "progress", message, current=current, total=total, **data)
+
+    def start(self, message: str = "Pipeline started", **data) -> None:
+        self.emit("run", "start", message, **data)
+
+    def finish(self, status: str = "done", message: str = "", **data) -> None:
+        self.emit("run", "end", message or f"Pipeline {status}", status=status, timings=dict(self.timings),
+                  seconds=round(time.perf_counter() - self._started, 3), **data)
+
+
+# Shared instances, one per topic ("pipeline" runs, "models" pulls)
+_buses: Dict[str, ProgressBus] = {}
+_buses_lock = threading.Lock()
+
+
+def get_bus(topic: str = "pipeline") -> ProgressBus:
+    with _buses_lock:
+        if topic not in _buses:
+            _buses[topic] = ProgressBus()
+        return _buses[topic]
@@ -13,7 +13,7 @@ def _load_json():
 
 def _load_individual():
     out = {}
-    for name in ("CLEAN_PROMPT", "EXTRACT_PROMPT", "SOCIAL_PROMPT"):
+    for name in _DEFAULTS:
         p = os.path.join(BASE, f"{name}.txt")
         if os.path.exists(p):
             with open(p, "r", encoding="utf-8") as f:
@@ -29,7 +29,7 @@ def _load_from_prompts_txt():
         with open(p, "r", encoding="utf-8") as f:
             s = f.read()
         # headers like "### CLEAN_PROMPT" or "== CLEAN_PROMPT =="
-        hdr_re = re.compile(r'^\s*(?:#+|=+|-+)\s*(CLEAN_PROMPT|EXTRACT_PROMPT|SOCIAL_PROMPT)\s*$', re.MULTILINE)
+        hdr_re = re.compile(r'^\s*(?:#+|=+|-+)\s*(CLEAN_PROMPT|EXTRACT_PROMPT|SOCIAL_BATCH_PROMPT|SOCIAL_PROMPT)\s*$', re.MULTILINE)
         matches = list(hdr_re.finditer(s))
         if not matches:
             # no matching headers -> put entire file into CLEAN_PROMPT
@@ -69,14 +69,36 @@ _DEFAULTS = {
         "Return only JSON with this exact structure: "
         "{{\"linkedIn\":\"...\",\"x\":\"...\",\"branding_tag\":\"...\",\"action_suggestion\":\"...\"}}\\n\\n"
         "Title: {title}\\nSummary: {summary}"
+    ),
+    "SOCIAL_BATCH_PROMPT": (
+        "You are a concise social media writer and content strategist. For each of the {count} numbered stories below, "
+        "produce an object with fields: \"id\" (the story's number), \"linkedIn\" (a 2-4 sentence LinkedIn post suitable "
+        "for professionals), \"x\" (a ≤280-character post suitable for X/Twitter, punchy and factual), "
+        "\"branding_tag\" (single recommended hashtag or short tag like '#AILeadership'), "
+        "and \"action_suggestion\" (one short actionable suggestion, e.g. 'Share this with your team'). "
+        "Write each story's posts about that story only. Return only JSON with one entry per story, in order: "
+        "{{\"posts\":[{{\"id\":1,\"linkedIn\":\"...\",\"x\":\"...\",\"branding_tag\":\"...\",\"action_suggestion\":\"...\"}}, ...]}}\\n\\n"
+        "{stories}"
     )
 }
 
-_loaded = {}
-_loaded.update(_load_json())
-_loaded.update(_load_individual())
-_loaded.update(_load_from_prompts_txt())
+_loaded = None
+
+
+def _load():
+    # Prompt files are read on first access, not at import
+    global _loaded
+    if _loaded is None:
+        loaded = {}
+        loaded.update(_load_json())
+        loaded.update(_load_individual())
+        loaded.update(_load_from_prompts_txt())
+        _loaded = {name: loaded.get(name, default) for name, default in _DEFAULTS.items()}
+    return _loaded
+
 
-CLEAN_PROMPT = _loaded.get("CLEAN_PROMPT", _DEFAULTS["CLEAN_PROMPT"])
-EXTRACT_PROMPT = _loaded.get("EXTRACT_PROMPT", _DEFAULTS["EXTRACT_PROMPT"])
-SOCIAL_PROMPT = _loaded.get("SOCIAL_PROMPT", _DEFAULTS["SOCIAL_PROMPT"])
+def __getattr__(name):
+    # CLEAN_PROMPT, EXTRACT_PROMPT, SOCIAL_PROMPT and SOCIAL_BATCH_PROMPT resolve lazily (PEP 562)
+    if name in _DEFAULTS:
+        return _load()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,224 @@
+"""Retention, Parquet archival and compaction for top_news.duckdb.
+
+Email bodies older than RETENTION_BODY_DAYS are exported to ZSTD-compressed
+Parquet files partitioned by year/month under ARCHIVE_DIR and cleared from the
+hot table (the row itself stays so listings and Gmail dedupe keep working).
+With RETENTION_STORY_DAYS set, whole top_stories rows older than that move to
+the archive too; daily_rollups keeps their aggregates. The emails_all and
+top_stories_all views read hot and archived rows together.
+
+Compaction checkpoints the database and, once enough blocks are free, rewrites
+the file so it actually shrinks on disk.
+"""
+import os
+import glob
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+import settings  # noqa: F401 - loads .env before config is read
+import search
+
+BASE_DIR = os.path.dirname(__file__)
+
+RETENTION_BODY_DAYS = int(os.getenv("RETENTION_BODY_DAYS", "30"))
+# 0 keeps every story in the hot table
+RETENTION_STORY_DAYS = int(os.getenv("RETENTION_STORY_DAYS", "0"))
+# Rewrite the file once at least this share of its blocks is free
+COMPACT_MIN_FREE_RATIO = float(os.getenv("COMPACT_MIN_FREE_RATIO", "0.2"))
+# Hours between scheduled archive + compaction passes (0 disables)
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+
+_last_result: Dict[str, Any] = {"running": False, "last_run": None, "result": None}
+_run_lock = threading.Lock()
+
+
+def resolve_archive_dir():
+    val = os.getenv("ARCHIVE_DIR")
+    if not val:
+        return os.path.join(BASE_DIR, "archive")
+    if os.path.isabs(val):
+        return val
+    return os.path.join(BASE_DIR, val)
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _parquet_glob(table: str) -> str:
+    return os.path.join(resolve_archive_dir(), table, "**", "*.parquet")
+
+
+def _has_archive(table: str) -> bool:
+    return bool(glob.glob(_parquet_glob(table), recursive=True))
+
+
+def _archived(table: str) -> str:
+    """SQL condition: the row's id is already in `table`'s Parquet archive."""
+    if not _has_archive(table):
+        return "false"
+    return (f"id IN (SELECT id FROM read_parquet('{_quote(_parquet_glob(table))}', "
+            f"hive_partitioning = true, union_by_name = true))")
+
+
+def _export(con, table: str, where: str, params: list, ts_col: str) -> int:
+    ids = [r[0] for r in con.execute(
+        f"SELECT id FROM {table} WHERE {where} AND NOT ({_archived(table)}) ORDER BY id", params).fetchall()]
+    if not ids:
+        return 0
+    target = os.path.join(resolve_archive_dir(), table)
+    os.makedirs(target, exist_ok=True)
+    # Files are named after the rows they hold, so exporting the same rows again
+    # overwrites them instead of adding a second copy
+    batch = hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+    con.execute(f"""
+        COPY (SELECT *, year({ts_col}) AS year, month({ts_col}) AS month FROM {table}
+              WHERE id IN (SELECT unnest(CAST(? AS VARCHAR[]))))
+        TO '{_quote(target)}'
+        (FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (year, month),
+         FILENAME_PATTERN 'part_{batch}_{{i}}', OVERWRITE_OR_IGNORE)
+    """, [ids])
+    return len(ids)
+
+
+def ensure_views(con) -> None:
+    """(Re)create the views that union hot rows with the Parquet archive."""
+    if _has_archive("emails"):
+        con.execute(f"""
+            CREATE OR REPLACE VIEW emails_archive AS
+            SELECT * EXCLUDE (year, month)
+            FROM read_parquet('{_quote(_parquet_glob("emails"))}', hive_partitioning = true, union_by_name = true)
+        """)
+        con.execute("""
+            CREATE OR REPLACE VIEW emails_all AS
+            SELECT e.id, e.subject, e.sender_email, e.date_iso, coalesce(e.body, a.body) AS body, e.fetched_at
+            FROM emails e LEFT JOIN emails_archive a ON a.id = e.id
+        """)
+    else:
+        con.execute("CREATE OR REPLACE VIEW emails_all AS SELECT * FROM emails")
+    if _has_archive("top_stories"):
+        con.execute(f"""
+            CREATE OR REPLACE VIEW top_stories_archive AS
+            SELECT * EXCLUDE (year, month)
+            FROM read_parquet('{_quote(_parquet_glob("top_stories"))}', hive_partitioning = true, union_by_name = true)
+        """)
+        con.execute("""
+            CREATE OR REPLACE VIEW top_stories_all AS
+            SELECT * FROM top_stories UNION ALL BY NAME SELECT * FROM top_stories_archive
+        """)
+    else:
+        con.execute("CREATE OR REPLACE VIEW top_stories_all AS SELECT * FROM top_stories")
+
+
+def archive_old_rows(db, body_days: int = RETENTION_BODY_DAYS, story_days: int = RETENTION_STORY_DAYS) -> Dict[str, int]:
+    """Export expired rows to Parquet, then drop them from the hot tables.
+
+    Parquet files are not transactional, so the export runs first and only the
+    clean-up is one transaction. It clears rows that are in the archive, which
+    also picks up rows exported by an earlier pass that failed before its
+    clean-up; those are never exported twice.
+    """
+    result = {"emails": 0, "top_stories": 0}
+    email_where = "body IS NOT NULL AND fetched_at < current_timestamp - to_days(CAST(? AS INTEGER))"
+    story_where = "processed_at < current_timestamp - to_days(CAST(? AS INTEGER))"
+    with db.cursor() as con:
+        if body_days > 0:
+            _export(con, "emails", email_where, [body_days], "fetched_at")
+        if story_days > 0:
+            _export(con, "top_stories", story_where, [story_days], "processed_at")
+    with db.transaction() as con:
+        if body_days > 0 and _has_archive("emails"):
+            result["emails"] = con.execute(
+                f"UPDATE emails SET body = NULL WHERE {email_where} AND {_archived('emails')}", [body_days]).fetchone()[0]
+        if story_days > 0 and _has_archive("top_stories"):
+            result["top_stories"] = con.execute(
+                f"DELETE FROM top_stories WHERE {story_where} AND {_archived('top_stories')}", [story_days]).fetchone()[0]
+        ensure_views(con)
+    return result
+
+
+def database_size(db) -> Dict[str, Any]:
+    with db.cursor() as con:
+        try:
+            con.execute("CHECKPOINT")
+        except Exception as e:
+            # Another cursor has a transaction open; the figures are just staler
+            print(f"[warn] CHECKPOINT skipped: {e}")
+        row = con.execute("SELECT total_blocks, free_blocks FROM pragma_database_size()").fetchall()[0]
+    total, free = int(row[0] or 0), int(row[1] or 0)
+    return {
+        "file_bytes": os.path.getsize(db.path) if os.path.exists(db.path) else 0,
+        "total_blocks": total,
+        "free_blocks": free,
+        "free_ratio": (free / total) if total else 0.0,
+    }
+
+
+def compact(db, force: bool = False) -> Dict[str, Any]:
+    """CHECKPOINT, and rewrite the file when enough of it is free space."""
+    before = database_size(db)
+    rewritten = skipped = False
+    if force or before["free_ratio"] >= COMPACT_MIN_FREE_RATIO:
+        # Refused while a pipeline run holds db.run_lock; the next pass retries
+        rewritten = db.rewrite()
+        skipped = not rewritten
+    after = database_size(db) if rewritten else before
+    result = {"rewritten": rewritten, "bytes_before": before["file_bytes"], "bytes_after": after["file_bytes"]}
+    if skipped:
+        result["skipped"] = "pipeline_running"
+    return result
+
+
+def run_maintenance(db, compact_file: bool = True, force: bool = False) -> Dict[str, Any]:
+    """One archive + compaction pass; concurrent calls are skipped."""
+    if not _run_lock.acquire(blocking=False):
+        return {"ok": False, "error": "maintenance_already_running"}
+    started = time.perf_counter()
+    _last_result["running"] = True
+    try:
+        result: Dict[str, Any] = {"ok": True, "archived": archive_old_rows(db)}
+        if any(result["archived"].values()):
+            search.refresh_indexes(db)
+        if compact_file:
+            result["compaction"] = compact(db, force=force)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        print(f"[info] Maintenance: {result}")
+    except Exception as e:
+        print(f"[error] Maintenance failed: {e}")
+        result = {"ok": False, "error": str(e)}
+    finally:
+        _last_result.update(running=False, last_run=datetime.now(timezone.utc).isoformat())
+        _run_lock.release()
+    _last_result["result"] = result
+    return result
+
+
+def status() -> Dict[str, Any]:
+    return dict(_last_result)
+
+
+def start_scheduler(db, busy: Callable[[], bool] = lambda: False,
+                    interval_hours: float = MAINTENANCE_INTERVAL_HOURS) -> threading.Event | None:
+    """Run maintenance every `interval_hours` on a daemon thread.
+
+    A pass is postponed while `busy()` is true (e.g. a pipeline job is queued
+    or running). A run that starts after that check is still safe: the file
+    rewrite is refused while the run holds db.run_lock. Set the returned event
+    to stop the thread.
+    """
+    if interval_hours <= 0:
+        return None
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_hours * 3600):
+            while busy() and not stop.wait(60):
+                pass
+            if not stop.is_set():
+                run_maintenance(db)
+
+    threading.Thread(target=loop, name="db-maintenance", daemon=True).start()
+    return stop
@@ -0,0 +1,167 @@
+"""Full-text search over stored emails and stories.
+
+Uses DuckDB's fts extension (BM25) with one index on emails (subject, body)
+and one on top_stories (title, summary). DuckDB FTS indexes are not updated
+by inserts, so refresh_indexes() rebuilds an index only when its table
+changed since the last build. It runs after every pipeline run and
+maintenance pass. When the extension cannot be loaded (e.g. offline with no
+cached copy), search falls back to a term-count ILIKE match so the endpoint
+keeps working.
+"""
+import os
+from typing import Any, Dict, List
+
+import duckdb
+
+import settings  # noqa: F401 - loads .env before config is read
+
+FTS_STEMMER = os.getenv("FTS_STEMMER", "porter")
+FTS_STOPWORDS = os.getenv("FTS_STOPWORDS", "english")
+SNIPPET_CHARS = 240
+
+# table -> (kind, id column, text fields, title expr, text expr, timestamp column)
+INDEXES = {
+    "emails": ("email", "id", ["subject", "body"], "subject", "body", "fetched_at"),
+    "top_stories": ("story", "id", ["title", "summary"], "title", "summary", "processed_at"),
+}
+KINDS = {"emails": ["emails"], "stories": ["top_stories"], "all": ["emails", "top_stories"]}
+
+_fts_loaded = None
+# Set once the indexes were checked in this process
+_indexes_checked = False
+
+
+def load_fts(con) -> bool:
+    """LOAD the fts extension on this connection, installing it once if needed.
+
+    Call this on a cursor with no open transaction: a failed LOAD aborts the
+    surrounding transaction, so the INSTALL fallback could never run there.
+    """
+    global _fts_loaded
+    if _fts_loaded is False:
+        return False
+    try:
+        con.execute("LOAD fts")
+    except Exception:
+        try:
+            con.execute("INSTALL fts")
+            con.execute("LOAD fts")
+        except duckdb.TransactionException as e:
+            # Aborted transaction, not a missing extension: try again next time
+            print(f"[warn] Could not load DuckDB fts extension inside a transaction: {e}")
+            return False
+        except Exception as e:
+            print(f"[warn] DuckDB fts extension unavailable, search falls back to ILIKE: {e}")
+            _fts_loaded = False
+            return False
+    _fts_loaded = True
+    return True
+
+
+def _signature(con, table: str) -> str:
+    kind, id_col, fields, title, text, ts_col = INDEXES[table]
+    length = " + ".join(f"coalesce(length({f}), 0)" for f in fields)
+    row = con.execute(f"SELECT count(*), max({ts_col}), sum({length}) FROM {table}").fetchall()[0]
+    return f"{row[0]}:{row[1]}:{row[2]}"
+
+
+def _build(con, table: str) -> None:
+    kind, id_col, fields, *_ = INDEXES[table]
+    cols = ", ".join(f"'{f}'" for f in fields)
+    con.execute(f"""
+        PRAGMA create_fts_index('{table}', '{id_col}', {cols},
+            stemmer = '{FTS_STEMMER}', stopwords = '{FTS_STOPWORDS}', strip_accents = 1, lower = 1, overwrite = 1)
+    """)
+
+
+def refresh_indexes(db, force: bool = False) -> Dict[str, bool]:
+    """Rebuild the BM25 index of each table whose contents changed; returns {table: rebuilt}."""
+    global _indexes_checked
+    rebuilt = {}
+    # Extensions are loaded per database, so loading on a plain cursor before
+    # BEGIN makes fts available to the transaction below
+    with db.cursor() as cur:
+        if not load_fts(cur):
+            return rebuilt
+    with db.transaction() as con:
+        state = dict(con.execute("SELECT table_name, signature FROM search_index_state").fetchall())
+        for table in INDEXES:
+            sig = _signature(con, table)
+            if not force and state.get(table) == sig:
+                rebuilt[table] = False
+                continue
+            _build(con, table)
+            con.execute("INSERT OR REPLACE INTO search_index_state (table_name, signature, built_at) VALUES (?, ?, current_timestamp)",
+                        (table, sig))
+            rebuilt[table] = True
+    _indexes_checked = True
+    if any(rebuilt.values()):
+        print(f"[info] Rebuilt search index: {', '.join(t for t, r in rebuilt.items() if r)}")
+    return rebuilt
+
+
+def _select(table: str, fts: bool, terms: List[str]) -> tuple[str, list]:
+    kind, id_col, fields, title, text, ts_col = INDEXES[table]
+    # Snippet starts a little before the first occurrence of the first term
+    snippet = f"substring({text}, greatest(1, instr(lower({text}), ?) - 60), {SNIPPET_CHARS})"
+    params: list = [terms[0]]
+    if fts:
+        rank = f"fts_main_{table}.match_bm25({id_col}, ?)"
+        params.append(" ".join(terms))
+    else:
+        # Fallback rank: how many terms appear, title hits counting double
+        parts = []
+        for t in terms:
+            parts.append(f"(CASE WHEN {title} ILIKE ? THEN 2 ELSE 0 END)")
+            parts.append(f"(CASE WHEN {text} ILIKE ? THEN 1 ELSE 0 END)")
+            params += [f"%{t}%", f"%{t}%"]
+        rank = "(" + " + ".join(parts) + ")"
+    sql = f"""
+        SELECT * FROM (
+            SELECT '{kind}' AS type, {id_col} AS id, {title} AS title, {snippet} AS snippet,
+                   sender_email, date_iso, {ts_col} AS ts, {rank} AS rank
+            FROM {table}
+        ) WHERE rank IS NOT NULL AND rank > 0
+    """
+    return sql, params
+
+
+def search(db, q: str, kind: str = "all", limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Ranked matches for `q`, best first; page with limit/offset."""
+    terms = [t for t in q.lower().split() if t]
+    if not terms:
+        raise ValueError("q must not be empty")
+    if kind not in KINDS:
+        raise ValueError(f"unknown type: {kind}")
+    with db.cursor() as con:
+        fts = load_fts(con)
+    if fts and not _indexes_checked:
+        # First search after startup builds indexes the last run left stale
+        refresh_indexes(db)
+    parts, params = [], []
+    for table in KINDS[kind]:
+        sql, p = _select(table, fts, terms)
+        parts.append(sql)
+        params += p
+    sql = " UNION ALL ".join(parts) + " ORDER BY rank DESC, ts DESC, id LIMIT ? OFFSET ?"
+    params += [int(limit) + 1, int(offset)]
+    with db.cursor() as con:
+        if fts:
+            load_fts(con)
+        try:
+            rows = con.execute(sql, params).fetchall()
+        except Exception:
+            if not fts:
+                raise
+            # Index schema missing (e.g. dropped by a rewrite): rebuild once and retry
+            refresh_indexes(db, force=True)
+            rows = con.execute(sql, params).fetchall()
+    cols = ["type", "id", "title", "snippet", "sender_email", "date_iso", "ts", "rank"]
+    results = [dict(zip(cols, r)) for r in rows[:limit]]
+    for r in results:
+        r["ts"] = r["ts"].isoformat() if hasattr(r["ts"], "isoformat") else r["ts"]
+    return {
+        "results": results,
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "engine": "bm25" if fts else "ilike",
+    }
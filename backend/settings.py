@@ -0,0 +1,15 @@
+"""Loads the backend .env files.
+
+Imported before any module reads its configuration from os.environ, so values
+from backend/secrets/.env apply regardless of import order.
+"""
+import os
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(__file__)
+SECRETS_ENV = os.path.join(BASE_DIR, "secrets", ".env")
+
+load_dotenv()
+# Also try loading from secrets/.env if it exists
+if os.path.exists(SECRETS_ENV):
+    load_dotenv(SECRETS_ENV, override=True)
@@ -0,0 +1,48 @@
+import pytest
+
+import embeddings
+import top_news_pipeline as tnp
+from db import Database
+
+STORIES = [
+    {"title": "OpenAI ships GPT-5 today", "summary": "OpenAI released its GPT-5 model to all ChatGPT users on Thursday."},
+    {"title": "Nvidia posts record quarter", "summary": "Data center revenue doubled as demand for AI chips kept growing."},
+    {"title": "Today OpenAI ships GPT-5", "summary": "On Thursday OpenAI released its GPT-5 model to all ChatGPT users."},
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "t.duckdb"))
+    yield database
+    database.close()
+
+
+class CountingStub(embeddings.StubEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts += texts
+        return super().embed(texts)
+
+
+def test_paraphrases_share_a_cluster_and_vectors_are_cached(db):
+    stub = CountingStub()
+    with db.cursor() as con:
+        assert embeddings.cluster_stories(STORIES, con, embedder=stub, threshold=0.85) == [[0, 2], [1]]
+        assert len(stub.texts) == 3
+        # Second pass reads every vector back from story_embeddings
+        assert embeddings.cluster_stories(STORIES, con, embedder=stub, threshold=0.85) == [[0, 2], [1]]
+        assert len(stub.texts) == 3
+        assert con.execute("SELECT count(*) FROM story_embeddings WHERE model = 'stub'").fetchone()[0] == 3
+
+
+def test_pipeline_keeps_one_story_per_cluster(db, monkeypatch):
+    monkeypatch.setenv("EMBED_PROVIDER", "stub")
+    monkeypatch.setenv("EMBED_SIM_THRESHOLD", "0.85")
+    pipeline = tnp.NewsPipeline(db=db)
+    out = pipeline.merge_semantic_duplicates([dict(s) for s in STORIES])
+    assert [s["title"] for s in out] == ["OpenAI ships GPT-5 today", "Nvidia posts record quarter"]
+    assert [s["cluster_size"] for s in out] == [2, 1]
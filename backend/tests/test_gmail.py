@@ -0,0 +1,69 @@
+import top_news_pipeline as tnp
+
+
+class RateLimited(Exception):
+    def __init__(self):
+        super().__init__("429")
+        self.resp = type("Resp", (), {"status": 429})()
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service, self.callback, self.ids = service, callback, []
+
+    def add(self, request, request_id):
+        if request_id in self.ids:
+            raise KeyError(f"duplicate request id {request_id}")
+        self.ids.append(request_id)
+
+    def execute(self):
+        self.service.attempts += 1
+        if self.service.attempts == 1:
+            # One item fails on its own, then the whole batch errors out
+            self.callback(self.ids[0], None, RateLimited())
+            raise RateLimited()
+        for mid in self.ids:
+            self.callback(mid, {"id": mid}, None)
+
+
+class FakeService:
+    attempts = 0
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        return kwargs
+
+
+def test_failed_batch_retries_each_id_once(monkeypatch):
+    monkeypatch.setattr(tnp.time, "sleep", lambda s: None)
+    fetched = tnp.fetch_gmail_messages(FakeService(), ["a", "b", "c"], batch_size=10)
+    assert sorted(fetched) == ["a", "b", "c"]
+
+
+def test_capped_history_sync_resumes_at_first_email_left(monkeypatch):
+    added = {"m1": "101", "m2": "102", "m3": "103", "m4": "103"}
+    monkeypatch.setattr(tnp, "list_history_message_ids", lambda service, start: (dict(added), "200"))
+    monkeypatch.setattr(tnp, "fetch_gmail_messages", lambda service, ids, **kwargs: {
+        mid: {"id": mid, "payload": {"headers": [{"name": "From", "value": "news@example.com"}]}}
+        for mid in ids})
+    monkeypatch.setattr(tnp, "parse_gmail_message", lambda msg: {"id": msg["id"]})
+    whitelist = {"news@example.com"}
+
+    emails, latest = tnp.fetch_new_emails_since(None, "100", whitelist, lambda ids: set(), max_results=2)
+    assert [e["id"] for e in emails] == ["m2", "m1"]
+    assert latest == "102"
+
+    # Next sync starts after record 102 and only gets the rest
+    stored = {"m1", "m2"}
+    added = {"m3": "103", "m4": "103"}
+    emails, latest = tnp.fetch_new_emails_since(None, latest, whitelist, lambda ids: stored & set(ids), max_results=2)
+    assert [e["id"] for e in emails] == ["m4", "m3"]
+    assert latest == "200"
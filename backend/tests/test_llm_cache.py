@@ -0,0 +1,27 @@
+import pytest
+
+import llm_cache
+import top_news_pipeline as tnp
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = llm_cache.LLMCache(str(tmp_path / "cache.duckdb"))
+    monkeypatch.setattr(tnp, "get_llm_cache", lambda: c)
+    return c
+
+
+def test_malformed_json_generation_is_not_cached(cache, monkeypatch):
+    replies = iter(['{"title": "cut off', {"title": "ok"}])
+    monkeypatch.setattr(tnp, "_request_ollama", lambda payload, **kw: next(replies))
+    assert tnp.call_ollama("extract", format="json") == '{"title": "cut off'
+    assert cache.get(tnp.OLLAMA_MODEL, "extract", "json") is llm_cache.MISS
+    # Retried on the next call, and the parsed result is cached
+    assert tnp.call_ollama("extract", format="json") == {"title": "ok"}
+    assert cache.get(tnp.OLLAMA_MODEL, "extract", "json") == {"title": "ok"}
+
+
+def test_plain_text_generation_is_cached(cache, monkeypatch):
+    monkeypatch.setattr(tnp, "_request_ollama", lambda payload, **kw: "cleaned text")
+    assert tnp.call_ollama("clean") == "cleaned text"
+    assert cache.get(tnp.OLLAMA_MODEL, "clean", None) == "cleaned text"
@@ -0,0 +1,95 @@
+import pytest
+
+import main
+from db import Database
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    database = Database(str(tmp_path / "t.duckdb"))
+    q = JobQueue(database)
+    monkeypatch.setattr(main, "job_queue", q)
+    monkeypatch.setenv("WHATSAPP_PHONE", "15550001")
+    yield q
+    database.close()
+
+
+def test_whatsapp_trigger_merged_into_api_job_keeps_both_phones(queue):
+    job, created = main.enqueue_pipeline({"fetch_limit": 5}, "api")
+    assert created
+    assert main.trigger_nokast_via_whatsapp("15550002") is False
+    payload = queue.get(job["id"])["payload"]
+    assert payload["fetch_limit"] == 5
+    assert payload["notify_phones"] == ["15550001", "15550002"]
+
+
+def test_api_run_merged_into_whatsapp_job_keeps_both_phones(queue):
+    assert main.trigger_nokast_via_whatsapp("15550002") is True
+    job, created = main.enqueue_pipeline({"fetch_limit": None}, "api")
+    assert not created
+    assert queue.get(job["id"])["payload"]["notify_phones"] == ["15550002", "15550001"]
+
+
+def test_trigger_merged_into_scheduled_job_adds_sender(queue):
+    job, _ = queue.enqueue("pipeline", {}, dedupe_key="pipeline", triggered_by="schedule:morning")
+    main.trigger_nokast_via_whatsapp("15550002")
+    assert queue.get(job["id"])["payload"]["notify_phones"] == ["15550002", "15550001"]
+
+
+def test_cancel_before_run_starts_stops_the_run(tmp_path, monkeypatch):
+    import time
+    import top_news_pipeline as tnp
+
+    database = Database(str(tmp_path / "p.duckdb"))
+    pipeline = tnp.NewsPipeline(db=database)
+    monkeypatch.setattr(tnp, "get_gmail_service", lambda: pytest.fail("run went on to fetch"))
+    q = JobQueue(database, poll_seconds=0.05)
+    started = []
+
+    def handler(payload):
+        # Cancel lands after the claim, before run() gets going
+        q.cancel(job["id"])
+        started.append(True)
+        try:
+            pipeline.run()
+        except tnp.RunCancelled:
+            raise main.JobCancelled("cancelled")
+
+    q.register("pipeline", handler, cancel=lambda j: pipeline.cancel(), on_claim=lambda j: pipeline.reset_cancel())
+    pipeline.cancel()  # stale flag from an earlier run; cleared on claim
+    job, _ = q.enqueue("pipeline", {})
+    q.start()
+    try:
+        for _ in range(100):
+            if q.get(job["id"])["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.05)
+    finally:
+        q.stop()
+    assert started
+    assert q.get(job["id"])["status"] == "cancelled"
+    assert pipeline.list_runs()[0]["status"] == "cancelled"
+    database.close()
+
+
+def test_claim_resets_stale_cancel(tmp_path):
+    import time
+    import top_news_pipeline as tnp
+
+    database = Database(str(tmp_path / "p.duckdb"))
+    pipeline = tnp.NewsPipeline(db=database)
+    pipeline.cancel()
+    q = JobQueue(database, poll_seconds=0.05)
+    q.register("pipeline", lambda payload: pipeline._cancel.is_set(), on_claim=lambda j: pipeline.reset_cancel())
+    job, _ = q.enqueue("pipeline", {})
+    q.start()
+    try:
+        for _ in range(100):
+            if q.get(job["id"])["status"] == "done":
+                break
+            time.sleep(0.05)
+    finally:
+        q.stop()
+    assert q.get(job["id"])["result"] is False
+    database.close()
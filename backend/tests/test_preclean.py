@@ -0,0 +1,46 @@
+import preclean
+
+STORY = ("Meta changed its terms of service on Monday so that public posts can be used to train its AI models; "
+         "users in the EU can opt out, and the company updated its privacy policy to match.")
+
+
+def test_boilerplate_lines_are_dropped():
+    body = "\n".join([
+        "View this email in your browser",
+        "Top story: chips are back",
+        "Nvidia reported record revenue.",
+        "Privacy Policy | Terms of Service",
+        "Follow us on X and LinkedIn",
+        "© 2026 Example Media. All rights reserved.",
+    ])
+    assert preclean.preclean(body) == "Top story: chips are back\nNvidia reported record revenue."
+
+
+def test_story_mentioning_boilerplate_phrases_is_kept():
+    body = "\n".join([
+        "Meta changed its terms of service",
+        STORY,
+        "Newsletter platforms say readers unsubscribe less when digests are shorter, according to a survey of "
+        "2,000 people published this week by a media research firm.",
+        "Privacy Policy",
+    ])
+    out = preclean.preclean(body).split("\n")
+    assert out[0] == "Meta changed its terms of service"
+    assert out[1] == STORY
+    assert out[2].startswith("Newsletter platforms say readers unsubscribe less")
+    assert len(out) == 3
+
+
+def test_footer_cut_ignores_long_story_lines():
+    body = "\n".join([
+        "Intro",
+        "First story about chips.",
+        "A long story paragraph explaining how the service lets users manage your subscription settings from "
+        "one page, which regulators asked for after complaints.",
+        "Last story about cars.",
+        "You are receiving this because you signed up.",
+        "123 Main St",
+    ])
+    out = preclean.preclean(body)
+    assert "manage your subscription settings" in out
+    assert out.endswith("Last story about cars.")
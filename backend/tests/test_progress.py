@@ -0,0 +1,28 @@
+from progress import ProgressBus, RunProgress
+
+
+def test_finished_run_is_not_replayed_to_new_clients():
+    bus = ProgressBus()
+    first = RunProgress(bus=bus)
+    first.start()
+    with first.stage("fetch"):
+        pass
+    first.finish()
+    assert bus.replay() == []
+    # A client that was connected before the end still catches up on reconnect
+    end_seq = bus.history()[-1]["seq"]
+    assert [e["event"] for e in bus.replay(after_seq=end_seq - 1)] == ["end"]
+
+
+def test_run_in_flight_is_replayed():
+    bus = ProgressBus()
+    done = RunProgress(bus=bus)
+    done.start()
+    done.finish()
+    current = RunProgress(bus=bus)
+    current.start()
+    with current.stage("fetch"):
+        pass
+    events = bus.replay()
+    assert {e["run_id"] for e in events} == {current.run_id}
+    assert [(e["stage"], e["event"]) for e in events] == [("run", "start"), ("fetch", "start"), ("fetch", "end")]
@@ -0,0 +1,71 @@
+import glob
+
+import pytest
+
+import paging
+import retention
+from db import Database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path / "archive"))
+    database = Database(str(tmp_path / "t.duckdb"))
+    with database.write() as con:
+        con.execute("""INSERT INTO emails (id, subject, sender_email, date_iso, body, fetched_at)
+                       VALUES ('e1', 'old', 'a@x', '2025-01-01', 'old body', TIMESTAMP '2025-01-01 08:00:00'),
+                              ('e2', 'new', 'a@x', '2026-10-15', 'new body', current_timestamp)""")
+        con.execute("""INSERT INTO top_stories (id, title, summary, sender_email, processed_at)
+                       VALUES ('s1', 'Old story', 'sum', 'a@x', TIMESTAMP '2025-01-01 09:00:00'),
+                              ('s2', 'New story', 'sum', 'a@x', current_timestamp)""")
+    yield database
+    database.close()
+
+
+def _parquet_files(table):
+    return glob.glob(retention._parquet_glob(table), recursive=True)
+
+
+def test_archive_moves_expired_rows_and_listing_still_sees_them(db):
+    assert retention.archive_old_rows(db, body_days=30, story_days=30) == {"emails": 1, "top_stories": 1}
+    with db.cursor() as con:
+        assert con.execute("SELECT id FROM top_stories").fetchall() == [("s2",)]
+        assert con.execute("SELECT body FROM emails WHERE id = 'e1'").fetchone()[0] is None
+        assert con.execute("SELECT body FROM emails_all WHERE id = 'e1'").fetchone()[0] == "old body"
+        page = paging.fetch_page(con, paging.STORIES, ["id", "processed_at"], None)
+    assert [r["id"] for r in page["rows"]] == ["s2", "s1"]
+
+
+def test_failed_cleanup_does_not_duplicate_archive(db, monkeypatch):
+    real_transaction = db.transaction
+
+    def failing_transaction(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db, "transaction", failing_transaction)
+    with pytest.raises(RuntimeError):
+        retention.archive_old_rows(db, body_days=30, story_days=30)
+    files = sorted(_parquet_files("top_stories") + _parquet_files("emails"))
+    assert len(files) == 2
+
+    monkeypatch.setattr(db, "transaction", real_transaction)
+    assert retention.archive_old_rows(db, body_days=30, story_days=30) == {"emails": 1, "top_stories": 1}
+    assert sorted(_parquet_files("top_stories") + _parquet_files("emails")) == files
+    with db.cursor() as con:
+        assert con.execute("SELECT count(*) FROM top_stories_all WHERE id = 's1'").fetchone()[0] == 1
+    assert retention.archive_old_rows(db, body_days=30, story_days=30) == {"emails": 0, "top_stories": 0}
+
+
+def test_email_listing_returns_archived_bodies(db):
+    retention.archive_old_rows(db, body_days=30, story_days=0)
+    with db.cursor() as con:
+        page = paging.fetch_page(con, paging.EMAILS, ["id", "body", "fetched_at"], None)
+    assert {r["id"]: r["body"] for r in page["rows"]} == {"e1": "old body", "e2": "new body"}
+
+
+def test_compaction_waits_for_running_pipeline(db):
+    with db.run_lock:
+        result = retention.compact(db, force=True)
+    assert result["rewritten"] is False
+    assert result["skipped"] == "pipeline_running"
+    assert retention.compact(db, force=True)["rewritten"] is True
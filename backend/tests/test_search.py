@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+import duckdb
+import pytest
+
+import search
+
+
+class FakeCursor:
+    """Mimics DuckDB: a failing statement aborts the open transaction."""
+
+    def __init__(self, state):
+        self.state = state
+        self.sql = ""
+
+    def execute(self, sql, params=None):
+        self.sql = sql.strip()
+        stmt = self.sql.split()[0].upper()
+        if self.state["aborted"]:
+            raise duckdb.TransactionException("Current transaction is aborted (please ROLLBACK)")
+        self.state["log"].append((stmt, self.state["in_tx"]))
+        try:
+            if stmt == "INSTALL" and self.state["offline"]:
+                raise duckdb.IOException('Failed to download extension "fts"')
+            if stmt == "INSTALL":
+                self.state["installed"] = True
+            elif stmt == "LOAD" and not self.state["installed"]:
+                raise duckdb.IOException('Extension "fts" not found. Install it first using "INSTALL fts".')
+        except Exception:
+            if self.state["in_tx"]:
+                self.state["aborted"] = True
+            raise
+        return self
+
+    def fetchall(self):
+        if "search_index_state" in self.sql:
+            return []
+        return [(0, None, 0)]
+
+
+class FakeDb:
+    def __init__(self, offline=False):
+        self.state = {"in_tx": False, "aborted": False, "installed": False, "offline": offline, "log": []}
+
+    @contextmanager
+    def cursor(self):
+        yield FakeCursor(self.state)
+
+    @contextmanager
+    def transaction(self):
+        self.state["in_tx"] = True
+        try:
+            yield FakeCursor(self.state)
+        finally:
+            self.state.update(in_tx=False, aborted=False)
+
+
+@pytest.fixture(autouse=True)
+def reset_fts(monkeypatch):
+    monkeypatch.setattr(search, "_fts_loaded", None)
+    monkeypatch.setattr(search, "_indexes_checked", False)
+
+
+def test_refresh_indexes_installs_fts_before_transaction():
+    db = FakeDb()
+    assert search.refresh_indexes(db) == {"emails": True, "top_stories": True}
+    assert ("INSTALL", False) in db.state["log"]
+    assert not any(in_tx for stmt, in_tx in db.state["log"] if stmt in ("INSTALL", "LOAD"))
+    assert search._fts_loaded is True
+
+
+def test_aborted_transaction_is_not_cached_as_unavailable():
+    db = FakeDb()
+    with db.transaction() as con:
+        assert search.load_fts(con) is False
+    assert search._fts_loaded is None
+    with db.cursor() as con:
+        assert search.load_fts(con) is True
+
+
+def test_failed_install_disables_fts():
+    db = FakeDb(offline=True)
+    assert search.refresh_indexes(db) == {}
+    assert search._fts_loaded is False
+    with db.cursor() as con:
+        assert search.load_fts(con) is False
@@ -0,0 +1,60 @@
+import pytest
+
+import top_news_pipeline as tnp
+
+STORIES = [{"title": f"Story {n}", "summary": f"Summary {n}"} for n in range(1, 6)]
+
+
+def post(text, id=None):
+    p = {"linkedIn": text, "x": text}
+    if id is not None:
+        p["id"] = id
+    return p
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    calls = []
+    replies = {}
+
+    def fake_call(prompt, format=None, **kwargs):
+        calls.append(prompt)
+        if "Title: Story" in prompt and prompt.count("Title:") > 1:
+            return replies["batch"]
+        # Single-story SOCIAL_PROMPT
+        title = next(s["title"] for s in STORIES if s["title"] in prompt)
+        return post(f"single {title}")
+
+    monkeypatch.setattr(tnp, "call_ollama", fake_call)
+    return replies, calls
+
+
+def linked(results):
+    return [r["linkedIn"] if r else None for r in results]
+
+
+def test_batch_matches_posts_by_id(ollama):
+    replies, _ = ollama
+    replies["batch"] = {"posts": [post("p3", 3), post("p1", 1), post("p5", 5), post("p2", 2), post("p4", 4)]}
+    assert linked(tnp.generate_social_batch(STORIES)) == ["p1", "p2", "p3", "p4", "p5"]
+
+
+def test_missing_id_leaves_that_story_for_fallback(ollama):
+    replies, _ = ollama
+    replies["batch"] = {"posts": [post("p1", 1), post("p2", 2), post("p4", 4), post("p5", 5)]}
+    assert linked(tnp.generate_social_batch(STORIES)) == ["p1", "p2", None, "p4", "p5"]
+
+
+def test_zero_based_ids_with_full_count_match_by_position(ollama):
+    replies, _ = ollama
+    replies["batch"] = {"posts": [post(f"p{n}", n - 1) for n in range(1, 6)]}
+    assert linked(tnp.generate_social_batch(STORIES)) == ["p1", "p2", "p3", "p4", "p5"]
+
+
+def test_zero_based_ids_with_dropped_entry_fall_back_for_whole_batch(ollama):
+    replies, calls = ollama
+    replies["batch"] = {"posts": [post("p1", 0), post("p2", 1), post("p3", 2), post("p4", 3)]}
+    assert tnp.generate_social_batch(STORIES) == [None] * 5
+    results = tnp.generate_socials(STORIES, batch_size=5)
+    assert linked(results) == [f"single Story {n}" for n in range(1, 6)]
+    assert len(calls) == 2 + 5
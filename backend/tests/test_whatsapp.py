@@ -0,0 +1,34 @@
+import pytest
+
+from whatsapp_service import WhatsAppService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    svc = WhatsAppService(db_path="unused.db")
+    svc.sent = []
+    monkeypatch.setattr(svc, "send_notification", lambda phone, message: svc.sent.append(message))
+    return svc
+
+
+def test_repeated_trigger_is_told_a_job_is_queued(service):
+    calls = []
+    service.on_nokast_callback = calls.append
+    service._trigger_nokast("15550001")
+    service._trigger_nokast("15550001")
+    assert calls == ["15550001"]
+    assert len(service.sent) == 2 and "already queued" in service.sent[1]
+
+
+def test_failed_enqueue_does_not_lock_sender_out(service):
+    def fail(phone):
+        raise RuntimeError("queue down")
+
+    service.on_nokast_callback = fail
+    with pytest.raises(RuntimeError):
+        service._trigger_nokast("15550001")
+    calls = []
+    service.on_nokast_callback = calls.append
+    service._trigger_nokast("15550001")
+    assert calls == ["15550001"]
+    assert service.sent == ["🚀 Starting Nokast job..."]
@@ -3,46 +3,33 @@ import os
 import json
 import re
 import base64
+import hashlib
 import requests
-import duckdb
+import time
 import uuid
-from datetime import datetime, timezone, date
-from typing import List, Dict, Any
-from difflib import SequenceMatcher
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone, date
+from typing import List, Dict, Any, Callable
 from email.utils import parsedate_to_datetime, parseaddr
-from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 
-# LangChain imports for chunking
-try:
-    from langchain_text_splitters import TokenTextSplitter
-except ImportError:
-    try:
-        from langchain.text_splitter import TokenTextSplitter
-    except ImportError:
-        TokenTextSplitter = None
-
-try:
-    from langchain_core.documents import Document
-except ImportError:
-    try:
-        from langchain.schema import Document
-    except ImportError:
-        class Document:
-            def __init__(self, page_content, metadata=None):
-                self.page_content = page_content
-                self.metadata = metadata or {}
-
-from prompts import CLEAN_PROMPT, EXTRACT_PROMPT, SOCIAL_PROMPT
+# The Google client libraries are imported where they are used, so importing
+# this module stays cheap.
 
-load_dotenv()
-# Also try loading from secrets/.env if it exists
-SECRETS_ENV = os.path.join(os.path.dirname(__file__), "secrets", ".env")
-if os.path.exists(SECRETS_ENV):
-    load_dotenv(SECRETS_ENV, override=True)
+import settings  # noqa: F401 - loads .env before any config below is read
+from prompts import CLEAN_PROMPT, EXTRACT_PROMPT, SOCIAL_PROMPT, SOCIAL_BATCH_PROMPT
+from llm_cache import get_llm_cache, MISS
+import ollama_client
+from ollama_client import OLLAMA_BASE_URL, OLLAMA_URL
+from dedupe import dedupe_minhash, dedupe_sequence, text_similarity
+from embeddings import cluster_stories, EMBED_SIM_THRESHOLD
+from keyword_scorer import KeywordScorer
+from db import Database, insert_rows
+from migrations import refresh_daily_rollups
+import search
+from progress import RunProgress
+from chunking import chunk_text
+import preclean
 
 # Env / config
 # Provide sensible defaults that live in the backend/ directory so the UI can upload secrets there
@@ -62,11 +49,14 @@ def resolve_secret_path(env_key, default_name):
 GOOGLE_CREDENTIALS = resolve_secret_path("GOOGLE_CREDENTIALS", "Google_credentials.json")
 GOOGLE_TOKEN = resolve_secret_path("GOOGLE_TOKEN", "token.json")
 FETCH_LIMIT = int(os.getenv("FETCH_LIMIT", 10))
-# Allow configuring the Ollama base URL (host:port) separately. If a full
-# OLLAMA_URL is provided in env, prefer that; otherwise construct the generate
-# endpoint from OLLAMA_BASE_URL so users can override just the host/port.
-OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-OLLAMA_URL = os.getenv("OLLAMA_URL", f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate")
+# Messages fetched per Gmail batch HTTP request (max 100, Gmail recommends <= 50)
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", 50))
+GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", 3))
+GMAIL_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Fetch only messages added since the last run's Gmail historyId
+GMAIL_INCREMENTAL_SYNC = os.getenv("GMAIL_INCREMENTAL_SYNC", "true").lower() == "true"
+# Ollama host/port and the generate endpoint (OLLAMA_BASE_URL / OLLAMA_URL) are
+# resolved in ollama_client, which owns the pooled HTTP session.
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:8b")
 
 def resolve_db_path():
@@ -80,7 +70,24 @@ def resolve_db_path():
 DUCKDB_PATH = resolve_db_path()
 
 TOP_N = 10
+# Number of emails run through clean -> extract at the same time. Keep this at
+# or below the Ollama server's OLLAMA_NUM_PARALLEL, extra requests just queue.
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", 2)))
+# Emails of runs that failed or were cancelled within this many hours are
+# picked up by the next run (they were stored, so Gmail will not return them again)
+PIPELINE_RESUME_HOURS = float(os.getenv("PIPELINE_RESUME_HOURS", 24))
+# Rows kept in pipeline_runs
+PIPELINE_RUN_HISTORY = int(os.getenv("PIPELINE_RUN_HISTORY", 200))
 SIM_THRESHOLD = float(os.getenv("SIM_THRESHOLD", 0.85))
+# "minhash" (shingles + MinHash/LSH over title and summary), "embedding"
+# (minhash, then Ollama-embedding clusters at EMBED_SIM_THRESHOLD) or
+# "sequence" (pairwise SequenceMatcher on titles with SIMILARITY_THRESHOLD)
+DEDUPE_METHOD = os.getenv("DEDUPE_METHOD", "minhash")
+DEDUPE_JACCARD_THRESHOLD = float(os.getenv("DEDUPE_JACCARD_THRESHOLD", 0.5))
+# Also drop stories matching ones already published in the last N days (0 = off)
+DEDUPE_HISTORY_DAYS = int(os.getenv("DEDUPE_HISTORY_DAYS", 0))
+# Stories per SOCIAL_BATCH_PROMPT call; 1 makes one SOCIAL_PROMPT call per story
+SOCIAL_BATCH_SIZE = int(os.getenv("SOCIAL_BATCH_SIZE", 5))
 PRIORITY_KEYWORDS = os.getenv("PRIORITY_KEYWORDS", "ai,ml,openai,gpt,model,llm,langchain,nvidia,huggingface").split(",")
 
 AUTHORITY_SCORES = {}
@@ -101,41 +108,9 @@ except Exception as e:
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
-# --- Chunking Logic (from ollama_newsletter_test.py) ---
-MAX_TOKENS = 2000
-OVERLAP_TOKENS = 100
-
-def chunk_text_with_overlap(text, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS):
-    if TokenTextSplitter is None:
-        # Naive fallback
-        approx = max(1000, max_tokens * 2)
-        return [{"page_content": text[i:i+approx]} for i in range(0, len(text), approx)]
-
-    splitter = TokenTextSplitter(chunk_size=max_tokens, chunk_overlap=overlap)
-    chunks = None
-    if hasattr(splitter, "create_documents"):
-        try:
-            docs = splitter.create_documents([text])
-            if docs and hasattr(docs[0], "page_content"):
-                return docs
-            chunks = [getattr(d, "page_content", d) for d in docs]
-        except Exception:
-            chunks = None
-
-    if not chunks:
-        if hasattr(splitter, "split_text"):
-            chunks = splitter.split_text(text)
-        else:
-            approx = max(1000, max_tokens * 2)
-            chunks = [text[i:i+approx] for i in range(0, len(text), approx)]
-
-    if Document is not None:
-        return [Document(page_content=c) if not hasattr(c, "page_content") else c for c in chunks]
-
-    class _Doc:
-        def __init__(self, page_content):
-            self.page_content = page_content
-    return [_Doc(c) if not hasattr(c, "page_content") else c for c in chunks]
+# Stored extraction results are reused only while the model and the clean /
+# extract prompts are unchanged
+PROMPT_VERSION = hashlib.sha1((CLEAN_PROMPT + "\0" + EXTRACT_PROMPT).encode("utf-8")).hexdigest()[:12]
 
 # --- Gmail Utilities ---
 def load_newsletter_addresses(con=None) -> set:
@@ -149,6 +124,7 @@ def load_newsletter_addresses(con=None) -> set:
             return out
         try:
             # Use read_only=True to avoid locking issues with the main app
+            import duckdb
             con = duckdb.connect(DUCKDB_PATH, read_only=True)
             close_con = True
         except Exception as e:
@@ -191,6 +167,11 @@ def parse_gmail_date(date_str: str) -> str | None:
         return None
 
 def get_gmail_service():
+    from googleapiclient.discovery import build
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
     creds = None
     if GOOGLE_TOKEN and os.path.exists(GOOGLE_TOKEN):
         creds = Credentials.from_authorized_user_file(GOOGLE_TOKEN, SCOPES)
@@ -205,58 +186,223 @@ def get_gmail_service():
                 token.write(creds.to_json())
     return build("gmail", "v1", credentials=creds)
 
-def fetch_emails_from_gmail(service, max_results=FETCH_LIMIT, query="") -> List[Dict[str, Any]]:
-    results = service.users().messages().list(userId="me", maxResults=max_results, q=query).execute()
-    messages = results.get("messages", [])
-    emails = []
-    for msg in messages:
+def parse_gmail_message(msg_data: Dict[str, Any]) -> Dict[str, Any]:
+    payload = msg_data.get("payload", {})
+    headers = payload.get("headers", [])
+    subject = sender = date = None
+    for h in headers:
+        name = h.get("name", "")
+        val = h.get("value")
+        if name == "Subject": subject = val
+        elif name == "From": sender = val
+        elif name == "Date": date = val
+
+    body = ""
+    def decode_part_data(data_b64):
         try:
-            msg_data = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-            payload = msg_data.get("payload", {})
-            headers = payload.get("headers", [])
-            subject = sender = date = None
-            for h in headers:
-                name = h.get("name", "")
-                val = h.get("value")
-                if name == "Subject": subject = val
-                elif name == "From": sender = val
-                elif name == "Date": date = val
-
-            body = ""
-            def decode_part_data(data_b64):
-                try:
-                    return base64.urlsafe_b64decode(data_b64).decode("utf-8", errors="ignore")
-                except Exception:
-                    return ""
-
-            if "parts" in payload:
-                for part in payload["parts"]:
-                    mime = part.get("mimeType", "")
-                    part_body = part.get("body", {})
-                    if mime == "text/plain" and "data" in part_body:
-                        body = decode_part_data(part_body["data"])
+            return base64.urlsafe_b64decode(data_b64).decode("utf-8", errors="ignore")
+        except Exception:
+            return ""
+
+    if "parts" in payload:
+        for part in payload["parts"]:
+            mime = part.get("mimeType", "")
+            part_body = part.get("body", {})
+            if mime == "text/plain" and "data" in part_body:
+                body = decode_part_data(part_body["data"])
+                break
+            if "parts" in part:
+                for sub in part["parts"]:
+                    if sub.get("mimeType") == "text/plain" and "data" in sub.get("body", {}):
+                        body = decode_part_data(sub["body"]["data"])
                         break
-                    if "parts" in part:
-                        for sub in part["parts"]:
-                            if sub.get("mimeType") == "text/plain" and "data" in sub.get("body", {}):
-                                body = decode_part_data(sub["body"]["data"])
-                                break
-                        if body: break
+                if body: break
+    else:
+        b = payload.get("body", {}).get("data")
+        if b: body = decode_part_data(b)
+
+    return {
+        "id": msg_data["id"],
+        "subject": subject,
+        "sender_email": extract_email(sender),
+        "date_iso": parse_gmail_date(date),
+        "body": body or ""
+    }
+
+def list_gmail_message_ids(service, max_results=FETCH_LIMIT, query="") -> List[str]:
+    # Follow nextPageToken until max_results ids are collected
+    ids = []
+    page_token = None
+    while len(ids) < max_results:
+        kwargs = {"userId": "me", "maxResults": min(500, max_results - len(ids)), "q": query}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        results = service.users().messages().list(**kwargs).execute()
+        ids.extend(m["id"] for m in results.get("messages", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+    return ids[:max_results]
+
+def _is_retryable_gmail_error(exc: Exception) -> bool:
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    try:
+        return int(status) in GMAIL_RETRY_STATUSES
+    except (TypeError, ValueError):
+        return False
+
+def fetch_gmail_messages(service, message_ids: List[str], batch_size=GMAIL_BATCH_SIZE,
+                         max_retries=GMAIL_MAX_RETRIES, format="full",
+                         metadata_headers=None) -> Dict[str, Dict[str, Any]]:
+    """Fetch full messages through Gmail batch requests.
+
+    Items failing with 429/5xx are retried with exponential backoff; other
+    failures are logged and skipped. Returns raw message resources by id.
+    """
+    batch_size = max(1, min(batch_size, 100))  # Gmail caps a batch at 100 calls
+    fetched = {}
+    pending = list(dict.fromkeys(message_ids))
+    for attempt in range(max_retries + 1):
+        retry = []
+        last_attempt = attempt == max_retries
+
+        def on_item(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif _is_retryable_gmail_error(exception) and not last_attempt:
+                retry.append(request_id)
             else:
-                b = payload.get("body", {}).get("data")
-                if b: body = decode_part_data(b)
-
-            emails.append({
-                "id": msg["id"],
-                "subject": subject,
-                "sender_email": extract_email(sender),
-                "date_iso": parse_gmail_date(date),
-                "body": body or ""
-            })
+                print(f"[error] fetching message {request_id} -> {exception}")
+
+        for i in range(0, len(pending), batch_size):
+            group = pending[i:i + batch_size]
+            batch = service.new_batch_http_request(callback=on_item)
+            for mid in group:
+                kwargs = {"userId": "me", "id": mid, "format": format}
+                if metadata_headers:
+                    kwargs["metadataHeaders"] = metadata_headers
+                batch.add(service.users().messages().get(**kwargs), request_id=mid)
+            try:
+                batch.execute()
+            except Exception as e:
+                if _is_retryable_gmail_error(e) and not last_attempt:
+                    retry.extend(mid for mid in group if mid not in fetched)
+                else:
+                    print(f"[error] Gmail batch request failed -> {e}")
+
+        # An id can be queued twice (its callback failed, then the batch raised);
+        # a batch rejects duplicate request ids
+        retry = list(dict.fromkeys(retry))
+        if not retry:
+            break
+        delay = 2 ** attempt
+        print(f"[warn] {len(retry)} Gmail messages rate limited/failed, retrying in {delay}s ({attempt + 1}/{max_retries})...")
+        time.sleep(delay)
+        pending = retry
+    return fetched
+
+def fetch_emails_from_gmail(service, max_results=FETCH_LIMIT, query="") -> List[Dict[str, Any]]:
+    message_ids = list_gmail_message_ids(service, max_results=max_results, query=query)
+    if not message_ids:
+        return []
+    batch_size = int(os.getenv("GMAIL_BATCH_SIZE", GMAIL_BATCH_SIZE))
+    raw = fetch_gmail_messages(service, message_ids, batch_size=batch_size)
+    emails = []
+    for mid in message_ids:
+        if mid not in raw:
+            continue
+        try:
+            emails.append(parse_gmail_message(raw[mid]))
         except Exception as e:
-            print(f"[error] fetching message {msg.get('id')} -> {e}")
+            print(f"[error] parsing message {mid} -> {e}")
     return emails
 
+class GmailHistoryExpired(Exception):
+    """The stored historyId is too old for users().history().list."""
+
+def get_gmail_history_id(service) -> str | None:
+    profile = service.users().getProfile(userId="me").execute()
+    return profile.get("historyId")
+
+def list_history_message_ids(service, start_history_id: str) -> tuple[Dict[str, str], str]:
+    """Return {message id: id of the history record that added it}, oldest
+    first, and the newest historyId.
+
+    Raises GmailHistoryExpired when Gmail no longer has history that far back.
+    """
+    from googleapiclient.errors import HttpError
+
+    ids = {}
+    latest = start_history_id
+    page_token = None
+    while True:
+        kwargs = {"userId": "me", "startHistoryId": start_history_id, "historyTypes": ["messageAdded"]}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        try:
+            res = service.users().history().list(**kwargs).execute()
+        except HttpError as e:
+            if getattr(e.resp, "status", None) == 404:
+                raise GmailHistoryExpired(str(e)) from e
+            raise
+        for h in res.get("history", []):
+            for added in h.get("messagesAdded", []):
+                mid = added.get("message", {}).get("id")
+                if mid:
+                    ids.setdefault(mid, h.get("id"))
+        latest = res.get("historyId", latest)
+        page_token = res.get("nextPageToken")
+        if not page_token:
+            break
+    return ids, latest
+
+def fetch_new_emails_since(service, start_history_id: str, whitelist: set,
+                           known_ids: Callable[[List[str]], set],
+                           max_results=FETCH_LIMIT) -> tuple[List[Dict[str, Any]], str]:
+    """New whitelisted emails since start_history_id and the historyId to resume from.
+
+    `known_ids(ids)` returns which of the ids are already stored; those are
+    skipped. At most `max_results` emails are returned, oldest first being
+    kept; when some are left over, the returned historyId stops just before
+    the first of them so the next sync picks them up.
+    """
+    added, latest = list_history_message_ids(service, start_history_id)
+    known = known_ids(list(added)) if added else set()
+    ids = [mid for mid in added if mid not in known]
+    if not ids:
+        return [], latest
+    # Headers only first, so non-newsletter mail is never downloaded in full
+    batch_size = int(os.getenv("GMAIL_BATCH_SIZE", GMAIL_BATCH_SIZE))
+    meta = fetch_gmail_messages(service, ids, batch_size=batch_size, format="metadata", metadata_headers=["From"])
+    wanted = []
+    for mid in ids:
+        headers = meta.get(mid, {}).get("payload", {}).get("headers", [])
+        sender = next((h.get("value") for h in headers if h.get("name") == "From"), None)
+        addr = (extract_email(sender) or "").lower()
+        if addr in whitelist:
+            wanted.append(mid)
+    if len(wanted) > max_results:
+        # Resume at the record that added the first message left over; the ones
+        # before it in that record are known by then and skipped
+        first_left = added[wanted[max_results]]
+        try:
+            latest = str(int(first_left) - 1)
+        except (TypeError, ValueError):
+            latest = start_history_id
+        print(f"[info] {len(wanted) - max_results} new emails left for the next sync")
+        wanted = wanted[:max_results]
+    raw = fetch_gmail_messages(service, wanted, batch_size=batch_size)
+    emails = []
+    # Newest first, like messages().list
+    for mid in reversed(wanted):
+        if mid not in raw:
+            continue
+        try:
+            emails.append(parse_gmail_message(raw[mid]))
+        except Exception as e:
+            print(f"[error] parsing message {mid} -> {e}")
+    return emails, latest
+
 # --- Ollama Helpers ---
 def extract_json_block(s: Any) -> Any | None:
     if isinstance(s, (dict, list)):
@@ -291,15 +437,16 @@ def extract_json_block(s: Any) -> Any | None:
         except Exception: pass
     return None
 
-def call_ollama(prompt: str, model: str = OLLAMA_MODEL, format: str = None, retries: int = 2) -> Any:
-    payload = {"model": model, "prompt": prompt, "stream": False}
-    if format: payload["format"] = format
-    headers = {"Content-Type": "application/json"}
-    
+def _request_ollama(payload: Dict[str, Any], retries: int = 2, on_token=None) -> Any:
     for attempt in range(retries + 1):
         try:
-            # Increased timeout to 300s
-            resp = requests.post(OLLAMA_URL, json=payload, headers=headers, timeout=300)
+            if payload.get("stream"):
+                # Token stream; JSON-format calls stop reading once the object is complete
+                text = ollama_client.generate_stream(payload, on_token=on_token, stop_on_json=payload.get("format") == "json")
+                parsed = extract_json_block(text)
+                return parsed if parsed is not None else text
+            # Pooled keep-alive session; read timeout from OLLAMA_READ_TIMEOUT (300s)
+            resp = ollama_client.generate(payload)
             resp.raise_for_status()
             raw = resp.text or ""
             parsed = extract_json_block(raw)
@@ -321,29 +468,61 @@ def call_ollama(prompt: str, model: str = OLLAMA_MODEL, format: str = None, retr
             return None
     return None
 
+def call_ollama(prompt: str, model: str = OLLAMA_MODEL, format: str = None, retries: int = 2, use_cache: bool = True,
+                stream: bool | None = None, on_token=None) -> Any:
+    # Identical (model, prompt, format) requests are served from the LLM cache
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        try:
+            hit = cache.get(model, prompt, format)
+            if hit is not MISS:
+                return hit
+        except Exception as e:
+            print(f"[warn] LLM cache lookup failed: {e}")
+
+    if stream is None:
+        stream = ollama_client.OLLAMA_STREAM
+    payload = {"model": model, "prompt": prompt, "stream": bool(stream)}
+    if format: payload["format"] = format
+    result = _request_ollama(payload, retries=retries, on_token=on_token)
+
+    # Failures, empty generations and JSON calls that did not parse are not
+    # cached, so they get retried next run
+    cacheable = isinstance(result, (dict, list)) if format == "json" else result not in (None, "")
+    if cache is not None and cacheable:
+        try:
+            cache.put(model, prompt, format, result)
+        except Exception as e:
+            print(f"[warn] LLM cache write failed: {e}")
+    return result
+
 # --- Pipeline Logic ---
-def clean_newsletter(body: str) -> str:
+def clean_newsletter(body: str, boilerplate: set | None = None) -> str:
+    # Rule-based pass first; the LLM only sees what is left, and short leftovers skip it
+    if preclean.PRECLEAN_ENABLED:
+        body = preclean.preclean(body, boilerplate)
+        if not body or preclean.skips_llm(body):
+            return body
     prompt = CLEAN_PROMPT.format(newsletter=body)
     return str(call_ollama(prompt) or "").strip()
 
-def extract_stories(cleaned_text: str) -> List[Dict[str, str]]:
-    # Use chunking for extraction if text is long
-    docs = chunk_text_with_overlap(cleaned_text)
+def extract_stories(cleaned_text: str, on_chunk=None, cancel: threading.Event | None = None) -> List[Dict[str, str]]:
+    # Long newsletters are split into token-bounded chunks on paragraph boundaries
+    chunks = chunk_text(cleaned_text)
     all_stories = []
-    for doc in docs:
-        prompt = EXTRACT_PROMPT.format(cleaned=doc.page_content)
+    for i, chunk in enumerate(chunks, 1):
+        check_cancelled(cancel)
+        prompt = EXTRACT_PROMPT.format(cleaned=chunk)
         res = call_ollama(prompt, format="json")
         if isinstance(res, dict) and "stories" in res:
             all_stories.extend(res["stories"])
         elif isinstance(res, list):
             all_stories.extend(res)
+        if on_chunk:
+            on_chunk(i, len(chunks))
     return all_stories
 
-def generate_social(title: str, summary: str) -> Dict[str, str]:
-    prompt = SOCIAL_PROMPT.format(title=title, summary=summary)
-    res = call_ollama(prompt, format="json")
-    if not isinstance(res, dict):
-        return {"linkedIn": summary, "x_post": summary[:280], "branding_tag": "#AI", "action_suggestion": "Read more"}
+def _social_fields(res: Dict[str, Any], summary: str) -> Dict[str, str]:
     return {
         "linkedIn": res.get("linkedIn", summary),
         "x_post": res.get("x", res.get("x_post", summary[:280])),
@@ -351,176 +530,662 @@ def generate_social(title: str, summary: str) -> Dict[str, str]:
         "action_suggestion": res.get("action_suggestion", "Read more")
     }
 
+def generate_social(title: str, summary: str) -> Dict[str, str]:
+    prompt = SOCIAL_PROMPT.format(title=title, summary=summary)
+    res = call_ollama(prompt, format="json")
+    if not isinstance(res, dict):
+        return {"linkedIn": summary, "x_post": summary[:280], "branding_tag": "#AI", "action_suggestion": "Read more"}
+    return _social_fields(res, summary)
+
+def generate_social_batch(stories: List[Dict[str, Any]]) -> List[Dict[str, str] | None]:
+    """Social posts for several stories from one SOCIAL_BATCH_PROMPT call.
+
+    Entries are matched to stories by their "id" when every id is a distinct
+    number in 1..len(stories), otherwise by position when the count is right.
+    A story without a usable entry gets None, so the caller can fall back to
+    generate_social for it; with neither, the whole batch does.
+    """
+    block = "\n\n".join(f"{i}. Title: {s.get('title', '')}\nSummary: {s.get('summary', '')}"
+                         for i, s in enumerate(stories, 1))
+    res = call_ollama(SOCIAL_BATCH_PROMPT.format(count=len(stories), stories=block), format="json")
+    posts = res.get("posts") if isinstance(res, dict) else res
+    out: List[Dict[str, str] | None] = [None] * len(stories)
+    if not isinstance(posts, list):
+        return out
+    posts = [p for p in posts if isinstance(p, dict) and (p.get("linkedIn") or p.get("x") or p.get("x_post"))]
+    ids = []
+    for p in posts:
+        try:
+            ids.append(int(p.get("id")))
+        except (TypeError, ValueError):
+            ids.append(None)
+    if all(i is not None and 1 <= i <= len(stories) for i in ids) and len(set(ids)) == len(ids):
+        by_id = dict(zip(ids, posts))
+    elif len(posts) == len(stories):
+        # Ids missing or numbered differently (e.g. from 0) but nothing dropped: trust the order
+        by_id = dict(enumerate(posts, 1))
+    else:
+        # Unusable ids and a missing entry: no way to tell which story a post is for
+        return out
+    for i, s in enumerate(stories):
+        p = by_id.get(i + 1)
+        if p is not None:
+            out[i] = _social_fields(p, s.get("summary", ""))
+    return out
+
+def generate_socials(stories: List[Dict[str, Any]], batch_size: int = SOCIAL_BATCH_SIZE, on_story=None,
+                     cancel: threading.Event | None = None) -> List[Dict[str, str]]:
+    """Social posts for `stories`, `batch_size` per LLM call.
+
+    Stories the batched output did not cover are generated one by one.
+    `on_story(n, story)` is called as each story's posts are ready.
+    """
+    out = []
+    for start in range(0, len(stories), max(1, batch_size)):
+        check_cancelled(cancel)
+        batch = stories[start:start + max(1, batch_size)]
+        results = generate_social_batch(batch) if len(batch) > 1 else [None]
+        missing = sum(r is None for r in results)
+        if len(batch) > 1 and missing:
+            print(f"[warn] Batched social output covered {len(batch) - missing} of {len(batch)} stories, "
+                  f"generating the rest one by one")
+        for s, social in zip(batch, results):
+            if social is None:
+                check_cancelled(cancel)
+                social = generate_social(s.get("title", ""), s.get("summary", ""))
+            out.append(social)
+            if on_story:
+                on_story(len(out), s)
+    return out
+
+class RunCancelled(Exception):
+    """Raised inside a run once NewsPipeline.cancel() was called."""
+
+
+def check_cancelled(cancel: threading.Event | None):
+    if cancel is not None and cancel.is_set():
+        raise RunCancelled("run cancelled")
+
+def process_email(e: Dict[str, Any], progress: RunProgress | None = None, cleaned: str | None = None,
+                  on_cleaned=None, cancel: threading.Event | None = None,
+                  boilerplate: Dict[str, set] | None = None) -> List[Dict[str, Any]] | None:
+    # Clean -> extract for a single email, tagging each story with its source.
+    # Returns None when cleaning produced nothing so the email is retried later.
+    # `cleaned` is a checkpoint from an earlier run; on_cleaned(e, text) stores a new one.
+    # `boilerplate` maps sender -> line fingerprints from preclean.learn_fingerprints.
+    check_cancelled(cancel)
+    print(f"[step] Processing: {e['subject']}")
+    if cleaned is None:
+        cleaned = clean_newsletter(e["body"], (boilerplate or {}).get(e["sender_email"]))
+        if cleaned and on_cleaned:
+            on_cleaned(e, cleaned)
+        if progress:
+            progress.emit("clean", "progress", f"Cleaned {e['subject']}", email_id=e["id"], ok=bool(cleaned))
+    elif progress:
+        progress.emit("clean", "progress", f"Reused cleaned text of {e['subject']}", email_id=e["id"], ok=True, reused=True)
+    if not cleaned: return None
+    on_chunk = None
+    if progress:
+        def on_chunk(i, total):
+            progress.step("extract", i, total, f"Extracted chunk {i}/{total} of {e['subject']}", email_id=e["id"])
+    stories = [s for s in extract_stories(cleaned, on_chunk=on_chunk, cancel=cancel) if isinstance(s, dict)]
+    for s in stories:
+        s["date_iso"] = e["date_iso"]
+        s["sender_email"] = e["sender_email"]
+    return stories
+
+def process_emails(emails: List[Dict[str, Any]], concurrency: int = PIPELINE_CONCURRENCY,
+                   on_result=None, cleaned: Dict[str, str] | None = None, **kwargs) -> List[List[Dict[str, Any]] | None]:
+    """Run process_email over a bounded worker pool.
+
+    Results are returned in the same order as `emails`, so scoring and dedupe
+    see exactly what the sequential path would produce. `on_result(email,
+    stories)` is called as each email finishes, in completion order.
+    `cleaned` maps email id -> checkpointed cleaned text; other keyword
+    arguments are passed to process_email.
+    """
+    cleaned = cleaned or {}
+    if concurrency <= 1 or len(emails) <= 1:
+        results = []
+        for e in emails:
+            results.append(process_email(e, cleaned=cleaned.get(e["id"]), **kwargs))
+            if on_result:
+                on_result(e, results[-1])
+        return results
+    workers = min(concurrency, len(emails))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nokast-email") as pool:
+        futures = {pool.submit(process_email, e, cleaned=cleaned.get(e["id"]), **kwargs): e for e in emails}
+        if on_result:
+            for f in as_completed(futures):
+                if f.exception() is None:
+                    on_result(futures[f], f.result())
+        return [f.result() for f in futures]
+
+def body_hash(body: str) -> str:
+    return hashlib.sha1((body or "").encode("utf-8")).hexdigest()
+
 # --- Scoring & Dedupe ---
-def text_similarity(a: str, b: str) -> float:
-    a = re.sub(r'\W+', ' ', a.lower()).strip()
-    b = re.sub(r'\W+', ' ', b.lower()).strip()
-    return SequenceMatcher(None, a, b).ratio()
-
-def compute_score(story: dict, keywords: List[str]) -> float:
-    score = 0.0
-    text = (story.get("title", "") + " " + story.get("summary", "")).lower()
-    
-    # Keyword scoring
-    for kw in keywords:
-        if kw.lower() in text: 
-            score += 1.0
-            
+# text_similarity and the dedupe strategies live in dedupe.py
+
+def build_keyword_scorer(keywords) -> KeywordScorer:
+    word_boundary = os.getenv("KEYWORD_WORD_BOUNDARY", "true").lower() == "true"
+    return KeywordScorer(keywords, word_boundary=word_boundary)
+
+def _authority_factor(story: dict) -> float | None:
+    sender = (story.get("sender_email") or "").lower()
+    return AUTHORITY_SCORES.get(sender)
+
+def compute_score(story: dict, keywords) -> float:
+    # `keywords` is a prebuilt KeywordScorer, a {keyword: weight} dict or a list
+    scorer = keywords if isinstance(keywords, KeywordScorer) else build_keyword_scorer(keywords)
+    text = (story.get("title") or "") + " " + (story.get("summary") or "")
+
+    # Keyword scoring: weighted, single pass over the text
+    score = scorer.score(text)
+
     # Authority scoring (multiplier or bonus)
-    sender = story.get("sender_email", "").lower()
-    if sender in AUTHORITY_SCORES:
+    factor = _authority_factor(story)
+    if factor is not None:
         # If it's a multiplier
-        score *= AUTHORITY_SCORES[sender]
+        score *= factor
         # Or if it's a flat bonus, you could do: score += AUTHORITY_SCORES[sender]
-        
+
     return score
 
+def score_stories(stories: List[dict], scorer: KeywordScorer) -> None:
+    """Set s["score"] on every story using one compiled scorer."""
+    texts = [(s.get("title") or "") + " " + (s.get("summary") or "") for s in stories]
+    for s, score in zip(stories, scorer.score_batch(texts)):
+        factor = _authority_factor(s)
+        s["score"] = score * factor if factor is not None else score
+
 # --- Pipeline Class ---
+STORY_COLUMNS = ["id", "title", "summary", "linkedIn", "x_post", "branding_tag", "action_suggestion", "score", "date_iso", "sender_email"]
+
 class NewsPipeline:
-    def __init__(self, db_path=DUCKDB_PATH):
-        self.db_path = db_path
-        self.con = self.init_db()
+    def __init__(self, db_path=DUCKDB_PATH, db: Database | None = None):
+        # Use the process-wide Database when given (API server), else own one
+        self._owns_db = db is None
+        self.db = db or Database(db_path)
+        self.db_path = self.db.path
+        self._con = None
+        self._con_generation = None
+        self._cancel = threading.Event()
         self.priority_keywords = self.load_priority_keywords()
 
-    def load_priority_keywords(self) -> List[str]:
+    def load_priority_keywords(self) -> Dict[str, float]:
+        # {keyword: weight}; weights come from the score column set in the UI
         try:
             res = self.con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'priority_keywords'").fetchone()
             if res and res[0] > 0:
-                rows = self.con.execute('SELECT keyword FROM priority_keywords').fetchall()
+                rows = self.con.execute('SELECT keyword, score FROM priority_keywords').fetchall()
                 if rows:
-                    return [r[0] for r in rows if r and r[0]]
+                    return {r[0]: (1.0 if r[1] is None else float(r[1])) for r in rows if r and r[0]}
         except Exception as e:
             print(f"[warn] Could not load priority keywords from DB: {e}")
-        return PRIORITY_KEYWORDS
+        return {kw: 1.0 for kw in PRIORITY_KEYWORDS if kw.strip()}
+
+    @property
+    def con(self):
+        # Reopen after the file was rewritten by compaction
+        if self._con is None or self._con_generation != self.db.generation:
+            self._con = self.init_db()
+            self._con_generation = self.db.generation
+        return self._con
 
     def init_db(self):
-        con = duckdb.connect(self.db_path)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS emails (
-                id TEXT PRIMARY KEY,
-                subject TEXT,
-                sender_email TEXT,
-                date_iso TEXT,
-                body TEXT,
-                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS top_stories (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                summary TEXT,
-                linkedIn TEXT,
-                x_post TEXT,
-                branding_tag TEXT,
-                action_suggestion TEXT,
-                score DOUBLE,
-                date_iso TEXT,
-                sender_email TEXT,
-                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        # Newsletter and priority keyword tables managed via UI
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS newsletter_addresses (
-                id TEXT PRIMARY KEY,
-                sender TEXT,
-                email TEXT,
-                priority INTEGER
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS priority_keywords (
-                keyword TEXT PRIMARY KEY,
-                score DOUBLE
-            )
-        """)
-        return con
-
-    def run(self, fetch_limit=None, top_n=None):
+        # Dedicated cursor for this pipeline (opening the db applies migrations);
+        # writes take self.db.write_lock
+        return self.db.new_cursor()
+
+    def load_processed(self, email_ids: List[str]) -> Dict[str, tuple[str, List[Dict[str, Any]]]]:
+        """(body_hash, stories) for emails already processed with the current model and prompts."""
+        if not email_ids:
+            return {}
+        rows = self.con.execute(f"""
+            SELECT p.email_id, p.body_hash, p.stories FROM email_processing p
+            WHERE p.status = 'done' AND p.model = ? AND p.prompt_version = ?
+              AND p.email_id IN ({",".join("?" for _ in email_ids)})
+        """, (OLLAMA_MODEL, PROMPT_VERSION, *email_ids)).fetchall()
+        return {r[0]: (r[1], json.loads(r[2] or "[]")) for r in rows}
+
+    def save_processed(self, e: Dict[str, Any], stories: List[Dict[str, Any]] | None):
+        # Keeps the cleaned-text checkpoint written earlier by save_cleaned
+        status = "done" if stories is not None else "failed"
+        with self.db.write() as con:
+            con.execute("""
+                INSERT INTO email_processing (email_id, status, model, prompt_version, body_hash, stories, processed_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (email_id) DO UPDATE SET status = excluded.status, model = excluded.model,
+                    prompt_version = excluded.prompt_version, body_hash = excluded.body_hash,
+                    stories = excluded.stories, processed_at = excluded.processed_at
+            """, (e["id"], status, OLLAMA_MODEL, PROMPT_VERSION, body_hash(e["body"]), json.dumps(stories or [])))
+
+    def save_cleaned(self, e: Dict[str, Any], cleaned: str):
+        # Called from worker threads, hence a fresh cursor instead of self.con
+        with self.db.write() as con:
+            con.execute("""
+                INSERT INTO email_processing (email_id, status, model, prompt_version, body_hash, cleaned, processed_at)
+                VALUES (?, 'cleaned', ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (email_id) DO UPDATE SET status = excluded.status, model = excluded.model,
+                    prompt_version = excluded.prompt_version, body_hash = excluded.body_hash,
+                    cleaned = excluded.cleaned, processed_at = excluded.processed_at
+            """, (e["id"], OLLAMA_MODEL, PROMPT_VERSION, body_hash(e["body"]), cleaned))
+
+    def load_cleaned(self, emails: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Checkpointed cleaned text for emails whose body, model and prompts are unchanged."""
+        if not emails:
+            return {}
+        hashes = {e["id"]: body_hash(e["body"]) for e in emails}
+        rows = self.con.execute(f"""
+            SELECT email_id, body_hash, cleaned FROM email_processing
+            WHERE cleaned IS NOT NULL AND model = ? AND prompt_version = ?
+              AND email_id IN ({",".join("?" for _ in hashes)})
+        """, (OLLAMA_MODEL, PROMPT_VERSION, *hashes)).fetchall()
+        return {r[0]: r[2] for r in rows if hashes.get(r[0]) == r[1]}
+
+    # --- Run bookkeeping (pipeline_runs) ---
+    def start_run(self, run_id: str):
+        with self.db.write() as con:
+            con.execute("""
+                INSERT INTO pipeline_runs (id, status, stage, started_at, updated_at)
+                VALUES (?, 'running', 'start', current_timestamp, current_timestamp)
+            """, (run_id,))
+            # Keep the history short
+            con.execute("""
+                DELETE FROM pipeline_runs WHERE id NOT IN (
+                    SELECT id FROM pipeline_runs ORDER BY started_at DESC LIMIT ?)
+            """, (PIPELINE_RUN_HISTORY,))
+
+    def mark_stage(self, run_id: str, stage: str, email_ids: List[str] | None = None):
+        # Records the last completed stage
+        with self.db.write() as con:
+            if email_ids is None:
+                con.execute("UPDATE pipeline_runs SET stage = ?, updated_at = current_timestamp WHERE id = ?",
+                            (stage, run_id))
+            else:
+                con.execute("""
+                    UPDATE pipeline_runs SET stage = ?, email_ids = ?, updated_at = current_timestamp WHERE id = ?
+                """, (stage, json.dumps(email_ids), run_id))
+
+    def finish_run(self, run_id: str, status: str, story_count: int | None = None,
+                   timings: Dict[str, float] | None = None, error: str | None = None):
+        with self.db.write() as con:
+            con.execute("""
+                UPDATE pipeline_runs SET status = ?, story_count = ?, timings = ?, error = ?,
+                    updated_at = current_timestamp, finished_at = current_timestamp
+                WHERE id = ?
+            """, (status, story_count, json.dumps(timings or {}), error, run_id))
+
+    def load_resumable_emails(self, exclude_run: str) -> tuple[List[str], List[Dict[str, Any]]]:
+        """(run ids, emails) of recent runs that stopped before finishing.
+
+        Their emails were already stored (and the Gmail sync point advanced),
+        so they would not be fetched again; the new run picks them up instead.
+        """
+        since = datetime.now() - timedelta(hours=PIPELINE_RESUME_HOURS)
+        rows = self.con.execute("""
+            SELECT id, email_ids FROM pipeline_runs
+            WHERE status IN ('running', 'failed', 'cancelled') AND email_ids IS NOT NULL
+              AND id != ? AND started_at >= ?
+            ORDER BY started_at
+        """, (exclude_run, since)).fetchall()
+        run_ids = [r[0] for r in rows]
+        email_ids = list(dict.fromkeys(i for r in rows for i in json.loads(r[1] or "[]")))
+        if not email_ids:
+            return run_ids, []
+        found = self.con.execute(f"""
+            SELECT id, subject, sender_email, date_iso, body FROM emails
+            WHERE body IS NOT NULL AND id IN ({",".join("?" for _ in email_ids)})
+        """, email_ids).fetchall()
+        by_id = {r[0]: {"id": r[0], "subject": r[1], "sender_email": r[2], "date_iso": r[3], "body": r[4]} for r in found}
+        return run_ids, [by_id[i] for i in email_ids if i in by_id]
+
+    def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        # Called from API threads while run() uses self.con, so read on a cursor of its own
+        with self.db.cursor() as con:
+            rows = con.execute("""
+                SELECT id, status, stage, email_ids, story_count, timings, error, started_at, finished_at
+                FROM pipeline_runs ORDER BY started_at DESC LIMIT ?
+            """, (limit,)).fetchall()
+        return [{
+            "id": r[0], "status": r[1], "stage": r[2], "emails": len(json.loads(r[3] or "[]")),
+            "story_count": r[4], "timings": json.loads(r[5] or "{}"), "error": r[6],
+            "started_at": r[7].isoformat() if r[7] else None, "finished_at": r[8].isoformat() if r[8] else None,
+        } for r in rows]
+
+    def load_earlier_stories(self, exclude_ids: set) -> List[Dict[str, Any]]:
+        """Stories from emails fetched and processed earlier today, for ranking."""
+        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = self.con.execute("""
+            SELECT e.id, e.date_iso, e.sender_email, p.stories
+            FROM email_processing p JOIN emails e ON e.id = p.email_id
+            WHERE p.status = 'done' AND p.model = ? AND p.prompt_version = ? AND e.fetched_at >= ?
+            ORDER BY e.fetched_at, e.id
+        """, (OLLAMA_MODEL, PROMPT_VERSION, today_start)).fetchall()
+        out = []
+        for email_id, date_iso, sender_email, stories_json in rows:
+            if email_id in exclude_ids:
+                continue
+            for s in json.loads(stories_json or "[]"):
+                s["date_iso"] = date_iso
+                s["sender_email"] = sender_email
+                out.append(s)
+        return out
+
+    def save_emails(self, emails: List[Dict[str, Any]]) -> int:
+        # One transaction for the whole batch; also used for backfills
+        rows = [(e["id"], e["subject"], e["sender_email"], e["date_iso"], e["body"]) for e in emails]
+        with self.db.transaction(self.con) as con:
+            return insert_rows(con, "emails", ["id", "subject", "sender_email", "date_iso", "body"], rows, or_ignore=True)
+
+    def save_stories(self, stories: List[Dict[str, Any]]) -> int:
+        rows = [(
+            str(uuid.uuid4()),
+            s.get("title"),
+            s.get("summary"),
+            s.get("linkedIn"),
+            s.get("x_post"),
+            s.get("branding_tag"),
+            s.get("action_suggestion"),
+            s.get("score"),
+            s.get("date_iso"),
+            s.get("sender_email")
+        ) for s in stories]
+        with self.db.transaction(self.con) as con:
+            n = insert_rows(con, "top_stories", STORY_COLUMNS, rows)
+            self.update_rollups(con, [r[0] for r in rows])
+        return n
+
+    def update_rollups(self, con, story_ids: List[str]):
+        # Only the days the new stories landed on are recomputed
+        if not story_ids:
+            return
+        days = [r[0] for r in con.execute(f"""
+            SELECT DISTINCT CAST(processed_at AS DATE) FROM top_stories
+            WHERE id IN ({",".join("?" for _ in story_ids)})
+        """, story_ids).fetchall()]
+        refresh_daily_rollups(con, days)
+
+    def load_sync_state(self, account="me"):
+        row = self.con.execute("SELECT history_id, whitelist_hash FROM gmail_sync_state WHERE account = ?", (account,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save_sync_state(self, history_id, whitelist_hash, account="me"):
+        if not history_id:
+            return
+        with self.db.write() as con:
+            con.execute("""
+                INSERT OR REPLACE INTO gmail_sync_state (account, history_id, whitelist_hash, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, (account, str(history_id), whitelist_hash))
+
+    def known_email_ids(self, email_ids: List[str]) -> set:
+        # Only the ids Gmail reported, so an incremental sync does not scan the whole history
+        if not email_ids:
+            return set()
+        rows = self.con.execute(f"""
+            SELECT id FROM emails WHERE id IN ({",".join("?" for _ in email_ids)})
+        """, email_ids).fetchall()
+        return {r[0] for r in rows}
+
+    def fetch_emails(self, service, whitelist: set, limit: int) -> tuple[List[Dict[str, Any]], str | None, str]:
+        """Fetch newsletter emails, incrementally via Gmail history when possible.
+
+        Falls back to the date-window query on the first run, when the
+        whitelist changed, or when the stored historyId has expired. Returns
+        the emails plus the sync state to save once they are stored.
+        """
+        whitelist_hash = hashlib.sha1("\n".join(sorted(whitelist)).encode("utf-8")).hexdigest()
+        history_id, stored_hash = self.load_sync_state()
+        incremental = os.getenv("GMAIL_INCREMENTAL_SYNC", str(GMAIL_INCREMENTAL_SYNC)).lower() == "true"
+
+        if incremental and history_id and stored_hash == whitelist_hash:
+            try:
+                print(f"[info] Fetching Gmail changes since historyId {history_id}")
+                emails, latest = fetch_new_emails_since(service, history_id, whitelist, self.known_email_ids,
+                                                        max_results=limit)
+                return emails, latest, whitelist_hash
+            except GmailHistoryExpired:
+                print("[warn] Gmail historyId expired, falling back to full query.")
+
+        # Build Gmail query for today's emails from whitelist
+        today_str = date.today().strftime("%Y/%m/%d")
+        from_query = " OR ".join([f"from:{email}" for email in whitelist])
+        query = f"after:{today_str} ({from_query})"
+
+        # Take the historyId before listing so nothing arriving meanwhile is skipped next run
+        try:
+            latest = get_gmail_history_id(service)
+        except Exception as e:
+            print(f"[warn] Could not read Gmail historyId: {e}")
+            latest = None
+        print(f"[info] Fetching emails with query: {query}")
+        emails = fetch_emails_from_gmail(service, max_results=limit, query=query)
+        return emails, latest, whitelist_hash
+
+    def cancel(self):
+        """Ask the current run to stop at its next checkpoint; LLM calls already in flight finish first."""
+        self._cancel.set()
+
+    def reset_cancel(self):
+        """Forget an earlier cancel() before a new run is handed out.
+
+        Called when the run's job is claimed rather than in run(), so a cancel
+        that arrives between the claim and the start of run() is kept.
+        """
+        self._cancel.clear()
+
+    def run(self, fetch_limit=None, top_n=None, concurrency=None, progress: RunProgress | None = None):
+        progress = progress or RunProgress()
+        # Not cleared here: a cancel that arrived before the run started stops it at once
+        # run_lock keeps compaction from swapping the file under this run's cursor
+        with self.db.run_lock:
+            self.start_run(progress.run_id)
+            progress.start()
+            try:
+                stories = self._run(progress, fetch_limit, top_n, concurrency)
+            except RunCancelled:
+                print("[info] Pipeline run cancelled")
+                self.finish_run(progress.run_id, "cancelled", timings=progress.timings)
+                progress.finish("cancelled")
+                raise
+            except Exception as e:
+                self.finish_run(progress.run_id, "failed", timings=progress.timings, error=str(e))
+                progress.finish("failed", str(e))
+                raise
+            self.finish_run(progress.run_id, "done", story_count=len(stories), timings=progress.timings)
+        progress.finish("done", stories=len(stories))
+        return stories
+
+    def _run(self, progress: RunProgress, fetch_limit=None, top_n=None, concurrency=None):
         print("[info] Starting Top News Pipeline")
+        run_id = progress.run_id
+        cancel = self._cancel
+        check_cancelled(cancel)
         
         # Load config from env or defaults
         limit = fetch_limit or int(os.getenv("FETCH_LIMIT", 10))
         n_stories = top_n or int(os.getenv("TOP_N", 10))
         sim_threshold = float(os.getenv("SIMILARITY_THRESHOLD", 0.85))
+        workers = max(1, concurrency or int(os.getenv("PIPELINE_CONCURRENCY", PIPELINE_CONCURRENCY)))
         
         whitelist = load_newsletter_addresses(self.con)
         if not whitelist:
             print("[warn] No newsletters in whitelist. Skipping fetch.")
+            progress.emit("fetch", "progress", "No newsletters in whitelist")
             return []
 
-        # Build Gmail query for today's emails from whitelist
-        today_str = date.today().strftime("%Y/%m/%d")
-        from_query = " OR ".join([f"from:{email}" for email in whitelist])
-        query = f"after:{today_str} ({from_query})"
-        
-        print(f"[info] Fetching emails with query: {query}")
-        service = get_gmail_service()
-        emails = fetch_emails_from_gmail(service, max_results=limit, query=query)
+        with progress.stage("fetch", "Fetching emails from Gmail"):
+            service = get_gmail_service()
+            emails, history_id, whitelist_hash = self.fetch_emails(service, whitelist, limit)
+            progress.emit("fetch", "progress", f"Fetched {len(emails)} emails", emails=len(emails))
+
+        # Emails of interrupted runs are finished by this one
+        resumed_runs, resumed = self.load_resumable_emails(run_id)
+        fetched_ids = {e["id"] for e in emails}
+        resumed = [e for e in resumed if e["id"] not in fetched_ids]
+        if resumed:
+            print(f"[info] Resuming {len(resumed)} emails from {len(resumed_runs)} interrupted run(s)")
+            progress.emit("fetch", "progress", f"Resuming {len(resumed)} emails from an interrupted run", resumed=len(resumed))
+            emails = emails + resumed
         
         if not emails:
+            self.save_sync_state(history_id, whitelist_hash)
+            self.supersede_runs(resumed_runs)
             print("[info] No new emails found for today.")
             return []
         
         # Save emails to DB
+        check_cancelled(cancel)
+        with progress.stage("store", "Saving emails"):
+            self.save_emails(emails)
+            # Only advance the sync point once the fetched emails are stored
+            self.save_sync_state(history_id, whitelist_hash)
+        self.mark_stage(run_id, "store", email_ids=[e["id"] for e in emails])
+
+        # Only run the LLM stages for emails that are new or changed since they were processed
+        processed = self.load_processed([e["id"] for e in emails])
+        results = {}
+        todo = []
         for e in emails:
-            self.con.execute("""
-                INSERT OR IGNORE INTO emails (id, subject, sender_email, date_iso, body)
-                VALUES (?, ?, ?, ?, ?)
-            """, (e["id"], e["subject"], e["sender_email"], e["date_iso"], e["body"]))
+            prev = processed.get(e["id"])
+            if prev and prev[0] == body_hash(e["body"]):
+                results[e["id"]] = prev[1]
+            else:
+                todo.append(e)
+        if len(todo) < len(emails):
+            print(f"[info] Reusing stored results for {len(emails) - len(todo)} already processed emails")
+        cleaned = self.load_cleaned(todo)
+        if cleaned:
+            print(f"[info] Reusing cleaned text for {len(cleaned)} emails")
 
-        all_extracted_stories = []
+        boilerplate = {}
+        if preclean.PRECLEAN_ENABLED and len(cleaned) < len(todo):
+            try:
+                boilerplate = preclean.learn_fingerprints(self.con, {e["sender_email"] for e in todo})
+            except Exception as ex:
+                print(f"[warn] Learning sender boilerplate failed: {ex}")
+            if boilerplate:
+                print(f"[info] Boilerplate fingerprints for {len(boilerplate)} senders")
+
+        print(f"[info] Processing {len(todo)} emails with concurrency {workers}")
+        done = [0]
+        done_lock = threading.Lock()
 
+        def on_result(e, stories):
+            # Checkpoint each email as soon as it finishes
+            self.save_processed(e, stories)
+            with done_lock:
+                done[0] += 1
+                n = done[0]
+            progress.step("process", n, len(todo), f"Processed {e['subject']}",
+                          email_id=e["id"], stories=len(stories or []))
+
+        with progress.stage("process", f"Cleaning and extracting {len(todo)} emails",
+                            total=len(todo), reused=len(emails) - len(todo)):
+            for e, stories in zip(todo, process_emails(todo, concurrency=workers, on_result=on_result, cleaned=cleaned,
+                                                       progress=progress, on_cleaned=self.save_cleaned, cancel=cancel,
+                                                       boilerplate=boilerplate)):
+                results[e["id"]] = stories or []
+        self.mark_stage(run_id, "process")
+
+        all_extracted_stories = []
         for e in emails:
-            print(f"[step] Processing: {e['subject']}")
-            cleaned = clean_newsletter(e["body"])
-            if not cleaned: continue
-            stories = extract_stories(cleaned)
-            for s in stories:
+            for s in results.get(e["id"], []):
                 s["date_iso"] = e["date_iso"]
                 s["sender_email"] = e["sender_email"]
-                keywords = getattr(self, 'priority_keywords', PRIORITY_KEYWORDS)
-                s["score"] = compute_score(s, keywords)
                 all_extracted_stories.append(s)
+        # Merge in stories from emails handled by earlier runs today
+        all_extracted_stories.extend(self.load_earlier_stories({e["id"] for e in emails}))
+
+        check_cancelled(cancel)
+        with progress.stage("score", f"Scoring {len(all_extracted_stories)} stories"):
+            # Keywords are reloaded each run so edits in the UI apply without a restart
+            self.priority_keywords = self.load_priority_keywords()
+            scorer = build_keyword_scorer(self.priority_keywords)
+            score_stories(all_extracted_stories, scorer)
 
         # Deduplicate and Rank
-        all_extracted_stories.sort(key=lambda x: x["score"], reverse=True)
-        unique_stories = []
-        for s in all_extracted_stories:
-            if len(unique_stories) >= n_stories: break
-            is_dup = False
-            for u in unique_stories:
-                if text_similarity(s.get("title", ""), u.get("title", "")) > sim_threshold:
-                    is_dup = True
-                    break
-            if not is_dup:
-                social = generate_social(s.get("title", ""), s.get("summary", ""))
+        check_cancelled(cancel)
+        with progress.stage("dedupe", "Removing duplicate stories"):
+            all_extracted_stories.sort(key=lambda x: x["score"], reverse=True)
+            method = os.getenv("DEDUPE_METHOD", DEDUPE_METHOD).lower()
+            if method == "sequence":
+                unique_stories = dedupe_sequence(all_extracted_stories, threshold=sim_threshold, limit=n_stories)
+            else:
+                jaccard = float(os.getenv("DEDUPE_JACCARD_THRESHOLD", DEDUPE_JACCARD_THRESHOLD))
+                history = self.load_recent_story_texts(int(os.getenv("DEDUPE_HISTORY_DAYS", DEDUPE_HISTORY_DAYS)))
+                unique_stories = dedupe_minhash(all_extracted_stories, threshold=jaccard, history=history)
+                if method == "embedding":
+                    unique_stories = self.merge_semantic_duplicates(unique_stories)
+                unique_stories = unique_stories[:n_stories]
+            print(f"[info] {len(all_extracted_stories)} stories, {len(unique_stories)} kept after {method} dedupe")
+            progress.emit("dedupe", "progress", f"{len(unique_stories)} of {len(all_extracted_stories)} stories kept",
+                          kept=len(unique_stories), total=len(all_extracted_stories))
+
+        self.mark_stage(run_id, "dedupe")
+
+        # Social posts are not checkpointed per story; reruns of the same story hit the LLM cache
+        with progress.stage("social", f"Generating social posts for {len(unique_stories)} stories"):
+            def on_story(n, s):
+                progress.step("social", n, len(unique_stories), f"Social posts for {s.get('title', '')}")
+
+            batch_size = int(os.getenv("SOCIAL_BATCH_SIZE", SOCIAL_BATCH_SIZE))
+            for s, social in zip(unique_stories, generate_socials(unique_stories, batch_size, on_story, cancel)):
                 s.update(social)
-                unique_stories.append(s)
+
+        self.mark_stage(run_id, "social")
 
         # Save to DuckDB
-        for s in unique_stories:
-            story_id = str(uuid.uuid4())
-            self.con.execute("""
-                INSERT INTO top_stories (id, title, summary, linkedIn, x_post, branding_tag, action_suggestion, score, date_iso, sender_email)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                story_id,
-                s.get("title"),
-                s.get("summary"),
-                s.get("linkedIn"),
-                s.get("x_post"),
-                s.get("branding_tag"),
-                s.get("action_suggestion"),
-                s.get("score"),
-                s.get("date_iso"),
-                s.get("sender_email")
-            ))
-        
-        print(f"[info] Saved {len(unique_stories)} stories to {self.db_path}")
+        check_cancelled(cancel)
+        with progress.stage("save", "Saving stories"):
+            self.save_stories(unique_stories)
+            
+            print(f"[info] Saved {len(unique_stories)} stories to {self.db_path}")
+            try:
+                search.refresh_indexes(self.db)
+            except Exception as e:
+                print(f"[warn] Search index refresh failed: {e}")
+        self.mark_stage(run_id, "save")
+        self.supersede_runs(resumed_runs)
         return unique_stories
 
+    def supersede_runs(self, run_ids: List[str]):
+        # Interrupted runs whose emails this run has taken over
+        if not run_ids:
+            return
+        with self.db.write() as con:
+            con.execute(f"UPDATE pipeline_runs SET status = 'resumed' WHERE id IN ({','.join('?' for _ in run_ids)})",
+                        run_ids)
+
+    def merge_semantic_duplicates(self, stories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Collapse paraphrased stories into embedding clusters, keeping the
+        highest-scoring story of each so social posts run once per cluster."""
+        if len(stories) < 2:
+            return stories
+        threshold = float(os.getenv("EMBED_SIM_THRESHOLD", EMBED_SIM_THRESHOLD))
+        try:
+            clusters = cluster_stories(stories, self.con, threshold=threshold, write_lock=self.db.write_lock)
+        except Exception as e:
+            print(f"[warn] Embedding clustering failed, keeping lexical dedupe only: {e}")
+            return stories
+        out = []
+        for members in clusters:
+            lead = stories[members[0]]
+            lead["cluster_size"] = len(members)
+            out.append(lead)
+        print(f"[info] {len(stories)} stories grouped into {len(out)} semantic clusters")
+        return out
+
+    def load_recent_story_texts(self, days: int) -> List[str]:
+        # Title + summary of stories published in the last `days` days
+        if days <= 0:
+            return []
+        since = datetime.now() - timedelta(days=days)
+        rows = self.con.execute("SELECT title, summary FROM top_stories WHERE processed_at >= ?", (since,)).fetchall()
+        return [f"{r[0] or ''} {r[1] or ''}" for r in rows]
+
     def get_latest_stories(self, limit=10):
         return self.con.execute("SELECT * FROM top_stories ORDER BY processed_at DESC LIMIT ?", (limit,)).df()
 
@@ -528,7 +1193,11 @@ class NewsPipeline:
         return self.con.execute("SELECT * FROM emails ORDER BY fetched_at DESC LIMIT ?", (limit,)).df()
 
     def close(self):
-        self.con.close()
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+        if self._owns_db:
+            self.db.close()
 
 def main():
     pipeline = NewsPipeline()
@@ -1,15 +1,48 @@
+from __future__ import annotations
+
 import os
 import base64
-import qrcode
+import heapq
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
 from io import BytesIO
-from neonize.client import NewClient
-from neonize.events import ConnectedEv, MessageEv
-from neonize.utils.jid import build_jid
+from typing import TYPE_CHECKING
 import threading
 import logging
 
+# neonize (a native WhatsApp client) and qrcode are imported when the service
+# starts, so the API can boot without paying for them
+if TYPE_CHECKING:
+    from neonize.client import NewClient
+    from neonize.events import ConnectedEv, MessageEv
+
+import settings  # noqa: F401 - loads .env before config is read
+
 logger = logging.getLogger(__name__)
 
+# Outbound messages go through a queue drained by one sender thread.
+# Minimum gap between two messages to the same recipient
+WHATSAPP_MIN_INTERVAL_SECONDS = float(os.getenv("WHATSAPP_MIN_INTERVAL_SECONDS", "3"))
+WHATSAPP_MAX_ATTEMPTS = int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "5"))
+# Retry delay doubles per attempt, starting here and capped at the max
+WHATSAPP_RETRY_BASE_SECONDS = float(os.getenv("WHATSAPP_RETRY_BASE_SECONDS", "2"))
+WHATSAPP_RETRY_MAX_SECONDS = float(os.getenv("WHATSAPP_RETRY_MAX_SECONDS", "300"))
+# Messages kept for the delivery status listing
+WHATSAPP_OUTBOX_HISTORY = int(os.getenv("WHATSAPP_OUTBOX_HISTORY", "200"))
+# Repeated !nokast triggers from one sender within this window start one job
+WHATSAPP_TRIGGER_WINDOW_SECONDS = float(os.getenv("WHATSAPP_TRIGGER_WINDOW_SECONDS", "300"))
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _clean_phone(phone: str) -> str:
+    # Just the phone number part (strip suffix and non-digits)
+    return "".join(filter(str.isdigit, phone.split("@")[0]))
+
 class WhatsAppService:
     def __init__(self, db_path=None):
         if db_path is None:
@@ -22,8 +55,18 @@ class WhatsAppService:
         self.thread = None
         self._stop_event = threading.Event()
         self.on_nokast_callback = None
+        # Outbox: heap of (due time, seq, message id) plus message records by id
+        self._outbox = []
+        self._messages = OrderedDict()
+        self._next_send = {}  # phone -> earliest time the next message may go out
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._sender = None
+        self._last_trigger = {}  # sender -> time of the last accepted !nokast
+        self._trigger_lock = threading.Lock()
 
     def _on_qr(self, client: NewClient, qr: str):
+        import qrcode
         logger.info("WhatsApp QR received")
         img = qrcode.make(qr)
         buffered = BytesIO()
@@ -72,21 +115,51 @@ class WhatsAppService:
                 else:
                     sender_jid = str(sender).split("@")[0]
 
-            logger.info(f"Trigger Nokast job from {sender_jid}")
-            
-            if self.on_nokast_callback:
-                self.on_nokast_callback(sender_jid)
-            self.send_notification(sender_jid, "🚀 Starting Nokast job...")
-            
-            if self.on_nokast_callback:
-                self.on_nokast_callback(sender_jid)
+            self._trigger_nokast(sender_jid)
+
+    def _trigger_nokast(self, sender_jid: str):
+        # One job per sender per window, so a chatty group cannot stack up runs
+        now = time.monotonic()
+        with self._trigger_lock:
+            last = self._last_trigger.get(sender_jid)
+            if last is not None and now - last < WHATSAPP_TRIGGER_WINDOW_SECONDS:
+                logger.info(f"Ignoring repeated Nokast trigger from {sender_jid} ({now - last:.0f}s after the last one)")
+                repeated = True
+            else:
+                # Held while the job is enqueued so a concurrent trigger is treated as a repeat
+                self._last_trigger[sender_jid] = now
+                repeated = False
+        if repeated:
+            self.send_notification(sender_jid, "⏳ A Nokast job is already queued, you'll get its results.")
+            return
+
+        logger.info(f"Trigger Nokast job from {sender_jid}")
+        created = True
+        if self.on_nokast_callback:
+            try:
+                # Returns False when the trigger joined a job that was already queued
+                created = self.on_nokast_callback(sender_jid) is not False
+            except Exception:
+                # Nothing was queued, so the window must not lock the sender out
+                with self._trigger_lock:
+                    if self._last_trigger.get(sender_jid) == now:
+                        if last is None:
+                            self._last_trigger.pop(sender_jid, None)
+                        else:
+                            self._last_trigger[sender_jid] = last
+                raise
+        if created:
             self.send_notification(sender_jid, "🚀 Starting Nokast job...")
+        else:
+            self.send_notification(sender_jid, "⏳ A Nokast job is already queued, you'll get its results.")
 
     def start(self):
         if self.thread and self.thread.is_alive():
             return
 
         def run_client():
+            from neonize.client import NewClient
+            from neonize.events import ConnectedEv, MessageEv
             # Ensure secrets dir exists
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             self.client = NewClient(self.db_path)
@@ -108,27 +181,117 @@ class WhatsAppService:
         self.thread = threading.Thread(target=run_client, daemon=True)
         self.thread.start()
 
-    def send_notification(self, phone: str, message: str):
+    def send_notification(self, phone: str, message: str) -> str | None:
+        """Queue `message` for `phone`; returns the message id to look up its delivery status."""
         if not self.is_connected or not self.client:
             logger.warning("WhatsApp not connected, cannot send notification")
-            return
-        
-        # Extract just the phone number part (strip suffix and non-digits)
-        clean_phone = phone.split("@")[0]
-        clean_phone = "".join(filter(str.isdigit, clean_phone))
-        
+            return None
+        clean_phone = _clean_phone(phone)
+        if not clean_phone:
+            logger.error(f"Invalid WhatsApp phone: {phone!r}")
+            return None
+
+        msg_id = str(uuid.uuid4())
+        with self._cond:
+            self._messages[msg_id] = {
+                "id": msg_id, "phone": clean_phone, "message": message, "status": "queued",
+                "attempts": 0, "error": None, "created_at": _now_iso(), "sent_at": None,
+            }
+            # Drop the oldest finished records beyond the history limit
+            while len(self._messages) > WHATSAPP_OUTBOX_HISTORY:
+                old_id = next((k for k, m in self._messages.items() if m["status"] in ("sent", "failed")), None)
+                if old_id is None:
+                    break
+                del self._messages[old_id]
+            self._push(time.monotonic(), msg_id)
+        self._ensure_sender()
+        return msg_id
+
+    def _push(self, due: float, msg_id: str):
+        # Caller holds self._cond
+        self._seq += 1
+        heapq.heappush(self._outbox, (due, self._seq, msg_id))
+        self._cond.notify()
+
+    def _ensure_sender(self):
+        with self._cond:
+            if self._sender and self._sender.is_alive():
+                return
+            self._sender = threading.Thread(target=self._send_loop, name="whatsapp-sender", daemon=True)
+            self._sender.start()
+
+    def _send_loop(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                if not self._outbox:
+                    self._cond.wait(timeout=30)
+                    continue
+                due, _, msg_id = self._outbox[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(timeout=due - now)
+                    continue
+                heapq.heappop(self._outbox)
+                msg = self._messages.get(msg_id)
+                if msg is None:
+                    continue
+                # Per-recipient rate limit: put it back until this phone may receive again
+                allowed = self._next_send.get(msg["phone"], 0.0)
+                if allowed > now:
+                    self._push(allowed, msg_id)
+                    continue
+                self._next_send[msg["phone"]] = now + WHATSAPP_MIN_INTERVAL_SECONDS
+                msg["status"] = "sending"
+                msg["attempts"] += 1
+            self._deliver(msg)
+
+    def _deliver(self, msg: dict):
+        phone = msg["phone"]
         try:
+            if not self.is_connected or not self.client:
+                raise RuntimeError("WhatsApp not connected")
+            from neonize.utils.jid import build_jid
             # build_jid defaults server to 's.whatsapp.net'
-            target_jid = build_jid(clean_phone)
-            logger.info(f"Sending WhatsApp message to {clean_phone}@s.whatsapp.net")
-            self.client.send_message(target_jid, message)
+            logger.info(f"Sending WhatsApp message to {phone}@s.whatsapp.net")
+            self.client.send_message(build_jid(phone), msg["message"])
         except Exception as e:
-            logger.error(f"Failed to send WhatsApp message to {clean_phone}@s.whatsapp.net: {e}")
+            with self._cond:
+                msg["error"] = str(e)
+                if msg["attempts"] >= WHATSAPP_MAX_ATTEMPTS:
+                    msg["status"] = "failed"
+                    logger.error(f"Failed to send WhatsApp message to {phone}@s.whatsapp.net after "
+                                 f"{msg['attempts']} attempts: {e}")
+                    return
+                delay = min(WHATSAPP_RETRY_MAX_SECONDS, WHATSAPP_RETRY_BASE_SECONDS * 2 ** (msg["attempts"] - 1))
+                msg["status"] = "retrying"
+                logger.warning(f"WhatsApp message to {phone} failed ({e}), retrying in {delay:.1f}s")
+                self._push(time.monotonic() + delay, msg["id"])
+            return
+        with self._cond:
+            msg.update(status="sent", error=None, sent_at=_now_iso())
+
+    def get_message(self, msg_id: str) -> dict | None:
+        with self._cond:
+            msg = self._messages.get(msg_id)
+            return dict(msg) if msg else None
+
+    def list_messages(self, limit: int = 50) -> list:
+        """Newest outbound messages with their delivery status."""
+        with self._cond:
+            return [dict(m) for m in reversed(list(self._messages.values())[-limit:])]
+
+    def outbox_counts(self) -> dict:
+        with self._cond:
+            counts = {}
+            for m in self._messages.values():
+                counts[m["status"]] = counts.get(m["status"], 0) + 1
+            return counts
 
     def get_status(self):
         return {
             "connected": self.is_connected,
-            "qr": self.qr_code
+            "qr": self.qr_code,
+            "outbox": self.outbox_counts(),
         }
 
 # Singleton instance
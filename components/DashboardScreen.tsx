@@ -1,6 +1,6 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { Button } from './Button';
-import { Story } from '../types';
+import { Story, DashboardStats } from '../types';
 
 interface DashboardScreenProps {
   stories: Story[];
@@ -12,6 +12,21 @@ interface DashboardScreenProps {
 }
 
 export const DashboardScreen: React.FC<DashboardScreenProps> = ({ stories, isModelLoaded, onLoadModel, onGenerate, onExport, onSendWhatsApp }) => {
+  const [stats, setStats] = useState<DashboardStats | null>(null);
+
+  useEffect(() => {
+    // Aggregates come from the daily rollup table; refresh when stories change
+    const fetchStats = async () => {
+        try {
+            const resp = await fetch('/api/stats?days=30');
+            if (resp.ok) setStats(await resp.json());
+        } catch (e) {
+            console.error('Failed to load stats', e);
+        }
+    };
+    fetchStats();
+  }, [stories]);
+
   return (
     <div className="p-4 sm:p-6 lg:p-8 max-w-4xl mx-auto">
       <div className="flex justify-between items-center mb-6">
@@ -27,6 +42,37 @@ export const DashboardScreen: React.FC<DashboardScreenProps> = ({ stories, isMod
         )}
       </div>
       
+      {stats && stats.totals.story_count > 0 && (
+        <div className="grid grid-cols-1 sm:grid-cols-3 gap-4 mb-6">
+            <div className="bg-white p-4 rounded-2xl shadow-sm border border-gray-200">
+                <p className="text-xs font-bold text-gray-400 uppercase tracking-wider">Stories (30 days)</p>
+                <p className="text-2xl font-bold text-gray-900 mt-1">{stats.totals.story_count}</p>
+                {stats.totals.avg_score !== null && (
+                    <p className="text-xs text-gray-500 mt-1">Avg score {stats.totals.avg_score.toFixed(1)}</p>
+                )}
+            </div>
+            <div className="bg-white p-4 rounded-2xl shadow-sm border border-gray-200">
+                <p className="text-xs font-bold text-gray-400 uppercase tracking-wider">Top Senders</p>
+                <ul className="mt-1 space-y-0.5">
+                    {stats.senders.slice(0, 3).map(s => (
+                        <li key={s.sender_email} className="text-sm text-gray-700 flex justify-between">
+                            <span className="truncate mr-2">{s.sender_email || 'Unknown'}</span>
+                            <span className="text-gray-400">{s.story_count}</span>
+                        </li>
+                    ))}
+                </ul>
+            </div>
+            <div className="bg-white p-4 rounded-2xl shadow-sm border border-gray-200">
+                <p className="text-xs font-bold text-gray-400 uppercase tracking-wider">Top Tags</p>
+                <div className="mt-2 flex flex-wrap gap-1">
+                    {stats.tags.slice(0, 6).map(t => (
+                        <span key={t.tag} className="text-xs font-semibold bg-indigo-100 text-indigo-800 px-2 py-0.5 rounded-full">{t.tag}</span>
+                    ))}
+                </div>
+            </div>
+        </div>
+      )}
+
       {stories.length === 0 && !isModelLoaded ? (
         <div className="text-center bg-white p-12 rounded-2xl border border-gray-200 shadow-sm">
             <h3 className="text-xl font-semibold text-gray-800 mb-2">AI Model Not Loaded</h3>
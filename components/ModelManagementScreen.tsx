@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Button } from './Button';
-import { LocalModel, ModelStatus } from '../types';
+import { LocalModel, ModelPullEvent, ModelStatus } from '../types';
 import { MOCK_MODELS } from '../constants';
 
 const StatusIndicator: React.FC<{ status: ModelStatus }> = ({ status }) => {
@@ -24,6 +24,8 @@ export const ModelManagementScreen: React.FC = () => {
     const [ollamaAvailable, setOllamaAvailable] = useState(false);
     const [serverUp, setServerUp] = useState(false);
     const [loadingModel, setLoadingModel] = useState<string | null>(null);
+    // Live pull progress by model name, fed by /api/models/pull/stream
+    const [pulls, setPulls] = useState<Record<string, ModelPullEvent>>({});
 
     const RECOMMENDED_MODELS = [
         { name: 'qwen2.5:0.5b', size: '397MB' },
@@ -94,8 +96,31 @@ export const ModelManagementScreen: React.FC = () => {
         return () => clearInterval(interval);
     }, []);
 
+    const pulling = Object.keys(pulls).length > 0;
+
+    // Pulls run as background jobs on the server; follow their progress while any is active
+    useEffect(() => {
+        if (!pulling) return;
+        const source = new EventSource('/api/models/pull/stream');
+        source.onmessage = (msg) => {
+            const event: ModelPullEvent = JSON.parse(msg.data);
+            if (!event.model) return;
+            if (event.stage === 'run' && event.event === 'end') {
+                setPulls(prev => {
+                    const next = { ...prev };
+                    delete next[event.model!];
+                    return next;
+                });
+                if (event.status === 'failed') alert('Error pulling model: ' + event.message);
+                fetchModels();
+            } else if (event.stage === 'pull') {
+                setPulls(prev => (event.model! in prev ? { ...prev, [event.model!]: event } : prev));
+            }
+        };
+        return () => source.close();
+    }, [pulling]);
+
     const handlePull = async (name: string) => {
-        setLoadingModel(name);
         try {
             const resp = await fetch('/api/models/pull', { 
                 method: 'POST', 
@@ -103,11 +128,17 @@ export const ModelManagementScreen: React.FC = () => {
                 body: JSON.stringify({ model: name }) 
             });
             const data = await resp.json();
-            if (!data.ok) throw new Error(data.err || 'pull failed');
-            fetchModels();
+            if (!data.ok) throw new Error(data.error || 'pull failed');
+            setPulls(prev => ({ ...prev, [name]: prev[name] || { model: name, message: 'Queued' } as ModelPullEvent }));
         } catch (e) {
             alert('Error pulling model: ' + (e as Error).message);
-        } finally { setLoadingModel(null); }
+        }
+    };
+
+    const pullLabel = (name: string) => {
+        const p = pulls[name];
+        if (!p) return 'Download';
+        return p.percent != null ? `${p.percent.toFixed(0)}%` : 'Pulling...';
     };
 
     const handleRemove = async (name: string) => {
@@ -120,7 +151,7 @@ export const ModelManagementScreen: React.FC = () => {
                 body: JSON.stringify({ model: name }) 
             });
             const data = await resp.json();
-            if (!data.ok) throw new Error(data.err || 'remove failed');
+            if (!data.ok) throw new Error(data.error || 'remove failed');
             fetchModels();
         } catch (e) {
             alert('Error removing model: ' + (e as Error).message);
@@ -167,7 +198,7 @@ export const ModelManagementScreen: React.FC = () => {
             </div>
             <p className="text-gray-500 mb-8">Select a local AI model for generating your summaries. Models are optimized for Apple Silicon.</p>
 
-            {!ollamaAvailable && (
+            {!ollamaAvailable && !serverUp && (
                 <div className="mb-6 p-4 bg-red-50 border border-red-200 rounded-xl text-red-700 text-sm">
                     <strong>Ollama CLI not found.</strong> Please install Ollama from <a href="https://ollama.com" target="_blank" className="underline">ollama.com</a> and ensure it's in your PATH.
                 </div>
@@ -193,16 +224,24 @@ export const ModelManagementScreen: React.FC = () => {
                                 <p className="text-sm text-gray-500">{model.size}</p>
                                 <StatusIndicator status={model.status} />
                             </div>
+                            {pulls[model.name] && (
+                                <div className="mt-2">
+                                    <div className="h-1.5 w-full bg-gray-200 rounded-full overflow-hidden">
+                                        <div className="h-full bg-blue-600 transition-all" style={{ width: `${pulls[model.name].percent ?? 0}%` }}></div>
+                                    </div>
+                                    <p className="text-xs text-gray-500 mt-1">{pulls[model.name].message}</p>
+                                </div>
+                            )}
                         </div>
                         <div className="flex items-center space-x-3">
                             {model.status === ModelStatus.NotDownloaded ? (
                                 <Button 
                                     variant="primary" 
                                     onClick={() => handlePull(model.name)} 
-                                    disabled={!!loadingModel}
+                                    disabled={!!pulls[model.name]}
                                     className="text-sm"
                                 >
-                                    {loadingModel === model.name ? 'Pulling...' : 'Download'}
+                                    {pullLabel(model.name)}
                                 </Button>
                             ) : (
                                 <>
@@ -46,4 +46,32 @@ export interface Story {
   date_iso: string;
   sender_email: string;
   processed_at: string;
-}
\ No newline at end of file
+}
+
+export interface DashboardStats {
+  totals: { story_count: number; avg_score: number | null };
+  days: { day: string; story_count: number; avg_score: number | null }[];
+  senders: { sender_email: string; story_count: number; avg_score: number | null }[];
+  tags: { tag: string; days: number }[];
+}
+
+export interface PipelineProgressEvent {
+  seq: number;
+  run_id: string;
+  ts: string;
+  elapsed_s: number;
+  stage: string;
+  event: 'start' | 'progress' | 'end';
+  message: string;
+  current?: number;
+  total?: number;
+  seconds?: number;
+  timings?: Record<string, number>;
+}
+
+export interface ModelPullEvent extends PipelineProgressEvent {
+  model?: string;
+  completed?: number;
+  percent?: number | null;
+  status?: string;
+}